@@ -114,7 +114,7 @@ async def read_users_me(
     )
 
 
-async def get_current_user_dependency(
+def get_current_user_dependency(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
 ):
@@ -1,30 +1,68 @@
 """Document management API endpoints."""
 
 import os
-import shutil
 import uuid
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.api.auth import get_current_user_dependency
 from app.config import settings
 from app.models import Document, User, get_db
+from app.services.bulk_ingest import (
+    BulkStager,
+    FileTooLarge,
+    InvalidPdf,
+    stream_upload,
+)
 from app.services.document_processor import document_processor
+from app.services.executor import ExecutorOverloaded, vector_executor
+from app.services.job_queue import (
+    JOB_RUNNING,
+    document_status,
+    job_queue,
+    worker_pool,
+)
+from app.services.rag_service import rag_service
 
 router = APIRouter()
 
 
-def validate_pdf_file(file_path: str) -> bool:
-    """Validate that the file is actually a PDF by checking its header."""
+async def receive_pdf(file: UploadFile, file_path: str) -> Tuple[int, str]:
+    """Stream an uploaded PDF to disk and return its size and SHA-256 hash."""
+    if file.size and file.size > settings.max_file_size:
+        raise _file_too_large()
+    try:
+        return await stream_upload(file, file_path, settings.max_file_size)
+    except InvalidPdf:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="유효하지 않은 PDF 파일입니다. 실제 PDF 파일을 업로드해주세요.",
+        )
+    except FileTooLarge:
+        raise _file_too_large()
+
+
+def _file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"File size exceeds maximum limit of {settings.max_file_size} bytes",
+    )
+
+
+def stage_bulk_upload(files: List[UploadFile]) -> BulkStager:
+    """Write the PDFs of a bulk upload to disk, unpacking zip and tar archives."""
+    stager = BulkStager(settings.upload_path, max_files=settings.bulk_upload_max_files)
     try:
-        with open(file_path, "rb") as f:
-            header = f.read(4)
-            return header == b"%PDF"
-    except Exception:
-        return False
+        for file in files:
+            stager.add(file.filename or "", file.size, file.file)
+    except BaseException:
+        stager.discard()  # e.g. an encrypted zip member
+        raise
+    return stager
 
 
 class DocumentResponse(BaseModel):
@@ -35,11 +73,87 @@ class DocumentResponse(BaseModel):
     upload_date: str
     processed: bool
     chunk_count: int
+    processing_status: str
 
 
 class DocumentUploadResponse(BaseModel):
     message: str
     document: DocumentResponse
+    duplicate: bool = False
+
+
+class BulkUploadResponse(BaseModel):
+    message: str
+    batch_id: Optional[str] = None
+    documents: List[DocumentResponse]
+    duplicates: List[DocumentResponse] = []
+    rejected: List[Dict[str, str]] = []
+
+
+def document_response(document: Document) -> DocumentResponse:
+    """Build the API representation of a document."""
+    return DocumentResponse(
+        id=document.id,
+        filename=document.filename,
+        original_filename=document.original_filename,
+        file_size=document.file_size,
+        upload_date=document.upload_date.isoformat(),
+        processed=document.processed,
+        chunk_count=document.chunk_count,
+        processing_status=document_status(document),
+    )
+
+
+def get_document_or_404(db: Session, document_id: int) -> Document:
+    """Load a document, or raise 404."""
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
+        )
+    return document
+
+
+def register_upload(db: Session, document: Document) -> Tuple[DocumentResponse, bool]:
+    """Record an uploaded document and queue its ingestion.
+
+    Returns the document's response and whether it is a re-upload of a file
+    already in the library, in which case that document is returned and
+    nothing is recorded. Blocking; routes run it on the threadpool.
+    """
+    # Short-circuit re-uploads of a file we already have
+    existing = (
+        db.query(Document)
+        .filter(Document.content_hash == document.content_hash)
+        .first()
+    )
+    if existing:
+        return document_response(existing), True
+
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+
+    # Return immediately; ingestion workers pick the job up in background
+    job_queue.enqueue(db, document)
+    return document_response(document), False
+
+
+def register_bulk_upload(
+    db: Session, stager: BulkStager, uploaded_by: int
+) -> BulkUploadResponse:
+    """Record the staged files of a bulk upload as one batch; blocking."""
+    documents, duplicates, batch_id = stager.register(db, uploaded_by)
+    return BulkUploadResponse(
+        message=(
+            f"{len(documents)} document(s) uploaded, {len(duplicates)} duplicate(s), "
+            f"{len(stager.rejected)} rejected."
+        ),
+        batch_id=batch_id,
+        documents=[document_response(document) for document in documents],
+        duplicates=[document_response(document) for document in duplicates],
+        rejected=stager.rejected,
+    )
 
 
 @router.post("/upload", response_model=DocumentUploadResponse)
@@ -62,13 +176,6 @@ async def upload_document(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed"
         )
 
-    # Check file size
-    if file.size and file.size > settings.max_file_size:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File size exceeds maximum limit of {settings.max_file_size} bytes",
-        )
-
     try:
         # Create upload directory if it doesn't exist
         os.makedirs(settings.upload_path, exist_ok=True)
@@ -78,50 +185,36 @@ async def upload_document(
         unique_filename = f"{uuid.uuid4()}{file_extension}"
         file_path = os.path.join(settings.upload_path, unique_filename)
 
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Validate that it's actually a PDF file
-        if not validate_pdf_file(file_path):
-            # Clean up invalid file
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="유효하지 않은 PDF 파일입니다. 실제 PDF 파일을 업로드해주세요.",
-            )
+        # Save file, checking the PDF header and size limit while streaming
+        file_size, content_hash = await receive_pdf(file, file_path)
 
         # Create document record
         document = Document(
             filename=unique_filename,
             original_filename=file.filename,
             file_path=file_path,
-            file_size=file.size or os.path.getsize(file_path),
+            file_size=file_size,
+            content_hash=content_hash,
             uploaded_by=current_user.id,
             processed=False,
         )
-        db.add(document)
-        db.commit()
-        db.refresh(document)
+        response, duplicate = await run_in_threadpool(register_upload, db, document)
+        if duplicate:
+            os.remove(file_path)
+            return DocumentUploadResponse(
+                message="Document already uploaded.",
+                document=response,
+                duplicate=True,
+            )
+        rag_service.invalidate_caches()
 
-        # Return immediately and process in background (simplified for demo)
         return DocumentUploadResponse(
             message="Document uploaded successfully. Processing will begin shortly.",
-            document=DocumentResponse(
-                id=document.id,
-                filename=document.filename,
-                original_filename=document.original_filename,
-                file_size=document.file_size,
-                upload_date=document.upload_date.isoformat(),
-                processed=document.processed,
-                chunk_count=document.chunk_count,
-            ),
+            document=response,
         )
 
-        # Note: Document processing happens manually via /process endpoint
-        # In production, consider using background task queue (Celery, RQ, etc.)
-
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -129,8 +222,63 @@ async def upload_document(
         )
 
 
+@router.post("/bulk-upload", response_model=BulkUploadResponse)
+async def bulk_upload_documents(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Upload many PDFs, or zip/tar archives of PDFs, as one ingestion batch.
+
+    All new documents and their jobs are registered in a single transaction
+    and share a batch id, whose progress and throughput are reported by
+    `GET /batches/{batch_id}`.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can upload documents",
+        )
+
+    try:
+        stager = await run_in_threadpool(stage_bulk_upload, files)
+        response = await run_in_threadpool(
+            register_bulk_upload, db, stager, current_user.id
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to upload documents: {str(e)}",
+        )
+    if response.documents:
+        rag_service.invalidate_caches()
+
+    return response
+
+
+@router.get("/batches/{batch_id}")
+def get_batch_status(
+    batch_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Get the progress and ingestion throughput of a bulk upload batch."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view documents",
+        )
+
+    batch = job_queue.batch_status(db, batch_id)
+    if batch is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found"
+        )
+    return batch
+
+
 @router.get("/", response_model=List[DocumentResponse])
-async def list_documents(
+def list_documents(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dependency),
 ):
@@ -143,18 +291,78 @@ async def list_documents(
 
     documents = db.query(Document).order_by(Document.upload_date.desc()).all()
 
-    return [
-        DocumentResponse(
-            id=doc.id,
-            filename=doc.filename,
-            original_filename=doc.original_filename,
-            file_size=doc.file_size,
-            upload_date=doc.upload_date.isoformat(),
-            processed=doc.processed,
-            chunk_count=doc.chunk_count,
+    return [document_response(doc) for doc in documents]
+
+
+def record_replaced_file(
+    db: Session, document: Document, file_size: int, content_hash: str
+) -> DocumentResponse:
+    """Record a document's new file and queue it for re-indexing; blocking."""
+    document.file_size = file_size
+    document.content_hash = content_hash
+    # A job still indexing the old file sees the new version and stops
+    document.file_version = (document.file_version or 0) + 1
+    document.processed = False
+    # Re-scan from the start; unchanged chunks are skipped by their hash
+    document.last_chunk_index = -1
+    db.commit()
+    job_queue.enqueue(db, document)
+    return document_response(document)
+
+
+@router.put("/{document_id}/file", response_model=DocumentUploadResponse)
+async def replace_document_file(
+    document_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Upload a revised version of a document and re-index what changed."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can upload documents",
+        )
+
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed"
+        )
+
+    document = await run_in_threadpool(get_document_or_404, db, document_id)
+
+    temp_path = f"{document.file_path}.{uuid.uuid4()}.part"
+    try:
+        file_size, content_hash = await receive_pdf(file, temp_path)
+
+        if content_hash == document.content_hash:
+            return DocumentUploadResponse(
+                message="Document unchanged.",
+                document=document_response(document),
+                duplicate=True,
+            )
+
+        os.replace(temp_path, document.file_path)
+        response = await run_in_threadpool(
+            record_replaced_file, db, document, file_size, content_hash
+        )
+        rag_service.invalidate_caches()
+
+        return DocumentUploadResponse(
+            message="Document updated. Changed chunks will be re-indexed shortly.",
+            document=response,
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update document: {str(e)}",
         )
-        for doc in documents
-    ]
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
 
 @router.delete("/{document_id}")
@@ -170,26 +378,41 @@ async def delete_document(
             detail="Only admin users can delete documents",
         )
 
-    document = db.query(Document).filter(Document.id == document_id).first()
-    if not document:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
-        )
+    document = await run_in_threadpool(get_document_or_404, db, document_id)
+
+    def has_running_job() -> bool:
+        return any(job.status == JOB_RUNNING for job in document.jobs)
+
+    def delete_record():
+        db.delete(document)
+        db.commit()
 
     try:
+        running = await run_in_threadpool(has_running_job)
+
         # Delete from vector database
-        document_processor.delete_document_chunks(document_id)
+        await vector_executor.run(
+            document_processor.delete_document_chunks, document_id
+        )
 
         # Delete file from filesystem
         if os.path.exists(document.file_path):
             os.remove(document.file_path)
 
         # Delete from database
-        db.delete(document)
-        db.commit()
+        await run_in_threadpool(delete_record)
+        if running:
+            # The job may have stored another batch meanwhile; from now on it
+            # finds the document gone, stops and drops what it stored itself
+            await vector_executor.run(
+                document_processor.delete_document_chunks, document_id
+            )
+        rag_service.invalidate_caches()
 
         return {"message": "Document deleted successfully"}
 
+    except ExecutorOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -198,12 +421,12 @@ async def delete_document(
 
 
 @router.post("/{document_id}/process")
-async def process_document(
+def process_document(
     document_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dependency),
 ):
-    """Process a document manually."""
+    """Queue a document for background processing."""
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -220,22 +443,42 @@ async def process_document(
         return {"message": "Document already processed"}
 
     try:
-        chunk_count = document_processor.process_document(document, document.file_path)
-        document.processed = True
-        document.chunk_count = chunk_count
-        db.commit()
+        job = job_queue.enqueue(db, document)
 
         return {
-            "message": "Document processed successfully",
-            "chunk_count": chunk_count,
+            "message": "Document queued for processing",
+            "job_id": job.id,
+            "status": job.status,
         }
 
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process document: {str(e)}",
+            detail=f"Failed to queue document: {str(e)}",
+        )
+
+
+@router.get("/{document_id}/status")
+def get_document_status(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Get the processing status of a document."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view documents",
+        )
+
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
         )
 
+    return job_queue.get_status(db, document)
+
 
 @router.post("/add-sample-data")
 async def add_sample_data(
@@ -274,51 +517,113 @@ async def add_sample_data(
             },
         ]
 
-        # Initialize document processor
-        document_processor._init_models()
-
-        # Add each sample document
-        for i, sample in enumerate(sample_documents):
-            # Create document record
-            document = Document(
-                filename=f"sample_{i + 1}.pdf",
-                original_filename=f"{sample['title']}.pdf",
-                file_path=f"sample/sample_{i + 1}.pdf",
-                file_size=1000,
-                uploaded_by=current_user.id,
-                processed=True,
-                chunk_count=1,
-            )
-            db.add(document)
+        def add_documents() -> List[Document]:
+            documents = [
+                Document(
+                    filename=f"sample_{i + 1}.pdf",
+                    original_filename=f"{sample['title']}.pdf",
+                    file_path=f"sample/sample_{i + 1}.pdf",
+                    file_size=1000,
+                    uploaded_by=current_user.id,
+                    processed=True,
+                )
+                for i, sample in enumerate(sample_documents)
+            ]
+            db.add_all(documents)
             db.commit()
-            db.refresh(document)
-
-            # Add to vector database
-            embedding = document_processor.embedding_model.encode(
-                [sample["content"]]
-            ).tolist()
-
-            document_processor.collection.add(
-                embeddings=embedding,
-                documents=[sample["content"]],
-                metadatas=[
-                    {
-                        "document_id": document.id,
-                        "filename": document.original_filename,
-                        "chunk_index": 0,
-                        "chunk_text": sample["content"],
-                    }
-                ],
-                ids=[f"{document.id}_0"],
-            )
+            for document in documents:
+                db.refresh(document)
+            return documents
+
+        def record_chunk_counts(documents: List[Document], counts: List[int]):
+            for document, count in zip(documents, counts):
+                document.chunk_count = count
+            db.commit()
+
+        documents = await run_in_threadpool(add_documents)
+        # Embed and index all samples in one call on the vector executor
+        counts = await vector_executor.run(
+            document_processor.index_texts,
+            documents,
+            [sample["content"] for sample in sample_documents],
+        )
+        await run_in_threadpool(record_chunk_counts, documents, counts)
+
+        rag_service.invalidate_caches()
 
         return {
             "message": f"Successfully added {len(sample_documents)} sample documents",
             "count": len(sample_documents),
         }
 
+    except ExecutorOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to add sample data: {str(e)}",
         )
+
+
+@router.get("/index/shards")
+async def get_index_shards(
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Get the vector index layout and chunk count per shard."""
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can view the index",
+        )
+
+    return await vector_executor.run(document_processor.index_stats)
+
+
+@router.post("/index/rebuild")
+async def rebuild_index(
+    shard: Optional[str] = None,
+    sample: int = 0,
+    k: int = 10,
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Rebuild the vector index of one shard, or of all shards.
+
+    With `sample`, recall@k and query latency on that many held-out queries
+    are reported before and after the rebuild.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can rebuild the index",
+        )
+    if sample < 0 or k < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="sample must be >= 0 and k >= 1",
+        )
+
+    # Workers hold handles to the collections being replaced, so restart them
+    # around the rebuild. They finish their running jobs first, unless that
+    # takes longer than the drain timeout; jobs cut short are requeued.
+    workers_running = worker_pool.running
+    await run_in_threadpool(worker_pool.stop, settings.ingestion_drain_timeout or None)
+    try:
+        report = await vector_executor.run(
+            document_processor.rebuild_index, shard, sample, k
+        )
+        rag_service.invalidate_caches()
+        return {"message": "Index rebuilt successfully", **report}
+
+    except ExecutorOverloaded:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to rebuild index: {str(e)}",
+        )
+    finally:
+        if workers_running:
+            await run_in_threadpool(job_queue.requeue_running)
+            worker_pool.start()
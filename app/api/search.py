@@ -1,13 +1,18 @@
 """Search and RAG API endpoints."""
 
-from typing import Dict, List
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Depends, Form, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.api.auth import get_current_user_dependency
 from app.models import User, get_db
+from app.services.document_processor import SearchFilters
+from app.services.executor import ExecutorOverloaded, vector_executor
 from app.services.rag_service import rag_service
 
 router = APIRouter()
@@ -21,6 +26,7 @@ class SearchSource(BaseModel):
     filename: str
     chunk_text: str
     similarity: float
+    page_number: Optional[int] = None
 
 
 class SearchResponse(BaseModel):
@@ -29,6 +35,7 @@ class SearchResponse(BaseModel):
     sources: List[SearchSource]
     response_time: int
     search_id: int = None
+    cached: bool = False
 
 
 class SearchHistoryItem(BaseModel):
@@ -40,9 +47,54 @@ class SearchHistoryItem(BaseModel):
     created_at: str
 
 
+def _parse_datetime(value: Optional[str], field: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{field} must be an ISO date or datetime",
+        )
+
+
+def search_filters(
+    document_ids: Optional[str] = Form(None),
+    uploaded_by: Optional[int] = Form(None),
+    uploaded_after: Optional[str] = Form(None),
+    uploaded_before: Optional[str] = Form(None),
+    filename_prefix: Optional[str] = Form(None),
+) -> Optional[SearchFilters]:
+    """Collect optional search filters from the form.
+
+    `document_ids` is a comma-separated list; the upload date range includes
+    `uploaded_after` and excludes `uploaded_before`.
+    """
+    ids = None
+    if document_ids:
+        try:
+            ids = tuple(sorted({int(part) for part in document_ids.split(",")}))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="document_ids must be a comma-separated list of integers",
+            )
+
+    filters = SearchFilters(
+        document_ids=ids,
+        uploaded_by=uploaded_by,
+        uploaded_after=_parse_datetime(uploaded_after, "uploaded_after"),
+        uploaded_before=_parse_datetime(uploaded_before, "uploaded_before"),
+        filename_prefix=filename_prefix or None,
+    )
+    return None if filters == SearchFilters() else filters
+
+
 @router.post("/ask", response_model=SearchResponse)
 async def ask_question(
     query: str = Form(...),
+    filters: Optional[SearchFilters] = Depends(search_filters),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dependency),
 ):
@@ -53,7 +105,9 @@ async def ask_question(
         )
 
     try:
-        result = rag_service.ask_question(db, current_user, query.strip())
+        result = await rag_service.aask_question(
+            db, current_user, query.strip(), filters
+        )
 
         if result.get("error"):
             raise HTTPException(
@@ -69,13 +123,17 @@ async def ask_question(
                     filename=source["filename"],
                     chunk_text=source["chunk_text"],
                     similarity=source["similarity"],
+                    page_number=source.get("page_number"),
                 )
                 for source in result["sources"]
             ],
             response_time=result["response_time"],
             search_id=result.get("search_id"),
+            cached=result.get("cached", False),
         )
 
+    except ExecutorOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -83,8 +141,43 @@ async def ask_question(
         )
 
 
+@router.post("/ask/stream")
+async def ask_question_stream(
+    query: str = Form(...),
+    filters: Optional[SearchFilters] = Depends(search_filters),
+    current_user: User = Depends(get_current_user_dependency),
+):
+    """Ask a question and stream the answer as server-sent events.
+
+    Emits a `sources` event once retrieval finishes, `token` events as the
+    answer is generated, and a final `done` (or `error`) event.
+    """
+    if not query.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Query cannot be empty"
+        )
+
+    # Shed load before the 200 is sent; later overloads become an error event
+    if vector_executor.full:
+        raise ExecutorOverloaded("vector executor is busy")
+
+    user_id = current_user.id
+
+    async def events():
+        async for event, data in rag_service.stream_answer(
+            user_id, query.strip(), filters
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history", response_model=List[SearchHistoryItem])
-async def get_search_history(
+def get_search_history(
     limit: int = 20,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dependency),
@@ -113,7 +206,7 @@ async def get_search_history(
 
 
 @router.delete("/history/{search_id}")
-async def delete_search_history_item(
+def delete_search_history_item(
     search_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dependency),
@@ -146,7 +239,7 @@ async def delete_search_history_item(
 
 
 @router.get("/stats")
-async def get_search_stats(
+def get_search_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user_dependency),
 ):
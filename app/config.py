@@ -19,15 +19,96 @@ class Settings(BaseSettings):
     # AI Models
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-3.5-turbo"
+    openai_base_url: Optional[str] = None  # OpenAI-compatible server, if not OpenAI
     embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
 
+    # Startup
+    warmup_on_startup: bool = False  # load models in background at startup
+
+    # Embedding Cache
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "./data/embedding_cache.db"
+    embedding_cache_memory_items: int = 10_000  # in-memory LRU entries
+    embedding_cache_max_items: int = 1_000_000  # on-disk rows before eviction
+
+    # Query Embedding Batching
+    query_batch_enabled: bool = True
+    query_batch_size: int = 32  # max queries encoded in one model call
+    query_batch_wait_ms: float = 5.0  # how long a batch waits to fill up
+    query_batch_queue: int = 256  # queued queries before requests get a 503
+
+    # Query Caches
+    query_cache_size: int = 1024  # exact-match query embeddings and retrievals
+    query_cache_ttl: int = 600  # seconds
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.95  # minimum cosine similarity
+    semantic_cache_size: int = 1000
+    semantic_cache_ttl: int = 3600  # seconds
+
     # Vector Database
+    vector_backend: str = "chroma"  # "chroma" (HNSW) or "numpy" (exact flat scan)
     chroma_db_path: str = "./data/vectordb"
+    numpy_store_path: str = "./data/numpy_store"
+    numpy_store_dtype: str = "float32"  # "float16" halves, "int8" quarters the size
+    numpy_store_rescore: int = 0  # rank k * N quantized hits by a float32 copy
+    vector_workers: int = 0  # concurrent embedding/search calls, 0 = CPU count
+    vector_queue_depth: int = 32  # waiting calls before requests get a 503
+    vector_shards: int = 1  # collections chunks are spread over by document id
+    vector_shard_by: str = "document"  # "document" (id modulo shards) or "year"
+    hnsw_space: str = "l2"  # "l2", "cosine" or "ip"; Chroma needs a rebuild
+    hnsw_construction_ef: int = 100  # build-time candidate list; needs a rebuild
+    hnsw_search_ef: int = 100  # query-time candidate list, applied on startup
+    hnsw_m: int = 16  # graph links per node; needs a rebuild
+
+    # Chunk Text
+    chunk_store_enabled: bool = True  # keep chunk text out of the vector store
+    chunk_store_path: str = "./data/chunk_store.db"
+
+    # Hybrid Search
+    hybrid_search_enabled: bool = True  # fuse BM25 keyword hits with dense hits
+    keyword_index_path: str = "./data/keyword_index.db"
+    hybrid_rrf_k: int = 60  # reciprocal rank fusion damping constant
+
+    # Reranking
+    rerank_enabled: bool = False  # rescore candidates with a cross-encoder
+    rerank_model: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_candidates: int = 20  # chunks retrieved for the reranker to score
+    rerank_top_k: int = 3  # chunks kept and sent to the LLM
+    rerank_batch_size: int = 16
+    rerank_budget_ms: float = 300  # past this, keep the vector ordering
 
     # File Upload
     max_file_size: int = 50 * 1024 * 1024  # 50MB
     allowed_extensions: list = [".pdf"]
     upload_path: str = "./data/documents"
+    bulk_upload_max_files: int = 1000  # PDFs per bulk upload, archives included
+    max_archive_size: int = 2 * 1024 * 1024 * 1024  # 2GB per uploaded archive
+
+    # PDF Extraction
+    pdf_extract_workers: int = 0  # page extraction processes, 0 = CPU count
+    pdf_parallel_min_pages: int = 32  # smaller PDFs are extracted serially
+    pdf_pages_per_task: int = 8  # pages handed to a worker at a time
+
+    # OCR
+    ocr_enabled: bool = True  # OCR pages without a text layer, needs Tesseract
+    ocr_languages: str = "kor+eng"  # Tesseract language packs
+    ocr_workers: int = 0  # OCR processes, 0 = CPU count
+    ocr_min_chars: int = 20  # pages with less extracted text are OCR'd
+    ocr_cache_path: str = "./data/ocr_cache.db"
+
+    # Chunking
+    chunk_max_tokens: int = 0  # 0 = the embedding model's window minus 2
+    chunk_overlap_tokens: int = 24  # repeated when a paragraph is split
+
+    # Ingestion Pipeline
+    ingest_batch_size: int = 64  # chunks embedded and stored per batch
+
+    # Ingestion Jobs
+    ingestion_workers: int = 1  # worker processes, 0 disables the pool
+    ingestion_poll_interval: float = 1.0  # seconds between empty-queue polls
+    ingestion_batch_documents: int = 8  # jobs a worker claims and embeds together
+    # Seconds an index rebuild waits for running jobs to finish, 0 = no limit
+    ingestion_drain_timeout: float = 0
 
     # App Settings
     app_name: str = "Pat.AI"
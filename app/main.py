@@ -1,9 +1,10 @@
 """Main FastAPI application."""
 
 import os
+import threading
 
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
@@ -11,6 +12,10 @@ from sqlalchemy.orm import Session
 from app.api import auth, documents, search
 from app.config import settings
 from app.models import create_default_admin, get_db, init_db
+from app.services.document_processor import document_processor
+from app.services.executor import ExecutorOverloaded, vector_executor
+from app.services.job_queue import job_queue, worker_pool
+from app.services.reranker import reranker
 
 # Create FastAPI app
 app = FastAPI(
@@ -37,6 +42,16 @@ app.include_router(documents.router, prefix="/api/documents", tags=["documents"]
 app.include_router(search.router, prefix="/api/search", tags=["search"])
 
 
+@app.exception_handler(ExecutorOverloaded)
+async def overloaded_handler(request: Request, exc: ExecutorOverloaded):
+    """Shed load with a retryable 503 when the vector executor is saturated."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup."""
@@ -46,10 +61,32 @@ async def startup_event():
     # Create default admin user
     create_default_admin()
 
+    # Load models off the event loop so /ready flips once they are usable
+    if settings.warmup_on_startup:
+        threading.Thread(
+            target=document_processor.warmup, name="model-warmup", daemon=True
+        ).start()
+        if reranker is not None:
+            reranker.warmup()
+
+    # Start ingestion workers, resuming jobs interrupted by a previous shutdown
+    if settings.ingestion_workers > 0:
+        requeued = job_queue.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} interrupted ingestion job(s)")
+        worker_pool.start()
+
     print(f"{settings.app_name} v{settings.app_version} started successfully!")
     print("Default admin credentials: Admin/Admin")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers on shutdown."""
+    worker_pool.stop()
+    vector_executor.shutdown()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serve the main application page."""
@@ -80,6 +117,47 @@ async def health_check():
     return {"status": "healthy", "version": settings.app_version}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once models are loaded and warmed up.
+
+    Without startup warmup, models load on the first request that needs
+    them, so the server is ready as soon as it is up.
+    """
+    if document_processor.warm or not settings.warmup_on_startup:
+        return {"status": "ready", "version": settings.app_version}
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "failed" if document_processor.warmup_error else "warming_up",
+            "error": document_processor.warmup_error,
+        },
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime performance counters of this server process."""
+    from app.services.rag_service import rag_service
+
+    cache = document_processor.embedding_cache
+    return {
+        "embedding_cache": cache.stats() if cache else None,
+        "query_caches": rag_service.cache_stats(),
+        "vector_executor": vector_executor.stats(),
+        "reranker": rag_service.reranker.stats() if rag_service.reranker else None,
+        "query_batcher": (
+            document_processor.query_batcher.stats()
+            if document_processor.query_batcher
+            else None
+        ),
+        "initialization": {
+            **document_processor.init_stats(),
+            "openai_client": rag_service.async_client_loader.stats(),
+        },
+    }
+
+
 @app.get("/info")
 async def app_info(db: Session = Depends(get_db)):
     """Get application information."""
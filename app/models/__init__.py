@@ -2,6 +2,8 @@
 
 from .database import (
     Document,
+    IndexedSource,
+    IngestionJob,
     SearchHistory,
     User,
     create_default_admin,
@@ -12,6 +14,8 @@ from .database import (
 __all__ = [
     "User",
     "Document",
+    "IngestionJob",
+    "IndexedSource",
     "SearchHistory",
     "get_db",
     "init_db",
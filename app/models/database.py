@@ -9,6 +9,8 @@ from sqlalchemy import (
     String,
     Text,
     create_engine,
+    inspect,
+    text,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
@@ -55,13 +57,58 @@ class Document(Base):
     original_filename = Column(String(255), nullable=False)
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256
+    file_version = Column(Integer, default=0)  # bumped when the file is replaced
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
     processed = Column(Boolean, default=False)
     chunk_count = Column(Integer, default=0)
+    page_count = Column(Integer, default=0)
+    last_chunk_index = Column(Integer, default=-1)  # last chunk stored so far
     uploaded_by = Column(Integer, ForeignKey("users.id"))
+    batch_id = Column(String(36), nullable=True, index=True)  # bulk upload batch
+    # uploaded, queued, running, done, failed
+    processing_status = Column(String(20), default="uploaded")
+    processing_error = Column(Text, nullable=True)
 
     # Relationships
     uploader = relationship("User")
+    jobs = relationship(
+        "IngestionJob", back_populates="document", cascade="all, delete-orphan"
+    )
+
+
+class IngestionJob(Base):
+    """Background ingestion job for a document."""
+
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(
+        Integer, ForeignKey("documents.id"), nullable=False, index=True
+    )
+    # queued, running, done, failed, cancelled
+    status = Column(String(20), default="queued", index=True)
+    file_version = Column(Integer, default=0)  # document file version to index
+    worker = Column(String(100), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    document = relationship("Document", back_populates="jobs")
+
+
+class IndexedSource(Base):
+    """Source file a directory load took in, to skip it when the load resumes."""
+
+    __tablename__ = "indexed_sources"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(1000), unique=True, index=True, nullable=False)
+    file_size = Column(Integer, nullable=False)
+    mtime_ns = Column(Integer, nullable=False)
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class SearchHistory(Base):
@@ -95,6 +142,34 @@ def get_db():
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+
+
+def _add_missing_columns():
+    """Add columns and indexes introduced after an existing table was created."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = (
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                    f"{column.type.compile(dialect=engine.dialect)}"
+                )
+                default = column.default.arg if column.default is not None else None
+                if isinstance(default, bool):
+                    ddl += f" DEFAULT {int(default)}"
+                elif isinstance(default, (int, float)):
+                    ddl += f" DEFAULT {default}"
+                elif isinstance(default, str):
+                    ddl += " DEFAULT '{}'".format(default.replace("'", "''"))
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
 
 
 # Create default admin user
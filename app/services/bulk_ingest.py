@@ -0,0 +1,342 @@
+"""Streaming copies of uploaded PDFs, and staging and registration of bulk loads."""
+
+import hashlib
+import os
+import tarfile
+import uuid
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import aiofiles
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.database import Document, IndexedSource
+from app.services.job_queue import job_queue
+from app.services.shared_sqlite import SQLITE_MAX_VARS
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+COPY_BLOCK_SIZE = 1024 * 1024
+PDF_HEADER = b"%PDF"
+
+
+class FileTooLarge(ValueError):
+    """Raised when a copied file grows past its size limit."""
+
+
+class InvalidPdf(ValueError):
+    """Raised when a copied file does not start with the PDF header."""
+
+
+def validate_pdf_file(file_path: str) -> bool:
+    """Validate that the file is actually a PDF by checking its header."""
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(4)
+            return header == PDF_HEADER
+    except Exception:
+        return False
+
+
+def _check_block(block: bytes, size: int, limit: Optional[int], first: bool):
+    if first and not block.startswith(PDF_HEADER):
+        raise InvalidPdf("File does not start with the PDF header")
+    if limit is not None and size > limit:
+        raise FileTooLarge(f"File size exceeds maximum limit of {limit} bytes")
+
+
+def copy_stream(
+    source: BinaryIO,
+    file_path: str,
+    limit: Optional[int] = None,
+    require_pdf: bool = False,
+) -> Tuple[int, str]:
+    """Copy a stream to disk in blocks and return its size and SHA-256 hash.
+
+    With `require_pdf` the first block must carry the PDF header, checked
+    before the file is created. Past `limit` bytes the partial file is
+    removed and FileTooLarge raised, so an archive member cannot inflate
+    beyond what its header claimed.
+    """
+    digest = hashlib.sha256()
+    block = source.read(COPY_BLOCK_SIZE)
+    _check_block(block, len(block), limit, require_pdf)
+    size = 0
+    try:
+        with open(file_path, "wb") as buffer:
+            while block:
+                size += len(block)
+                _check_block(block, size, limit, False)
+                digest.update(block)
+                buffer.write(block)
+                block = source.read(COPY_BLOCK_SIZE)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return size, digest.hexdigest()
+
+
+async def stream_upload(
+    source, file_path: str, limit: Optional[int] = None
+) -> Tuple[int, str]:
+    """Stream an upload to disk without blocking, like `copy_stream` for PDFs.
+
+    `source` is anything with an async `read(size)`, such as an UploadFile.
+    The PDF header is checked on the first block before anything is
+    written, and the size limit while copying, so bogus or oversized
+    uploads are rejected without being written out and read back.
+    """
+    digest = hashlib.sha256()
+    block = await source.read(COPY_BLOCK_SIZE)
+    _check_block(block, len(block), limit, True)
+    size = 0
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while block:
+                size += len(block)
+                _check_block(block, size, limit, False)
+                digest.update(block)
+                await buffer.write(block)
+                block = await source.read(COPY_BLOCK_SIZE)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return size, digest.hexdigest()
+
+
+class StagedFile(NamedTuple):
+    """A PDF of a bulk load written to the upload directory."""
+
+    original_filename: str
+    filename: str
+    file_path: str
+    file_size: int
+    content_hash: str
+
+
+def _archive_members(
+    source: BinaryIO, name: str
+) -> Iterator[Tuple[str, int, BinaryIO]]:
+    """Yield (name, size, stream) of the regular files in a zip or tar archive."""
+    if name.lower().endswith(".zip"):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, info.file_size, member
+    else:
+        # Stream mode reads the members in order without seeking back
+        with tarfile.open(fileobj=source, mode="r|*") as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, info.size, archive.extractfile(info)
+
+
+class BulkStager:
+    """Copies the PDFs of a bulk load into the upload directory.
+
+    PDFs are added directly or unpacked from zip and tar archives. Member
+    names are never used as paths: every PDF gets a fresh uuid filename.
+    Rejected entries are collected with a reason instead of failing the
+    whole load, and `register` then records the staged files as one batch.
+    Until then nothing else knows about the staged files, so callers must
+    `discard` them if staging raises.
+    """
+
+    def __init__(self, upload_path: str, max_files: Optional[int] = None):
+        self.upload_path = upload_path
+        self.max_files = max_files
+        self.staged: List[StagedFile] = []
+        self.rejected: List[Dict[str, str]] = []
+
+    def add(self, name: str, size: Optional[int], source: BinaryIO):
+        """Stage a PDF or the PDFs of an archive, by file name."""
+        lowered = name.lower()
+        if lowered.endswith(".pdf"):
+            self.add_pdf(name, size, source)
+        elif lowered.endswith(ARCHIVE_EXTENSIONS):
+            self.add_archive(name, size, source)
+        else:
+            self.reject(name, "not a PDF or archive")
+
+    def add_pdf(
+        self,
+        name: str,
+        size: Optional[int],
+        source: BinaryIO,
+        limit: Optional[int] = None,
+    ) -> int:
+        """Copy one PDF into the upload directory; return the bytes written.
+
+        `limit` caps the copy below `settings.max_file_size`, to what is left
+        of an archive's size allowance.
+        """
+        reason = "file too large"
+        if limit is None or limit >= settings.max_file_size:
+            limit = settings.max_file_size
+        else:
+            reason = "archive too large"
+        if self.max_files is not None and len(self.staged) >= self.max_files:
+            self.reject(name, "too many files")
+            return 0
+        if size and size > limit:
+            self.reject(name, reason)
+            return 0
+        os.makedirs(self.upload_path, exist_ok=True)
+        filename = f"{uuid.uuid4()}.pdf"
+        file_path = os.path.join(self.upload_path, filename)
+        try:
+            file_size, content_hash = copy_stream(
+                source, file_path, limit, require_pdf=True
+            )
+        except FileTooLarge:
+            self.reject(name, reason)
+            return 0
+        except InvalidPdf:
+            self.reject(name, "not a valid PDF")
+            return 0
+        self.staged.append(
+            StagedFile(
+                os.path.basename(name), filename, file_path, file_size, content_hash
+            )
+        )
+        return file_size
+
+    def add_archive(self, name: str, size: Optional[int], source: BinaryIO):
+        """Copy the PDFs inside a zip or tar archive into the upload directory.
+
+        The archive size limit counts the bytes actually extracted, since
+        member headers can understate what a member inflates to.
+        """
+        if size and size > settings.max_archive_size:
+            self.reject(name, "archive too large")
+            return
+        extracted = 0
+        try:
+            for member, member_size, stream in _archive_members(source, name):
+                if member.lower().endswith(".pdf"):
+                    extracted += self.add_pdf(
+                        f"{name}/{member}",
+                        member_size,
+                        stream,
+                        limit=settings.max_archive_size - extracted,
+                    )
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            self.reject(name, f"bad archive: {e}")
+
+    def reject(self, name: str, reason: str):
+        self.rejected.append({"filename": name, "reason": reason})
+
+    def register(
+        self, db: Session, uploaded_by: Optional[int] = None
+    ) -> Tuple[List[Document], List[Document], Optional[str]]:
+        """Record the staged PDFs and queue their ingestion in one transaction.
+
+        Files already in the library are dropped and returned as duplicates;
+        files repeated within the load are rejected. Returns the new
+        documents, the duplicates and the batch id of the new documents.
+        """
+        hashes = list({item.content_hash for item in self.staged})
+        existing: Dict[str, Document] = {}
+        for start in range(0, len(hashes), SQLITE_MAX_VARS):
+            part = hashes[start : start + SQLITE_MAX_VARS]
+            for document in db.query(Document).filter(Document.content_hash.in_(part)):
+                existing.setdefault(document.content_hash, document)
+
+        duplicates: List[Document] = []
+        new_files: List[StagedFile] = []
+        seen = set()
+        for item in self.staged:
+            if item.content_hash in existing or item.content_hash in seen:
+                os.remove(item.file_path)
+                if item.content_hash in existing:
+                    duplicates.append(existing[item.content_hash])
+                else:
+                    self.reject(item.original_filename, "repeated in upload")
+            else:
+                seen.add(item.content_hash)
+                new_files.append(item)
+        self.staged = new_files
+
+        batch_id = str(uuid.uuid4()) if new_files else None
+        documents = [
+            Document(
+                filename=item.filename,
+                original_filename=item.original_filename,
+                file_path=item.file_path,
+                file_size=item.file_size,
+                content_hash=item.content_hash,
+                uploaded_by=uploaded_by,
+                processed=False,
+                batch_id=batch_id,
+            )
+            for item in new_files
+        ]
+        try:
+            db.add_all(documents)
+            db.flush()
+            job_queue.enqueue_many(db, documents)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.discard()
+            raise
+        return documents, duplicates, batch_id
+
+    def discard(self):
+        """Remove the staged files from disk."""
+        for item in self.staged:
+            if os.path.exists(item.file_path):
+                os.remove(item.file_path)
+        self.staged = []
+
+
+def stage_directory(
+    db: Session, stager: BulkStager, directory: Path, recursive: bool = True
+) -> int:
+    """Stage the PDFs and archives under a directory; return the files skipped.
+
+    Files a previous load took in are skipped while their size and mtime
+    are unchanged, before anything is copied or hashed, so a resumed load
+    only reads what is new. The others are recorded in the session as
+    taken in, to be committed with their documents by `register`; files
+    with a rejected entry are not, so they are looked at again next time.
+    """
+    root = os.path.abspath(directory)
+    indexed = {
+        source.path: source
+        for source in db.query(IndexedSource).filter(
+            IndexedSource.path.startswith(root + os.sep, autoescape=True)
+        )
+    }
+    paths = directory.rglob("*") if recursive else directory.glob("*")
+    skipped = 0
+    for path in sorted(paths):
+        if not (
+            path.is_file()
+            and path.name.lower().endswith((".pdf",) + ARCHIVE_EXTENSIONS)
+        ):
+            continue
+        name = str(path.relative_to(directory))
+        stat = path.stat()
+        source = indexed.get(os.path.join(root, name))
+        if source is not None and (source.file_size, source.mtime_ns) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            skipped += 1
+            continue
+        rejected = len(stager.rejected)
+        with open(path, "rb") as f:
+            stager.add(name, stat.st_size, f)
+        if len(stager.rejected) > rejected:
+            continue
+        if source is None:
+            source = IndexedSource(path=os.path.join(root, name))
+            db.add(source)
+        source.file_size = stat.st_size
+        source.mtime_ns = stat.st_mtime_ns
+    return skipped
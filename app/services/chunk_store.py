@@ -0,0 +1,200 @@
+"""Compressed store of chunk text, addressed by chunk id."""
+
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from app.services.shared_sqlite import SQLITE_MAX_VARS, connect_shared_sqlite
+
+
+class ChunkStore:
+    """Chunk text in zlib-compressed blocks of a SQLite file.
+
+    Each write packs its chunks into one block, so the chunks of an ingest
+    batch compress together, and records every chunk's byte range inside
+    the block. Blocks are immutable and their ids are never reused, which
+    lets each process keep recently decompressed blocks in an LRU without
+    invalidation; a block is deleted once no chunk points into it.
+    """
+
+    def __init__(self, path: str, level: int = 6, cache_blocks: int = 64):
+        self.path = path
+        self.level = level
+        self.cache_blocks = cache_blocks
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect_shared_sqlite(self.path)
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS blocks (
+                    block_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data BLOB NOT NULL,
+                    raw_size INTEGER NOT NULL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    document_id INTEGER NOT NULL,
+                    block_id INTEGER NOT NULL,
+                    start INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_chunks_document_id "
+                "ON chunks (document_id)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_chunks_block_id ON chunks (block_id)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def add_chunks(
+        self, document_id: int, chunk_ids: Sequence[str], texts: Sequence[str]
+    ):
+        """Store chunk texts, replacing earlier versions of the same chunks."""
+        if not chunk_ids:
+            return
+        encoded = [text.encode("utf-8") for text in texts]
+        raw = b"".join(encoded)
+        with self._lock:
+            conn = self._connect()
+            replaced = self._block_ids(conn, chunk_ids)
+            block_id = conn.execute(
+                "INSERT INTO blocks (data, raw_size) VALUES (?, ?)",
+                (zlib.compress(raw, self.level), len(raw)),
+            ).lastrowid
+            rows = []
+            start = 0
+            for chunk_id, data in zip(chunk_ids, encoded):
+                rows.append((chunk_id, document_id, block_id, start, len(data)))
+                start += len(data)
+            conn.executemany(
+                "INSERT OR REPLACE INTO chunks "
+                "(chunk_id, document_id, block_id, start, length) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._drop_orphans(conn, replaced)
+            conn.commit()
+
+    def get_many(self, chunk_ids: Sequence[str]) -> List[Optional[str]]:
+        """Look up chunk texts by id; missing chunks are None."""
+        found: Dict[str, tuple] = {}
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(chunk_ids), SQLITE_MAX_VARS):
+                part = list(chunk_ids[start : start + SQLITE_MAX_VARS])
+                rows = conn.execute(
+                    "SELECT chunk_id, block_id, start, length FROM chunks "
+                    f"WHERE chunk_id IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update((row[0], row[1:]) for row in rows)
+
+            results: List[Optional[str]] = []
+            for chunk_id in chunk_ids:
+                location = found.get(chunk_id)
+                if location is None:
+                    results.append(None)
+                    continue
+                block_id, start, length = location
+                block = self._block(conn, block_id)
+                results.append(block[start : start + length].decode("utf-8"))
+        return results
+
+    def delete_chunks(self, chunk_ids: Sequence[str]):
+        """Remove chunks from the store."""
+        with self._lock:
+            conn = self._connect()
+            blocks = self._block_ids(conn, chunk_ids)
+            for start in range(0, len(chunk_ids), SQLITE_MAX_VARS):
+                part = list(chunk_ids[start : start + SQLITE_MAX_VARS])
+                placeholders = ",".join("?" * len(part))
+                conn.execute(
+                    f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", part
+                )
+            self._drop_orphans(conn, blocks)
+            conn.commit()
+
+    def delete_document(self, document_id: int):
+        """Remove every chunk of a document from the store."""
+        with self._lock:
+            conn = self._connect()
+            blocks = [
+                row[0]
+                for row in conn.execute(
+                    "SELECT DISTINCT block_id FROM chunks WHERE document_id = ?",
+                    (document_id,),
+                )
+            ]
+            conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._drop_orphans(conn, blocks)
+            conn.commit()
+
+    def count(self) -> int:
+        """Return the number of stored chunks."""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Return chunk and block counts and the compressed and raw sizes."""
+        with self._lock:
+            conn = self._connect()
+            chunks = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            blocks, stored, raw = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0), "
+                "COALESCE(SUM(raw_size), 0) FROM blocks"
+            ).fetchone()
+        return {
+            "chunks": chunks,
+            "blocks": blocks,
+            "raw_bytes": raw,
+            "stored_bytes": stored,
+        }
+
+    def _block(self, conn: sqlite3.Connection, block_id: int) -> bytes:
+        block = self._blocks.get(block_id)
+        if block is not None:
+            self._blocks.move_to_end(block_id)
+            return block
+        (data,) = conn.execute(
+            "SELECT data FROM blocks WHERE block_id = ?", (block_id,)
+        ).fetchone()
+        block = zlib.decompress(data)
+        self._blocks[block_id] = block
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def _block_ids(self, conn: sqlite3.Connection, chunk_ids: Sequence[str]) -> List:
+        blocks = set()
+        for start in range(0, len(chunk_ids), SQLITE_MAX_VARS):
+            part = list(chunk_ids[start : start + SQLITE_MAX_VARS])
+            blocks.update(
+                row[0]
+                for row in conn.execute(
+                    "SELECT block_id FROM chunks "
+                    f"WHERE chunk_id IN ({','.join('?' * len(part))})",
+                    part,
+                )
+            )
+        return list(blocks)
+
+    def _drop_orphans(self, conn: sqlite3.Connection, block_ids: Sequence[int]):
+        """Delete blocks among `block_ids` that no chunk points into."""
+        for block_id in block_ids:
+            conn.execute(
+                "DELETE FROM blocks WHERE block_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM chunks WHERE chunks.block_id = ?)",
+                (block_id, block_id),
+            )
+            self._blocks.pop(block_id, None)
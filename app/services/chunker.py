@@ -0,0 +1,356 @@
+"""Token- and structure-aware chunking of patent text."""
+
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+SECTION_TEXT = "text"  # before the first recognized heading
+SECTION_ABSTRACT = "abstract"
+SECTION_CLAIMS = "claims"
+SECTION_DESCRIPTION = "description"
+
+# Headings are matched against a whole line once brackets (【요약】,
+# [Claims]) and a trailing colon are stripped
+_HEADINGS = [
+    (SECTION_ABSTRACT, r"abstract(?: of (?:the )?disclosure)?|요약(?:서)?|초록"),
+    (
+        SECTION_CLAIMS,
+        r"claims?|what is claimed is|(?:we|i) claim|(?:특허)?청구(?:의)?\s*범위",
+    ),
+    (
+        SECTION_DESCRIPTION,
+        r"(?:detailed )?description(?: of [\w ]{0,40})?|technical field"
+        r"|field of the invention|background(?: of the invention| art)?"
+        r"|summary(?: of the invention)?|brief description of (?:the )?drawings"
+        r"|(?:발명의\s*)?(?:상세한\s*)?설명|기술\s*분야|배경\s*기술"
+        r"|발명의\s*내용|도면의\s*간단한\s*설명"
+        r"|발명을\s*실시하기\s*위한\s*구체적인\s*내용",
+    ),
+]
+_HEADING_RES = [
+    (section, re.compile(pattern, re.IGNORECASE)) for section, pattern in _HEADINGS
+]
+_HEADING_STRIP = " \t【】[]<>():："
+_MAX_HEADING_LENGTH = 60
+
+# Lines that open a numbered paragraph ([0001], 【0001】) or a claim
+_PARAGRAPH_RE = re.compile(r"[ \t]*[\[【]\d{3,5}[\]】]")
+_CLAIM_RE = re.compile(r"[ \t]*[\[【]?[ \t]*(?:청구항|claim)[ \t]*\d+", re.IGNORECASE)
+_NUMBERED_CLAIM_RE = re.compile(r"[ \t]*\d{1,3}[ \t]*[.)][ \t]+\S")
+
+# Sentence ends (Latin and CJK terminators), clause ends of claim elements
+# (";" before a line break) and blank lines. A "." must be followed by
+# whitespace, so decimals (3.5) and codes (G06F16/33) never match.
+_BOUNDARY_RE = re.compile(r"[.!?。？！][\"'”’)\]]*\s+|;[ \t]*\n\s*|\n[ \t]*\n\s*")
+_LINE_RE = re.compile(r"[^\n]*\n")
+_WORD_RE = re.compile(r"\S+")
+_LAST_WORD_RE = re.compile(r"(\S+)$")
+_LIST_NUMBER_RE = re.compile(r"\n[ \t]*\d{1,3}$")
+_ABBREVIATIONS = set(
+    "fig figs no nos e.g i.e al vs approx u.s ser ref eq cf ca".split()
+)
+
+TokenCounter = Callable[[List[str]], List[int]]
+
+
+class Chunk(NamedTuple):
+    """A chunk of document text and where it came from.
+
+    Offsets index into the page texts joined with a trailing "\\n" each, the
+    form `DocumentProcessor.extract_text_from_pdf` returns.
+    """
+
+    text: str
+    start: int
+    end: int
+    page_number: int  # page the chunk starts on
+    page_end: int
+    section: str
+    tokens: int
+
+
+class _Unit(NamedTuple):
+    """A sentence, clause or word run that is never split further."""
+
+    text: str
+    start: int
+    page_number: int
+    page_end: int
+    page_break: int  # offset where the text of `page_end` begins
+    tokens: int
+    block_start: bool  # opens a numbered paragraph or claim
+
+
+class PatentChunker:
+    """Packs sentences into chunks that fit an embedding model's input window.
+
+    Lengths are counted in model tokens by `count_tokens`, which receives
+    every page's sentences in a single call. Section headings (abstract,
+    claims, description) always end a chunk. Numbered paragraphs and claims
+    are kept whole when they fit in a chunk and are packed together when
+    short; longer ones are split at sentence boundaries, with up to
+    `overlap_tokens` of trailing sentences repeated in the next chunk.
+    Sentences longer than the window are split between words.
+
+    Pages are consumed as a stream: only the text after the last sentence
+    boundary and the current paragraph are buffered, and a chunk is built by
+    joining its parts once, so the work is linear in the document length.
+    """
+
+    def __init__(
+        self, count_tokens: TokenCounter, max_tokens: int, overlap_tokens: int = 0
+    ):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+        # Text without any boundary is cut at a page end past this length
+        self.max_pending_chars = max_tokens * 16
+
+    def chunk(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Chunk]:
+        """Chunk `(page_number, text)` pages, in order."""
+        packer = _Packer(self.max_tokens, self.overlap_tokens)
+        for item in self._units(pages):
+            if isinstance(item, str):
+                yield from packer.start_section(item)
+            else:
+                yield from packer.add(item)
+        yield from packer.finish()
+
+    def _units(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Union[str, _Unit]]:
+        """Yield the units of each page, and section names at headings."""
+        section = SECTION_TEXT
+        offset = 0  # start of the current page in the joined text
+        pending, pending_start, pending_page, pending_block = "", 0, 1, False
+
+        for page_number, text in pages:
+            text += "\n"
+            buffer = pending + text
+            buffer_start = pending_start if pending else offset
+            buffer_page = pending_page if pending else page_number
+            page_at = len(pending)
+
+            # Cut position -> what starts there: False for a plain unit, True
+            # for a paragraph or claim, a section name for a heading line
+            cuts: Dict[int, Union[bool, str]] = {0: pending_block}
+            for line in _LINE_RE.finditer(text):
+                begin, end = page_at + line.start(), page_at + line.end()
+                heading = _heading(line.group())
+                if heading:
+                    section = heading
+                    cuts[begin] = heading
+                    cuts.setdefault(end, False)
+                elif (
+                    _PARAGRAPH_RE.match(line.group())
+                    or _CLAIM_RE.match(line.group())
+                    or (
+                        section == SECTION_CLAIMS
+                        and _NUMBERED_CLAIM_RE.match(line.group())
+                    )
+                ):
+                    cuts[begin] = True
+            for match in _BOUNDARY_RE.finditer(buffer):
+                if not _is_abbreviation(buffer, match.start()):
+                    cuts.setdefault(match.end(), False)
+
+            positions = sorted(cuts)
+            tail = positions[-1]
+            if tail == len(buffer):
+                positions.pop()
+            pieces: List[Union[str, Tuple[str, int, bool]]] = []
+            for begin, end in zip(positions, positions[1:] + [len(buffer)]):
+                kind = cuts[begin]
+                if isinstance(kind, str):
+                    pieces.append(kind)
+                else:
+                    pieces.append((buffer[begin:end], begin, kind))
+
+            # Text after the last boundary waits for the next page, unless
+            # it has grown too long without one
+            pending, pending_block = "", False
+            if tail < len(buffer) and len(buffer) - tail <= self.max_pending_chars:
+                pending, _, pending_block = pieces.pop()
+                pending_start = buffer_start + tail
+                pending_page = buffer_page if tail < page_at else page_number
+
+            texts = [piece[0] for piece in pieces if not isinstance(piece, str)]
+            counts = iter(self.count_tokens(texts) if texts else [])
+            for piece in pieces:
+                if isinstance(piece, str):
+                    yield piece
+                    continue
+                unit_text, begin, block_start = piece
+                first_page = buffer_page if begin < page_at else page_number
+                crosses = begin < page_at and unit_text[page_at - begin :].strip()
+                yield from self._fit(
+                    _Unit(
+                        unit_text,
+                        buffer_start + begin,
+                        first_page,
+                        page_number if crosses else first_page,
+                        buffer_start + page_at,
+                        next(counts),
+                        block_start,
+                    )
+                )
+            offset += len(text)
+
+        if pending:
+            yield from self._fit(
+                _Unit(
+                    pending,
+                    pending_start,
+                    pending_page,
+                    pending_page,
+                    pending_start,
+                    self.count_tokens([pending])[0],
+                    pending_block,
+                )
+            )
+
+    def _fit(self, unit: _Unit) -> Iterator[_Unit]:
+        """Split a unit longer than the window between words."""
+        if unit.tokens <= self.max_tokens:
+            yield unit
+            return
+        starts = [match.start() for match in _WORD_RE.finditer(unit.text)]
+        starts[0] = 0
+        words = [
+            unit.text[begin:end] for begin, end in zip(starts, starts[1:] + [None])
+        ]
+        for i, (begin, word, tokens) in enumerate(
+            zip(starts, words, self.count_tokens(words))
+        ):
+            # A single "word" over the window (unspaced CJK): cut by characters
+            step = len(word)
+            if tokens > self.max_tokens:
+                step = max(1, len(word) * self.max_tokens // tokens)
+            for j in range(0, len(word), step):
+                part = word[j : j + step]
+                start = unit.start + begin + j
+                page = unit.page_end if start >= unit.page_break else unit.page_number
+                yield _Unit(
+                    part,
+                    start,
+                    page,
+                    page,
+                    start,
+                    min(self.max_tokens, -(-tokens * len(part) // len(word))),
+                    unit.block_start and i == 0 and j == 0,
+                )
+
+
+class _Packer:
+    """Greedy packing of units into chunks of at most `max_tokens`."""
+
+    def __init__(self, max_tokens: int, overlap_tokens: int):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.section = SECTION_TEXT
+        self.chunk: List[_Unit] = []
+        self.chunk_tokens = 0
+        self.fresh = 0  # units in the chunk that are not overlap
+        self.block: List[_Unit] = []
+        self.block_tokens = 0
+        self.splitting = False  # the current block did not fit in a chunk
+
+    def add(self, unit: _Unit) -> Iterator[Chunk]:
+        if unit.block_start:
+            yield from self._end_block()
+        if self.splitting:
+            yield from self._pack(unit)
+            return
+        self.block.append(unit)
+        self.block_tokens += unit.tokens
+        if self.block_tokens > self.max_tokens:
+            self.splitting = True
+            yield from self._flush(overlap=False)
+            block, self.block, self.block_tokens = self.block, [], 0
+            for part in block:
+                yield from self._pack(part)
+
+    def start_section(self, section: str) -> Iterator[Chunk]:
+        yield from self.finish()
+        self.section = section
+
+    def finish(self) -> Iterator[Chunk]:
+        yield from self._end_block()
+        yield from self._flush(overlap=False)
+
+    def _end_block(self) -> Iterator[Chunk]:
+        if self.splitting:
+            self.splitting = False
+            return
+        if not self.block:
+            return
+        # Overlap only joins the parts of a split block, never two blocks
+        if not self.fresh or self.chunk_tokens + self.block_tokens > self.max_tokens:
+            yield from self._flush(overlap=False)
+        self.chunk.extend(self.block)
+        self.chunk_tokens += self.block_tokens
+        self.fresh += len(self.block)
+        self.block, self.block_tokens = [], 0
+
+    def _pack(self, unit: _Unit) -> Iterator[Chunk]:
+        """Add a unit of an oversized block, carrying overlap across chunks."""
+        if self.fresh and self.chunk_tokens + unit.tokens > self.max_tokens:
+            yield from self._flush(overlap=True)
+        while self.chunk and self.chunk_tokens + unit.tokens > self.max_tokens:
+            self.chunk_tokens -= self.chunk.pop(0).tokens
+        self.chunk.append(unit)
+        self.chunk_tokens += unit.tokens
+        self.fresh += 1
+
+    def _flush(self, overlap: bool) -> Iterator[Chunk]:
+        """Emit the chunk, keeping its trailing units up to the overlap."""
+        units = self.chunk
+        if self.fresh:
+            raw = "".join(unit.text for unit in units)
+            text = raw.strip()
+            if text:
+                start = units[0].start + len(raw) - len(raw.lstrip())
+                content = [unit for unit in units if unit.text.strip()]
+                yield Chunk(
+                    text,
+                    start,
+                    start + len(text),
+                    content[0].page_number,
+                    content[-1].page_end,
+                    self.section,
+                    self.chunk_tokens,
+                )
+        kept: List[_Unit] = []
+        kept_tokens = 0
+        for unit in reversed(units[1:] if overlap else []):
+            if kept_tokens + unit.tokens > self.overlap_tokens:
+                break
+            kept.append(unit)
+            kept_tokens += unit.tokens
+        kept.reverse()
+        self.chunk, self.chunk_tokens, self.fresh = kept, kept_tokens, 0
+
+
+def _heading(line: str) -> str:
+    """Return the section a heading line opens, or "" for other lines."""
+    if len(line) > _MAX_HEADING_LENGTH:
+        return ""
+    name = line.strip().strip(_HEADING_STRIP)
+    if not name:
+        return ""
+    for section, pattern in _HEADING_RES:
+        if pattern.fullmatch(name):
+            return section
+    return ""
+
+
+def _is_abbreviation(text: str, position: int) -> bool:
+    """Whether the "." at `position` ends an abbreviation or a list number."""
+    if text[position] != ".":
+        return False
+    before = "\n" + text[max(0, position - 12) : position]
+    if position > 12:
+        before = before[1:]
+    if _LIST_NUMBER_RE.search(before):
+        return True  # "1. A device ..." opens a claim, it does not end one
+    word = _LAST_WORD_RE.search(before)
+    return bool(word) and word.group(1).lower() in _ABBREVIATIONS
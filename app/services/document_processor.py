@@ -1,14 +1,216 @@
 """Document processing service for PDF files."""
 
-from typing import Dict, List
-
-import chromadb
-from chromadb.config import Settings
+import os
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
 from pypdf import PdfReader
 from sentence_transformers import SentenceTransformer
 
 from app.config import settings
-from app.models.database import Document
+from app.models.database import Document, SessionLocal
+from app.services.chunk_store import ChunkStore
+from app.services.chunker import Chunk, PatentChunker
+from app.services.embedding_batcher import MicroBatcher
+from app.services.embedding_cache import EmbeddingCache, text_hash
+from app.services.index_maintenance import (
+    collection_space,
+    evaluate_index,
+    exact_neighbors,
+    pairwise_distances,
+    sample_queries,
+)
+from app.services.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from app.services.lazy_resource import LazyResource
+from app.services.ocr import OcrFallback
+from app.services.pdf_text import extract_page_range
+from app.services.process_pool import spawn_pool
+from app.services.sharding import plain_metadata
+from app.services.vector_store import (
+    BACKEND_CHROMA,
+    BACKEND_NUMPY,
+    ChromaVectorStore,
+    NumpyVectorStore,
+    VectorStore,
+)
+
+
+class PageText(NamedTuple):
+    """Text extracted from a single PDF page (1-based page number)."""
+
+    page_number: int
+    text: str
+
+
+class SearchFilters(NamedTuple):
+    """Restrictions on which chunks a search may return."""
+
+    document_ids: Optional[Tuple[int, ...]] = None
+    uploaded_by: Optional[int] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    filename_prefix: Optional[str] = None  # resolved to document_ids via SQL
+
+    def where(self) -> Optional[Dict]:
+        """Translate the filters into a Chroma `where` clause."""
+        clauses = []
+        if self.document_ids is not None:
+            clauses.append({"document_id": {"$in": list(self.document_ids)}})
+        if self.uploaded_by is not None:
+            clauses.append({"uploaded_by": self.uploaded_by})
+        if self.uploaded_after is not None:
+            clauses.append({"upload_ts": {"$gte": _timestamp(self.uploaded_after)}})
+        if self.uploaded_before is not None:
+            clauses.append({"upload_ts": {"$lt": _timestamp(self.uploaded_before)}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _timestamp(value: datetime) -> int:
+    """Epoch seconds of a datetime; naive values are UTC, as SQLite stores them."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def chunk_metadata(
+    document: Document, chunk_index: int, chunk: Chunk, chunk_hash: str
+) -> Dict:
+    """Build the Chroma metadata stored with a chunk."""
+    return {
+        "document_id": document.id,
+        "filename": document.filename,
+        "chunk_index": chunk_index,
+        "chunk_hash": chunk_hash,
+        "char_start": chunk.start,
+        "char_end": chunk.end,
+        "page_number": chunk.page_number,
+        "page_end": chunk.page_end,
+        "section": chunk.section,
+        **upload_metadata(document),
+    }
+
+
+def upload_metadata(document: Document) -> Dict:
+    """Filterable upload details of a document; Chroma metadata cannot hold None."""
+    metadata = {}
+    if isinstance(document.uploaded_by, int):
+        metadata["uploaded_by"] = document.uploaded_by
+    if isinstance(document.upload_date, datetime):
+        metadata["upload_ts"] = _timestamp(document.upload_date)
+    return metadata
+
+
+COLLECTION_NAME = "patent_documents"
+
+# Collection metadata flag: every chunk carries `upload_metadata`
+FILTER_MARKER = {"filter_metadata": 1}
+
+
+def hnsw_settings() -> Dict:
+    """The configured HNSW parameters, as Chroma collection metadata."""
+    return {
+        "hnsw:space": settings.hnsw_space,
+        "hnsw:construction_ef": settings.hnsw_construction_ef,
+        "hnsw:search_ef": settings.hnsw_search_ef,
+        "hnsw:M": settings.hnsw_m,
+    }
+
+
+def _pdf_error(e: Exception) -> ValueError:
+    """Translate a PDF parsing error into a user-facing message."""
+    error_msg = str(e)
+    if (
+        "Stream has ended unexpectedly" in error_msg
+        or "EOF marker not found" in error_msg
+    ):
+        return ValueError(
+            "유효하지 않거나 손상된 PDF 파일입니다. 올바른 PDF 파일을 업로드해주세요."
+        )
+    elif "invalid pdf header" in error_msg:
+        return ValueError("PDF 파일이 아닙니다. 실제 PDF 파일을 업로드해주세요.")
+    elif "PdfStreamError" in str(type(e)) or "pypdf" in error_msg.lower():
+        return ValueError(
+            "파일 형식이 올바르지 않습니다. 유효한 PDF 파일을 업로드해주세요."
+        )
+    else:
+        return ValueError(f"PDF 파일 처리 중 오류가 발생했습니다: {error_msg}")
+
+
+def _ingest_error(e: Exception) -> ValueError:
+    """Translate an ingestion error into a user-facing message."""
+    error_msg = str(e)
+    # Check if it's a PDF processing error from extract_text_from_pdf
+    if "유효하지 않거나 손상된" in error_msg or "PDF 파일이 아닙" in error_msg:
+        return ValueError(error_msg)  # Pass through the localized message
+    elif "Failed to extract text from PDF" in error_msg or "pypdf" in error_msg.lower():
+        return ValueError(
+            "문서 처리 중 오류가 발생했습니다. PDF 파일이 올바른지 확인해주세요."
+        )
+    else:
+        return ValueError(f"문서 처리 중 예기치 못한 오류가 발생했습니다: {error_msg}")
+
+
+def _range_pages(start: int, future) -> Iterator[PageText]:
+    """Yield the pages of a finished `extract_page_range` call."""
+    for offset, text in enumerate(future.result()):
+        yield PageText(start + offset + 1, text)
+
+
+class IngestResult(NamedTuple):
+    """Outcome of ingesting one document."""
+
+    document_id: int
+    chunk_count: int
+    page_count: int
+    embedded: int
+    error: Optional[str] = None
+
+
+class _IngestRun:
+    """State of one document while its chunks go through shared batches."""
+
+    def __init__(self, document: Document, file_path: str):
+        self.document = document
+        self.file_path = file_path
+        self.stored: Dict[int, Tuple[Optional[str], Optional[int]]] = {}
+        self.reusable: Dict[str, int] = {}
+        self.page_count = 0
+        self.chunk_count = 0
+        self.embedded = 0
+        self.pending = 0  # chunks waiting in a batch that is not stored yet
+        self.scanned = False
+        self.error: Optional[str] = None
+
+    def count_pages(self, pages: Iterable[PageText]) -> Iterator[PageText]:
+        for page in pages:
+            self.page_count += 1
+            yield page
+
+    def result(self) -> IngestResult:
+        return IngestResult(
+            self.document.id,
+            self.chunk_count,
+            self.page_count,
+            self.embedded,
+            self.error,
+        )
 
 
 class DocumentProcessor:
@@ -17,176 +219,720 @@ class DocumentProcessor:
     def __init__(self):
         # Lazy initialization to avoid startup delays
         self.embedding_model = None
-        self.chroma_client = None
         self.collection = None
+        self.embedding_cache = (
+            EmbeddingCache(
+                settings.embedding_cache_path,
+                settings.embedding_model,
+                memory_items=settings.embedding_cache_memory_items,
+                max_items=settings.embedding_cache_max_items,
+            )
+            if settings.embedding_cache_enabled
+            else None
+        )
+        # Chunk text lives here once instead of in the vector store
+        self.chunk_store = (
+            ChunkStore(settings.chunk_store_path)
+            if settings.chunk_store_enabled
+            else None
+        )
+        # Scanned pages get their text from Tesseract instead of coming out empty
+        self.ocr = (
+            OcrFallback(
+                settings.ocr_languages,
+                settings.ocr_workers or os.cpu_count() or 1,
+                settings.ocr_min_chars,
+                cache_path=settings.ocr_cache_path,
+            )
+            if settings.ocr_enabled
+            else None
+        )
+        # BM25 index fused with dense results for exact-term queries
+        self.keyword_index = (
+            KeywordIndex(settings.keyword_index_path)
+            if settings.hybrid_search_enabled
+            else None
+        )
+        # Concurrent query encodes are coalesced into batched model calls
+        self.query_batcher = (
+            MicroBatcher(
+                self.encode,
+                max_batch_size=settings.query_batch_size,
+                max_wait_ms=settings.query_batch_wait_ms,
+                max_queue=settings.query_batch_queue,
+            )
+            if settings.query_batch_enabled
+            else None
+        )
+        self.warm = False
+        self.warmup_error = None
+        # Concurrent first requests share a single load of each resource
+        self.model_loader = LazyResource("embedding_model", self._load_embedding_model)
+        self.store_loader = LazyResource("vector_store", self._open_store)
+
+    def warmup(self):
+        """Load models, run a dummy encode and open the collection."""
+        try:
+            started = time.perf_counter()
+            self._init_models()
+            # The first forward pass allocates buffers; pay for it here, and
+            # bypass the cache so the model really runs
+            self.embedding_model.encode(["warmup"])
+            self.collection.count()
+            self.warm = True
+            print(f"Warmup completed in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            self.warmup_error = str(e)
+            print(f"Warmup failed: {e}")
 
     def _init_models(self):
-        """Initialize models on first use."""
+        """Initialize models on first use, exactly once across threads."""
         if self.embedding_model is None:
-            print("Loading embedding model...")
-            self.embedding_model = SentenceTransformer(settings.embedding_model)
-            print("Embedding model loaded successfully")
-
-        if self.chroma_client is None:
+            self.embedding_model = self.model_loader.get()
+
+        if self.collection is None:
+            self.collection = self.store_loader.get()
+
+    def _load_embedding_model(self) -> SentenceTransformer:
+        print("Loading embedding model...")
+        model = SentenceTransformer(settings.embedding_model)
+        print("Embedding model loaded successfully")
+        return model
+
+    def _open_store(self) -> VectorStore:
+        if settings.vector_backend == BACKEND_NUMPY:
+            print("Initializing NumPy vector store...")
+            store = NumpyVectorStore(
+                settings.numpy_store_path,
+                space=settings.hnsw_space,
+                dtype=settings.numpy_store_dtype,
+                name=COLLECTION_NAME,
+                rescore=settings.numpy_store_rescore,
+            )
+        elif settings.vector_backend == BACKEND_CHROMA:
             print("Initializing ChromaDB...")
-            self.chroma_client = chromadb.PersistentClient(
-                path=settings.chroma_db_path,
-                settings=Settings(anonymized_telemetry=False),
+            store = ChromaVectorStore(
+                settings.chroma_db_path,
+                COLLECTION_NAME,
+                metadata={
+                    "description": "Patent documents collection",
+                    **FILTER_MARKER,
+                    **hnsw_settings(),
+                },
+                shard_by=settings.vector_shard_by,
+                shard_count=settings.vector_shards,
+                # Chunks are routed by upload metadata, so add it before sharding
+                prepare=self._ensure_filter_metadata,
             )
+        else:
+            raise ValueError(f"Unknown vector backend: {settings.vector_backend}")
+
+        self._ensure_filter_metadata(store)
+        if self.keyword_index is not None and self.keyword_index.count() == 0:
+            self._backfill_keyword_index(store)
+        print("Vector store initialized successfully")
+        return store
+
+    def rebuild_index(
+        self,
+        shard: Optional[str] = None,
+        sample: int = 0,
+        k: int = 10,
+        queries: Optional[List[str]] = None,
+    ) -> Dict:
+        """Rebuild the vector index of one shard, or of every collection.
+
+        Chunks are copied into a fresh index built with the configured HNSW
+        settings, which also drops the tombstones deletes leave behind. Given
+        held-out `queries`, or a `sample` of stored embeddings to use as
+        queries, recall@k against brute force and query latency are measured
+        before and after.
+        """
+        self._init_models()  # Initialize models on first use
 
-            # Get or create collection
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="patent_documents",
-                metadata={"description": "Patent documents collection"},
-            )
-            print("ChromaDB initialized successfully")
+        def target():
+            return self.collection.shard(shard)
+
+        report: Dict = {}
+        if queries:
+            held_out = np.asarray(self.encode(queries), dtype=np.float32)
+        else:
+            held_out = sample_queries(target(), sample)
+        if len(held_out):
+            truth = exact_neighbors(target(), held_out, k)
+            report["before"] = evaluate_index(target(), held_out, truth, k)
+
+        started = time.time()
+        rebuilt = self.collection.rebuild(shard)
+        report["rebuild_seconds"] = round(time.time() - started, 2)
+
+        if "before" in report:
+            report["after"] = evaluate_index(target(), held_out, truth, k)
+        return {"shards": rebuilt, **report}
+
+    def index_stats(self) -> Dict:
+        """Return the vector backend, chunk counts per shard and text storage."""
+        self._init_models()  # Initialize models on first use
+        stats = self.collection.stats()
+        if self.chunk_store is not None:
+            stats["chunk_store"] = self.chunk_store.stats()
+        return stats
+
+    def _ensure_filter_metadata(self, collection):
+        if not (collection.metadata or {}).get("filter_metadata"):
+            self._backfill_filter_metadata(collection)
+
+    def _backfill_filter_metadata(self, collection, page_size: int = 1000):
+        """Add upload details to chunks stored before they were recorded."""
+        db = SessionLocal()
+        try:
+            uploads = {
+                document.id: upload_metadata(document)
+                for document in db.query(Document)
+            }
+        finally:
+            db.close()
+
+        updated = 0
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            ids, metadatas = [], []
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                upload = uploads.get(metadata["document_id"])
+                if upload and "upload_ts" not in metadata:
+                    ids.append(chunk_id)
+                    metadatas.append({**metadata, **upload})
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+        collection.modify(
+            metadata={**plain_metadata(collection.metadata), **FILTER_MARKER}
+        )
+        if updated:
+            print(f"Added upload metadata to {updated} chunks")
+
+    def _backfill_keyword_index(self, collection, page_size: int = 1000):
+        """Index chunks stored before the keyword index existed."""
+        total = collection.count()
+        for offset in range(0, total, page_size):
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            texts = self.chunk_texts(page["ids"], collection)
+            by_document: Dict[int, Tuple[List[str], List[str]]] = {}
+            for chunk_id, text, metadata in zip(page["ids"], texts, page["metadatas"]):
+                ids, texts = by_document.setdefault(metadata["document_id"], ([], []))
+                ids.append(chunk_id)
+                texts.append(text)
+            for document_id, (ids, texts) in by_document.items():
+                self.keyword_index.add_chunks(document_id, ids, texts)
+        if total:
+            print(f"Keyword index backfilled with {total} chunks")
+
+    def index_keywords(self, document_id: int, chunk_ids: List[str], texts: List[str]):
+        """Add chunks to the keyword index, if hybrid search is enabled."""
+        if self.keyword_index is not None:
+            self.keyword_index.add_chunks(document_id, chunk_ids, texts)
+
+    def store_chunk_texts(
+        self, document_id: int, chunk_ids: List[str], texts: List[str]
+    ) -> Optional[List[str]]:
+        """Save chunk texts to the chunk store and the keyword index.
+
+        Returns the `documents` to write to the vector store: None when the
+        chunk store holds the text, else the texts themselves.
+        """
+        self.index_keywords(document_id, chunk_ids, texts)
+        if self.chunk_store is None:
+            return texts
+        self.chunk_store.add_chunks(document_id, chunk_ids, texts)
+        return None
+
+    def chunk_texts(self, chunk_ids: List[str], collection=None) -> List[str]:
+        """Look up chunk texts by id.
+
+        Chunks stored before the chunk store existed, or with it disabled,
+        still have their text in the vector store.
+        """
+        texts: List[Optional[str]] = [None] * len(chunk_ids)
+        if self.chunk_store is not None:
+            texts = self.chunk_store.get_many(chunk_ids)
+        missing = [chunk_id for chunk_id, text in zip(chunk_ids, texts) if text is None]
+        if missing:
+            if collection is None:
+                collection = self.collection
+            found = collection.get(ids=missing, include=["documents"])
+            by_id = dict(zip(found["ids"], found["documents"]))
+            texts = [
+                by_id.get(chunk_id) or "" if text is None else text
+                for chunk_id, text in zip(chunk_ids, texts)
+            ]
+        return texts
+
+    def _attach_texts(self, results: List[Dict]) -> List[Dict]:
+        """Fill in the text of search results fetched without it."""
+        missing = [result for result in results if result["text"] is None]
+        if missing:
+            texts = self.chunk_texts([result["chunk_id"] for result in missing])
+            for result, text in zip(missing, texts):
+                result["text"] = text
+        return results
+
+    def _result_include(self, *fields: str) -> List[str]:
+        """Fields to fetch with search hits; text comes from the chunk store."""
+        if self.chunk_store is None:
+            return ["documents", *fields]
+        return list(fields)
+
+    def init_stats(self) -> Dict:
+        """Return load time and contention metrics of the lazy resources."""
+        return {
+            "embedding_model": self.model_loader.stats(),
+            "vector_store": self.store_loader.stats(),
+        }
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, serving repeated texts from the embedding cache."""
+        self._init_models()  # Initialize models on first use
+        if self.embedding_cache is None:
+            return self.embedding_model.encode(texts)
+        return self.embedding_cache.encode(texts, self.embedding_model.encode)
+
+    def submit_query(self, query: str) -> "Future[np.ndarray]":
+        """Queue a query for batched encoding and return a future embedding."""
+        if self.query_batcher is None:
+            future: "Future[np.ndarray]" = Future()
+            future.set_result(self.encode([query])[0])
+            return future
+        return self.query_batcher.submit(query)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Embed a single query, batched with concurrent queries."""
+        return self.submit_query(query).result()
 
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text content from PDF file."""
+        return "".join(f"{page.text}\n" for page in self.iter_pages(file_path))
+
+    def extract_pages_from_pdf(
+        self, file_path: str, workers: Optional[int] = None
+    ) -> List[PageText]:
+        """Extract per-page text, fanning large PDFs out across processes."""
+        return list(self.iter_pages(file_path, workers))
+
+    def iter_pages(
+        self, file_path: str, workers: Optional[int] = None
+    ) -> Iterator[PageText]:
+        """Yield per-page text in order, holding only a bounded number of pages.
+
+        Pages without a text layer, as in scanned patents, are OCR'd when
+        the OCR fallback is enabled and Tesseract is installed.
+        """
+        pages = self._iter_text_layer(file_path, workers)
+        if self.ocr is None:
+            return pages
+        return self.ocr.fill(pages, file_path)
+
+    def _iter_text_layer(
+        self, file_path: str, workers: Optional[int] = None
+    ) -> Iterator[PageText]:
+        """Yield the extracted text layer of each page, in order."""
+        workers = workers or settings.pdf_extract_workers or os.cpu_count() or 1
         try:
             reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            page_count = len(reader.pages)
+
+            if workers <= 1 or page_count < settings.pdf_parallel_min_pages:
+                for i, page in enumerate(reader.pages):
+                    yield PageText(i + 1, page.extract_text() or "")
+                return
+
+            size = settings.pdf_pages_per_task
+            ranges = [
+                range(i, min(i + size, page_count)) for i in range(0, page_count, size)
+            ]
+            # extract_page_range lives in its own module, light to spawn
+            with spawn_pool(workers) as executor:
+                # Keep at most two ranges per worker in flight so a slow
+                # consumer (embedding) holds extraction back instead of
+                # letting parsed pages pile up in memory.
+                pending = deque()
+                for page_range in ranges:
+                    future = executor.submit(
+                        extract_page_range,
+                        file_path,
+                        page_range.start,
+                        page_range.stop,
+                    )
+                    pending.append((page_range.start, future))
+                    if len(pending) >= workers * 2:
+                        yield from _range_pages(*pending.popleft())
+                while pending:
+                    yield from _range_pages(*pending.popleft())
         except Exception as e:
-            error_msg = str(e)
-            if (
-                "Stream has ended unexpectedly" in error_msg
-                or "EOF marker not found" in error_msg
-            ):
-                raise ValueError(
-                    "유효하지 않거나 손상된 PDF 파일입니다. 올바른 PDF 파일을 업로드해주세요."
-                )
-            elif "invalid pdf header" in error_msg:
-                raise ValueError("PDF 파일이 아닙니다. 실제 PDF 파일을 업로드해주세요.")
-            elif "PdfStreamError" in str(type(e)) or "pypdf" in error_msg.lower():
-                raise ValueError(
-                    "파일 형식이 올바르지 않습니다. 유효한 PDF 파일을 업로드해주세요."
-                )
-            else:
-                raise ValueError(f"PDF 파일 처리 중 오류가 발생했습니다: {error_msg}")
+            raise _pdf_error(e)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count embedding model tokens of each text, without special tokens."""
+        if self.embedding_model is None:
+            self.embedding_model = self.model_loader.get()
+        encoded = self.embedding_model.tokenizer(texts, add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def chunker(
+        self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None
+    ) -> PatentChunker:
+        """Return a chunker sized to the embedding model's input window."""
+        if self.embedding_model is None:
+            self.embedding_model = self.model_loader.get()
+        if max_tokens is None:
+            # Two positions of the window go to the start and end tokens
+            max_tokens = (
+                settings.chunk_max_tokens or self.embedding_model.max_seq_length - 2
+            )
+        if overlap_tokens is None:
+            overlap_tokens = settings.chunk_overlap_tokens
+        return PatentChunker(self.count_tokens, max_tokens, overlap_tokens)
 
     def chunk_text(
-        self, text: str, chunk_size: int = 1000, overlap: int = 200
+        self,
+        text: str,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
     ) -> List[str]:
-        """Split text into overlapping chunks."""
-        # Simple sentence-based chunking
-        sentences = text.split(".")
-        chunks = []
-        current_chunk = ""
-
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-
-            if len(current_chunk) + len(sentence) < chunk_size:
-                current_chunk += sentence + ". "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    # Add overlap
-                    overlap_text = (
-                        current_chunk[-overlap:]
-                        if len(current_chunk) > overlap
-                        else current_chunk
-                    )
-                    current_chunk = overlap_text + sentence + ". "
-                else:
-                    current_chunk = sentence + ". "
-
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-
-        return [
-            chunk for chunk in chunks if len(chunk.strip()) > 50
-        ]  # Filter too short chunks
-
-    def process_document(self, document: Document, file_path: str) -> int:
-        """Process a document and store embeddings."""
+        """Split text into chunks that fit the embedding model."""
+        chunks = self.iter_chunks([PageText(1, text)], max_tokens, overlap_tokens)
+        return [chunk.text for chunk in chunks]
+
+    def iter_chunks(
+        self,
+        pages: Iterable[PageText],
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+    ) -> Iterator[Chunk]:
+        """Split a stream of pages into chunks with offsets and page numbers."""
+        return self.chunker(max_tokens, overlap_tokens).chunk(pages)
+
+    def process_document(
+        self,
+        document: Document,
+        file_path: str,
+        on_progress: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """Process a document and store embeddings.
+
+        Pages, chunks and embeddings stream through in batches of
+        `settings.ingest_batch_size`, so memory use does not grow with the
+        document. After each stored batch `on_progress` receives the index of
+        the last committed chunk; chunks up to `document.last_chunk_index` are
+        already stored and are skipped, which resumes an interrupted run.
+        """
+        (result,) = self._ingest(
+            [_IngestRun(document, file_path)],
+            (lambda _, index: on_progress(index)) if on_progress else None,
+        )
+        if result.error:
+            raise ValueError(result.error)
+        return result.chunk_count
+
+    def process_documents(
+        self,
+        documents: Sequence[Document],
+        on_progress: Optional[Callable[[Document, int], None]] = None,
+    ) -> List[IngestResult]:
+        """Process several documents, sharing embedding batches between them.
+
+        Chunks of consecutive documents fill the same batches, so a backlog
+        of short patents is embedded in full-size model calls rather than one
+        small call per document. Resuming and `on_progress` work per document
+        as in `process_document`; a document that fails is reported in its
+        result without stopping the others.
+        """
+        return self._ingest(
+            [_IngestRun(document, document.file_path) for document in documents],
+            on_progress,
+        )
+
+    def index_texts(
+        self, documents: Sequence[Document], texts: Sequence[str]
+    ) -> List[int]:
+        """Chunk, embed and store documents given as text instead of a PDF.
+
+        Used for sample data. The chunks take the same store path as ingested
+        PDFs, so the chunk store, keyword index and shards stay in step. All
+        texts are embedded in one encoder call, so keep them short. Returns
+        the chunk count of each document.
+        """
         self._init_models()  # Initialize models on first use
-        try:
-            # Extract text from PDF
-            text = self.extract_text_from_pdf(file_path)
-
-            # Chunk the text
-            chunks = self.chunk_text(text)
-
-            # Generate embeddings
-            embeddings = self.embedding_model.encode(chunks).tolist()
-
-            # Create unique IDs for chunks
-            chunk_ids = []
-            metadatas = []
-
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{document.id}_{i}"
-                chunk_ids.append(chunk_id)
-                metadatas.append(
-                    {
-                        "document_id": document.id,
-                        "filename": document.filename,
-                        "chunk_index": i,
-                        "chunk_text": chunk,
-                    }
-                )
-
-            # Store in ChromaDB
-            self.collection.add(
-                embeddings=embeddings,
-                documents=chunks,
-                metadatas=metadatas,
-                ids=chunk_ids,
+        groups = [
+            (
+                document,
+                [
+                    (i, chunk, text_hash(chunk.text))
+                    for i, chunk in enumerate(self.iter_chunks([PageText(1, text)]))
+                ],
+                {},
             )
-
-            return len(chunks)
-
-        except Exception as e:
-            error_msg = str(e)
-            # Check if it's a PDF processing error from extract_text_from_pdf
-            if "유효하지 않거나 손상된" in error_msg or "PDF 파일이 아닙" in error_msg:
-                raise ValueError(error_msg)  # Pass through the localized message
-            elif (
-                "Failed to extract text from PDF" in error_msg
-                or "pypdf" in error_msg.lower()
-            ):
-                raise ValueError(
-                    "문서 처리 중 오류가 발생했습니다. PDF 파일이 올바른지 확인해주세요."
+            for document, text in zip(documents, texts)
+        ]
+        for outcome in self._store_groups([group for group in groups if group[1]]):
+            if isinstance(outcome, Exception):
+                raise outcome
+        return [len(items) for _, items, _ in groups]
+
+    def _ingest(
+        self,
+        runs: List["_IngestRun"],
+        on_progress: Optional[Callable[[Document, int], None]],
+    ) -> List[IngestResult]:
+        self._init_models()  # Initialize models on first use
+        buffer: List[Tuple[_IngestRun, Tuple[int, Chunk, str]]] = []
+
+        def flush():
+            groups: Dict[int, Tuple[_IngestRun, List]] = {}
+            for run, item in buffer:
+                groups.setdefault(id(run), (run, []))[1].append(item)
+            buffer.clear()
+            try:
+                outcomes = self._store_groups(
+                    [
+                        (run.document, items, run.reusable)
+                        for run, items in groups.values()
+                    ]
                 )
+            except Exception as e:  # shared by the batch, e.g. the encoder
+                for run, _ in groups.values():
+                    run.error = str(_ingest_error(e))
+                return
+            for (run, items), embedded in zip(groups.values(), outcomes):
+                if isinstance(embedded, Exception):
+                    run.error = str(_ingest_error(embedded))
+                    continue
+                run.embedded += embedded
+                run.pending -= len(items)
+                for i, _, _ in items:
+                    # Overwritten chunks can no longer lend their embedding
+                    old_hash = run.stored.get(i, (None, None))[0]
+                    if run.reusable.get(old_hash) == i:
+                        del run.reusable[old_hash]
+                if on_progress:
+                    try:
+                        on_progress(run.document, items[-1][0])
+                    except Exception as e:  # e.g. the job was cancelled
+                        run.error = str(e)
+                        continue
+                if run.scanned and not run.pending:
+                    self._finish_run(run)
+
+        for run in runs:
+            try:
+                for item in self._changed_chunks(run):
+                    buffer.append((run, item))
+                    run.pending += 1
+                    if len(buffer) >= settings.ingest_batch_size:
+                        flush()
+                    if run.error:
+                        break
+            except Exception as e:
+                run.error = str(_ingest_error(e))
+                buffer[:] = [entry for entry in buffer if entry[0] is not run]
+            run.scanned = True
+            if not run.pending and not run.error:
+                self._finish_run(run)
+        if buffer:
+            flush()
+        return [run.result() for run in runs]
+
+    def _changed_chunks(self, run: "_IngestRun") -> Iterator[Tuple[int, Chunk, str]]:
+        """Yield (index, chunk, hash) of a document's chunks that need storing."""
+        resume_after = run.document.last_chunk_index
+        if resume_after is None:
+            resume_after = -1
+        # Chunks stored by an earlier run, by index and by text hash, so
+        # re-indexing a revised document only embeds chunks that changed
+        run.stored = self._stored_chunk_keys(run.document.id)
+        run.reusable = {chunk_hash: i for i, (chunk_hash, _) in run.stored.items()}
+
+        pages = run.count_pages(self.iter_pages(run.file_path))
+        for i, chunk in enumerate(self.iter_chunks(pages)):
+            run.chunk_count = i + 1
+            if i <= resume_after:
+                continue
+            chunk_hash = text_hash(chunk.text)
+            # Moved text keeps its embedding but needs new offsets
+            if run.stored.get(i) != (chunk_hash, chunk.start):
+                yield i, chunk, chunk_hash
+
+    def _finish_run(self, run: "_IngestRun"):
+        """Drop the tail left behind when a revision got shorter."""
+        document = run.document
+        stale_ids = [f"{document.id}_{i}" for i in run.stored if i >= run.chunk_count]
+        try:
+            if stale_ids:
+                self.collection.delete(ids=stale_ids)
+                if self.keyword_index is not None:
+                    self.keyword_index.delete_chunks(stale_ids)
+                if self.chunk_store is not None:
+                    self.chunk_store.delete_chunks(stale_ids)
+        except Exception as e:
+            run.error = str(_ingest_error(e))
+            return
+        print(
+            f"Document {document.id}: {run.chunk_count} chunks, "
+            f"{run.embedded} embedded, {run.chunk_count - run.embedded} reused"
+        )
+
+    def _stored_chunk_keys(
+        self, document_id: int
+    ) -> Dict[int, Tuple[Optional[str], Optional[int]]]:
+        """Map chunk index to (text hash, start offset) of chunks already stored."""
+        results = self.collection.get(
+            where={"document_id": document_id}, include=["metadatas"]
+        )
+        return {
+            metadata["chunk_index"]: (
+                metadata.get("chunk_hash"),
+                metadata.get("char_start"),
+            )
+            for metadata in results["metadatas"]
+        }
+
+    def _store_groups(
+        self,
+        groups: List[Tuple[Document, List[Tuple[int, Chunk, str]], Dict[str, int]]],
+    ) -> List[Union[int, Exception]]:
+        """Embed the chunks of several documents in one encoder call and upsert them.
+
+        Each group holds a document, its (index, chunk, hash) items and the
+        hashes of its stored chunks; returns how many chunks of each group
+        were encoded, or the error that kept the group from being stored, so
+        one document's failure does not fail the others sharing the batch.
+        Chunks whose hash matches a still-stored chunk of the same document
+        at another index (text moved by a revision) reuse its embedding.
+        Embeddings stay one float32 array from the encoder to the store.
+        """
+        outcomes: List[Union[int, Exception]] = []
+        reused: List[Dict[str, np.ndarray]] = []
+        for document, batch, reusable in groups:
+            try:
+                reused.append(self._reused_embeddings(document, batch, reusable))
+                outcomes.append(0)
+            except Exception as e:
+                reused.append({})
+                outcomes.append(e)
+        to_encode = [
+            chunk.text
+            for (_, batch, _), found, outcome in zip(groups, reused, outcomes)
+            if not isinstance(outcome, Exception)
+            for _, chunk, chunk_hash in batch
+            if chunk_hash not in found
+        ]
+        encoded = (
+            np.asarray(self.encode(to_encode), dtype=np.float32) if to_encode else None
+        )
+
+        position = 0
+        for index, ((document, batch, _), found) in enumerate(zip(groups, reused)):
+            if isinstance(outcomes[index], Exception):
+                continue
+            fresh = sum(chunk_hash not in found for _, _, chunk_hash in batch)
+            rows = encoded[position : position + fresh] if fresh else None
+            position += fresh
+            if not found:
+                embeddings = rows
             else:
-                raise ValueError(
-                    f"문서 처리 중 예기치 못한 오류가 발생했습니다: {error_msg}"
+                new_rows = iter(rows if rows is not None else ())
+                embeddings = np.stack(
+                    [
+                        found[chunk_hash] if chunk_hash in found else next(new_rows)
+                        for _, _, chunk_hash in batch
+                    ]
+                ).astype(np.float32, copy=False)
+
+            # Upsert keeps re-running a partially committed batch idempotent
+            ids = [f"{document.id}_{i}" for i, _, _ in batch]
+            texts = [chunk.text for _, chunk, _ in batch]
+            try:
+                self.collection.upsert(
+                    embeddings=embeddings,
+                    documents=self.store_chunk_texts(document.id, ids, texts),
+                    metadatas=[
+                        chunk_metadata(document, i, chunk, chunk_hash)
+                        for i, chunk, chunk_hash in batch
+                    ],
+                    ids=ids,
                 )
-
-    def search_similar_chunks(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Search for similar chunks based on query."""
+            except Exception as e:
+                outcomes[index] = e
+                continue
+            outcomes[index] = fresh
+        return outcomes
+
+    def _reused_embeddings(
+        self,
+        document: Document,
+        batch: List[Tuple[int, Chunk, str]],
+        reusable: Dict[str, int],
+    ) -> Dict[str, np.ndarray]:
+        """Fetch stored embeddings of chunks whose text moved to another index."""
+        reused: Dict[str, np.ndarray] = {}
+        reuse_ids = [
+            f"{document.id}_{reusable[chunk_hash]}"
+            for _, _, chunk_hash in batch
+            if chunk_hash in reusable
+        ]
+        if reuse_ids:
+            found = self.collection.get(
+                ids=reuse_ids, include=["embeddings", "metadatas"]
+            )
+            for embedding, metadata in zip(found["embeddings"], found["metadatas"]):
+                reused[metadata["chunk_hash"]] = embedding
+        return reused
+
+    def search_similar_chunks(
+        self,
+        query: str,
+        n_results: int = 5,
+        query_embedding: Optional[np.ndarray] = None,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict]:
+        """Search for similar chunks based on query, optionally filtered."""
         self._init_models()  # Initialize models on first use
+        where = filters.where() if filters else None
+        if filters and filters.document_ids is not None and not filters.document_ids:
+            return []  # the filters match no document
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_model.encode([query]).tolist()
+            # Generate query embedding unless the caller already has it
+            if query_embedding is None:
+                query_embedding = self.encode_query(query)
 
             # Search in ChromaDB
             results = self.collection.query(
-                query_embeddings=query_embedding,
+                query_embeddings=np.atleast_2d(
+                    np.asarray(query_embedding, dtype=np.float32)
+                ),
                 n_results=n_results,
-                include=["documents", "metadatas", "distances"],
+                where=where,
+                include=self._result_include("metadatas", "distances"),
             )
 
-            # Format results
+            # Format results; text is attached once the final hits are known
+            documents = results.get("documents")
             formatted_results = []
             for i in range(len(results["ids"][0])):
                 formatted_results.append(
                     {
                         "chunk_id": results["ids"][0][i],
-                        "text": results["documents"][0][i],
+                        "text": documents[0][i] if documents else None,
                         "metadata": results["metadatas"][0][i],
                         "similarity": 1
                         - results["distances"][0][i],  # Convert distance to similarity
                     }
                 )
 
-            return formatted_results
+            if self.keyword_index is not None:
+                formatted_results = self._fuse_keyword_results(
+                    query, query_embedding, formatted_results, n_results, filters
+                )
+            return self._attach_texts(formatted_results)
 
         except Exception as e:
             error_msg = str(e)
@@ -197,6 +943,60 @@ class DocumentProcessor:
             else:
                 raise ValueError(f"검색 중 오류가 발생했습니다: {error_msg}")
 
+    def _fuse_keyword_results(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        dense_results: List[Dict],
+        n_results: int,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict]:
+        """Merge dense results with BM25 hits by reciprocal rank fusion."""
+        keyword_ids = [
+            chunk_id
+            for chunk_id, _ in self.keyword_index.search(
+                query, n_results, filters.document_ids if filters else None
+            )
+        ]
+        by_id = {result["chunk_id"]: result for result in dense_results}
+
+        # Keyword-only hits still need their text, metadata and a similarity;
+        # the where clause also drops hits outside the uploader/date filters
+        missing = [chunk_id for chunk_id in keyword_ids if chunk_id not in by_id]
+        if missing:
+            found = self.collection.get(
+                ids=missing,
+                where=filters.where() if filters else None,
+                include=self._result_include("metadatas", "embeddings"),
+            )
+            distances = (
+                pairwise_distances(
+                    query_embedding,
+                    found["embeddings"],
+                    collection_space(self.collection),
+                )[0]
+                if found["ids"]
+                else []
+            )
+            documents = found.get("documents") or [None] * len(found["ids"])
+            for chunk_id, text, metadata, distance in zip(
+                found["ids"], documents, found["metadatas"], distances
+            ):
+                by_id[chunk_id] = {
+                    "chunk_id": chunk_id,
+                    "text": text,
+                    "metadata": metadata,
+                    "similarity": 1 - float(distance),
+                }
+
+        fused = reciprocal_rank_fusion(
+            [[result["chunk_id"] for result in dense_results], keyword_ids],
+            k=settings.hybrid_rrf_k,
+        )
+        return [by_id[chunk_id] for chunk_id, _ in fused if chunk_id in by_id][
+            :n_results
+        ]
+
     def delete_document_chunks(self, document_id: int):
         """Delete all chunks for a document."""
         self._init_models()  # Initialize models on first use
@@ -206,6 +1006,10 @@ class DocumentProcessor:
 
             if results["ids"]:
                 self.collection.delete(ids=results["ids"])
+            if self.keyword_index is not None:
+                self.keyword_index.delete_document(document_id)
+            if self.chunk_store is not None:
+                self.chunk_store.delete_document(document_id)
 
         except Exception as e:
             error_msg = str(e)
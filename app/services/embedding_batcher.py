@@ -0,0 +1,115 @@
+"""Dynamic micro-batching of concurrent query embeddings."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.executor import ExecutorOverloaded
+from app.services.metrics import LATENCY_BUCKETS_MS, Histogram
+
+
+class MicroBatcher:
+    """Coalesce single-text encode requests into batched model calls.
+
+    Callers get a future per text. A background thread takes the first
+    waiting request, collects more until `max_batch_size` texts or
+    `max_wait_ms` have passed, and encodes them in one call, so the model runs
+    one batch of N under load instead of N batches of one.
+    """
+
+    def __init__(
+        self,
+        encoder: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 256,
+    ):
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.batches = 0
+        self.rejected = 0
+        self.batch_sizes = Histogram((1, 2, 4, 8, 16, 32, 64, 128))
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.encode_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> "Future[np.ndarray]":
+        """Queue a text for encoding and return a future of its embedding."""
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorOverloaded(
+                f"query batcher is busy ({self._queue.qsize()} texts queued)"
+            )
+        self._ensure_started()
+        future: "Future[np.ndarray]" = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def stats(self) -> Dict:
+        """Return batch count, queue depth and batch-size/latency histograms."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "queued": self._queue.qsize(),
+            "rejected": self.rejected,
+            "batch_size": self.batch_sizes.stats(),
+            "encode_ms": self.encode_ms.stats(),
+            "latency_ms": self.latency_ms.stats(),
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="query-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Past the deadline, still take whatever is already waiting
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                vectors = self.encoder([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            self.batches += 1
+            self.batch_sizes.observe(len(batch))
+            self.encode_ms.observe((finished - started) * 1000)
+            for (_, future, submitted), vector in zip(batch, vectors):
+                self.latency_ms.observe((finished - submitted) * 1000)
+                future.set_result(vector)
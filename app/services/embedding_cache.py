@@ -0,0 +1,200 @@
+"""Persistent embedding cache keyed by model name and text hash."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.shared_sqlite import SQLITE_MAX_VARS, connect_shared_sqlite
+
+
+def text_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embedding cache with an in-memory LRU in front of a SQLite table.
+
+    Vectors are stored as raw float32 bytes under `(model, sha256(text))`, so
+    the same text embedded by a different model never collides.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        memory_items: int = 10_000,
+        max_items: int = 1_000_000,
+    ):
+        self.path = path
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.max_items = max_items
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_items = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect_shared_sqlite(self.path)
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used "
+                "ON embeddings (last_used)"
+            )
+            conn.commit()
+            self._disk_items = conn.execute(
+                "SELECT COUNT(*) FROM embeddings"
+            ).fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, hashes: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up vectors by text hash; missing entries are None."""
+        results: List[Optional[np.ndarray]] = [None] * len(hashes)
+        with self._lock:
+            missing: Dict[str, List[int]] = {}
+            for i, key in enumerate(hashes):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.hits_memory += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+            if not missing:
+                return results
+
+            conn = self._connect()
+            keys = list(missing)
+            found = {}
+            for start in range(0, len(keys), SQLITE_MAX_VARS):
+                part = keys[start : start + SQLITE_MAX_VARS]
+                rows = conn.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    [self.model_name, *part],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, key) for key in found],
+                )
+                conn.commit()
+
+            for key, positions in missing.items():
+                blob = found.get(key)
+                if blob is None:
+                    self.misses += len(positions)
+                    continue
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self._remember(key, vector)
+                self.hits_disk += len(positions)
+                for i in positions:
+                    results[i] = vector
+        return results
+
+    def put_many(self, hashes: Sequence[str], vectors: np.ndarray):
+        """Store vectors for the given text hashes."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings "
+                "(model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (self.model_name, key, vector.tobytes(), now)
+                    for key, vector in zip(hashes, vectors)
+                ],
+            )
+            conn.commit()
+            self._disk_items += conn.total_changes - before
+            for key, vector in zip(hashes, vectors):
+                self._remember(key, vector)
+            if self._disk_items > self.max_items:
+                self._evict(conn)
+
+    def encode(
+        self, texts: Sequence[str], encoder: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """Return embeddings for texts, calling `encoder` only for cache misses."""
+        hashes = [text_hash(text) for text in texts]
+        cached = self.get_many(hashes)
+
+        missing: Dict[str, int] = {}
+        for i, vector in enumerate(cached):
+            if vector is None and hashes[i] not in missing:
+                missing[hashes[i]] = i
+        if missing:
+            encoded = np.asarray(
+                encoder([texts[i] for i in missing.values()]), dtype=np.float32
+            )
+            self.put_many(list(missing), encoded)
+            fresh = dict(zip(missing, encoded))
+            cached = [
+                vector if vector is not None else fresh[key]
+                for key, vector in zip(hashes, cached)
+            ]
+
+        if not cached:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(cached)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and cache sizes."""
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "model": self.model_name,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_items": len(self._memory),
+            "disk_items": self._disk_items,
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used rows down to 90% of the size limit."""
+        # Other processes write to the same file, so recount before trimming
+        self._disk_items = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_items - int(self.max_items * 0.9)
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        conn.commit()
+        self._disk_items -= excess
+        self.evictions += excess
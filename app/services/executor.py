@@ -0,0 +1,123 @@
+"""Bounded executor for CPU-heavy embedding and vector store calls."""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class ExecutorOverloaded(Exception):
+    """Raised when a bounded executor has no room for another task."""
+
+
+class BoundedExecutor:
+    """Thread pool with a cap on queued work that sheds load when full.
+
+    At most `max_workers` tasks run at once and at most `max_queue` more wait
+    for a thread; further submissions fail fast with `ExecutorOverloaded`
+    instead of piling up behind a saturated model. Embedding and Chroma
+    release the GIL in native code, so threads scale across cores.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_pending = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Tasks running or waiting for a thread."""
+        return self._pending
+
+    @property
+    def full(self) -> bool:
+        return self._pending >= self.max_workers + self.max_queue
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        """Schedule `fn(*args, **kwargs)`, or raise if the queue is full."""
+        with self._lock:
+            if self.full:
+                self.rejected += 1
+                raise ExecutorOverloaded(
+                    f"{self.name} executor is busy ({self._pending} tasks pending)"
+                )
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+            self._pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+            executor = self._executor
+        future = executor.submit(self._call, time.perf_counter(), fn, args, kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run `fn` on the executor and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self):
+        """Wait for running tasks and release the threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        """Return concurrency limits, queue depth and timing counters."""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "peak_pending": self.peak_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": (
+                round(self.wait_seconds / self.completed * 1000, 2)
+                if self.completed
+                else 0.0
+            ),
+            "avg_run_ms": (
+                round(self.run_seconds / self.completed * 1000, 2)
+                if self.completed
+                else 0.0
+            ),
+        }
+
+    def _call(self, submitted_at: float, fn: Callable, args, kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.wait_seconds += started - submitted_at
+                self.run_seconds += finished - started
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+
+
+# Global executor for query embedding and vector store calls
+vector_executor = BoundedExecutor(
+    "vector", settings.vector_workers, settings.vector_queue_depth
+)
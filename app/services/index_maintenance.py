@@ -0,0 +1,109 @@
+"""Recall and latency evaluation of the vector index."""
+
+import time
+from typing import Dict, List
+
+import numpy as np
+
+
+def collection_space(collection) -> str:
+    """Return the distance function a collection's index was built with."""
+    if isinstance(getattr(collection, "space", None), str):
+        return collection.space  # a VectorStore
+    config = (getattr(collection, "configuration_json", None) or {}).get("hnsw") or {}
+    return config.get("space") or (collection.metadata or {}).get("hnsw:space") or "l2"
+
+
+def pairwise_distances(
+    queries: np.ndarray, vectors: np.ndarray, space: str
+) -> np.ndarray:
+    """Distances between each query row and each vector row, as Chroma computes them."""
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if space == "ip":
+        return 1 - queries @ vectors.T
+    if space == "cosine":
+        norms = np.outer(
+            np.linalg.norm(queries, axis=1), np.linalg.norm(vectors, axis=1)
+        )
+        return 1 - (queries @ vectors.T) / np.maximum(norms, 1e-12)
+    # Chroma's l2 is the squared euclidean distance
+    return (
+        np.sum(queries**2, axis=1)[:, np.newaxis]
+        - 2 * queries @ vectors.T
+        + np.sum(vectors**2, axis=1)[np.newaxis, :]
+    )
+
+
+def sample_queries(collection, n: int, seed: int = 0) -> np.ndarray:
+    """Draw stored chunk embeddings to use as a held-out query set."""
+    total = collection.count()
+    if not total:
+        return np.empty((0, 0), dtype=np.float32)
+    offsets = np.random.default_rng(seed).choice(
+        total, size=min(n, total), replace=False
+    )
+    rows = [
+        collection.get(limit=1, offset=int(offset), include=["embeddings"])[
+            "embeddings"
+        ][0]
+        for offset in offsets
+    ]
+    return np.asarray(rows, dtype=np.float32)
+
+
+def exact_neighbors(
+    collection, queries: np.ndarray, k: int, page_size: int = 5000
+) -> List[List[str]]:
+    """Brute-force top-k chunk ids per query, streaming the collection in pages."""
+    space = collection_space(collection)
+    best_ids = np.empty((len(queries), 0), dtype=object)
+    best_distances = np.empty((len(queries), 0), dtype=np.float32)
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=["embeddings"])
+        if not len(page["ids"]):
+            break
+        offset += len(page["ids"])
+        distances = np.hstack(
+            [best_distances, pairwise_distances(queries, page["embeddings"], space)]
+        )
+        ids = np.hstack(
+            [
+                best_ids,
+                np.tile(np.asarray(page["ids"], dtype=object), (len(queries), 1)),
+            ]
+        )
+        keep = min(k, distances.shape[1])
+        top = np.argpartition(distances, keep - 1, axis=1)[:, :keep]
+        best_distances = np.take_along_axis(distances, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return [list(row) for row in best_ids]
+
+
+def evaluate_index(
+    collection, queries: np.ndarray, truth: List[List[str]], k: int
+) -> Dict:
+    """Measure recall@k against exact neighbors and per-query latency."""
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        found = collection.query(
+            query_embeddings=query[np.newaxis], n_results=k, include=["distances"]
+        )["ids"][0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(found) & set(expected))
+    expected_total = sum(len(expected) for expected in truth)
+    latency_ms = np.asarray(latencies or [0.0])
+    return {
+        "queries": len(truth),
+        "k": k,
+        "recall": round(hits / expected_total, 4) if expected_total else None,
+        "latency_ms": {
+            "mean": round(float(latency_ms.mean()), 3),
+            "p50": round(float(np.percentile(latency_ms, 50)), 3),
+            "p95": round(float(np.percentile(latency_ms, 95)), 3),
+            "max": round(float(latency_ms.max()), 3),
+        },
+    }
@@ -0,0 +1,494 @@
+"""SQLite-backed ingestion job queue and worker pool."""
+
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.models.database import Document, IngestionJob, SessionLocal
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+CANCELLED_ERROR = "Document was deleted or its file replaced while processing"
+
+
+class JobCancelled(Exception):
+    """Raised in a running job whose document was deleted or replaced."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """Persistent queue of document ingestion jobs stored next to `Document`."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def enqueue(self, db: Session, document: Document) -> IngestionJob:
+        """Queue a document for processing, reusing an already active job.
+
+        A job still running on an older version of the file is not reused:
+        it stops at its next batch, and a new job indexes the current file.
+        """
+        jobs = (
+            db.query(IngestionJob)
+            .filter(
+                IngestionJob.document_id == document.id,
+                IngestionJob.status.in_(ACTIVE_STATES),
+            )
+            .all()
+        )
+        for job in jobs:
+            if job.status == JOB_QUEUED:
+                if job.file_version != document.file_version:
+                    job.file_version = document.file_version
+                    db.commit()
+                return job
+            if job.file_version == document.file_version:
+                return job
+
+        job = IngestionJob(
+            document_id=document.id,
+            status=JOB_QUEUED,
+            file_version=document.file_version,
+        )
+        db.add(job)
+        document.processing_status = JOB_QUEUED
+        document.processing_error = None
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def enqueue_many(
+        self, db: Session, documents: List[Document]
+    ) -> List[IngestionJob]:
+        """Queue newly registered documents in the caller's transaction.
+
+        The documents must be flushed so they have ids; nothing is committed,
+        which lets a bulk upload register its rows and jobs all at once.
+        """
+        jobs = [
+            IngestionJob(
+                document_id=document.id,
+                status=JOB_QUEUED,
+                file_version=document.file_version or 0,
+            )
+            for document in documents
+        ]
+        for document in documents:
+            document.processing_status = JOB_QUEUED
+            document.processing_error = None
+        db.add_all(jobs)
+        return jobs
+
+    def claim_many(self, worker: str, limit: int) -> List[int]:
+        """Claim up to `limit` queued jobs, oldest first."""
+        job_ids = []
+        while len(job_ids) < limit:
+            job_id = self.claim(worker)
+            if job_id is None:
+                break
+            job_ids.append(job_id)
+        return job_ids
+
+    def claim(self, worker: str) -> Optional[int]:
+        """Atomically move the oldest queued job to running and return its id.
+
+        Documents whose previous job is still winding down are skipped, so
+        two jobs never write the same document's chunks at once.
+        """
+        running = aliased(IngestionJob)
+        db = self.session_factory()
+        try:
+            while True:
+                job = (
+                    db.query(IngestionJob)
+                    .filter(
+                        IngestionJob.status == JOB_QUEUED,
+                        ~exists().where(
+                            running.document_id == IngestionJob.document_id,
+                            running.status == JOB_RUNNING,
+                        ),
+                    )
+                    .order_by(IngestionJob.id)
+                    .first()
+                )
+                if job is None:
+                    return None
+
+                # The status guard makes the update a compare-and-swap, so two
+                # workers racing for the same row cannot both win it.
+                claimed = (
+                    db.query(IngestionJob)
+                    .filter(
+                        IngestionJob.id == job.id,
+                        IngestionJob.status == JOB_QUEUED,
+                    )
+                    .update(
+                        {
+                            IngestionJob.status: JOB_RUNNING,
+                            IngestionJob.worker: worker,
+                            IngestionJob.started_at: _now(),
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                if claimed:
+                    db.query(Document).filter(Document.id == job.document_id).update(
+                        {Document.processing_status: JOB_RUNNING},
+                        synchronize_session=False,
+                    )
+                    db.commit()
+                    return job.id
+                db.rollback()
+        finally:
+            db.close()
+
+    def complete(
+        self, job_id: int, chunk_count: int, page_count: Optional[int] = None
+    ) -> bool:
+        """Mark a job and its document as successfully processed."""
+        values = {
+            Document.processed: True,
+            Document.chunk_count: chunk_count,
+            Document.processing_status: JOB_DONE,
+            Document.processing_error: None,
+        }
+        if page_count is not None:
+            values[Document.page_count] = page_count
+        return self._finish(job_id, JOB_DONE, None, values)
+
+    def fail(self, job_id: int, error: str) -> bool:
+        """Mark a job and its document as failed."""
+        return self._finish(
+            job_id,
+            JOB_FAILED,
+            error,
+            {Document.processing_status: JOB_FAILED, Document.processing_error: error},
+        )
+
+    def _finish(self, job_id: int, status: str, error: Optional[str], values) -> bool:
+        """Record the outcome of a job on it and its document.
+
+        The document is only updated while it holds the file version the
+        job indexed; a job whose document was deleted or replaced in the
+        meantime is cancelled instead and False returned. Both are guarded
+        updates, so a concurrent delete or replace cannot slip in between.
+        """
+        db = self.session_factory()
+        try:
+            job = (
+                db.query(IngestionJob.document_id, IngestionJob.file_version)
+                .filter(IngestionJob.id == job_id)
+                .first()
+            )
+            current = job is not None and (
+                db.query(Document)
+                .filter(
+                    Document.id == job.document_id,
+                    Document.file_version == job.file_version,
+                )
+                .update(values, synchronize_session=False)
+            )
+            if not current:
+                status, error = JOB_CANCELLED, CANCELLED_ERROR
+            db.query(IngestionJob).filter(IngestionJob.id == job_id).update(
+                {
+                    IngestionJob.status: status,
+                    IngestionJob.error: error,
+                    IngestionJob.finished_at: _now(),
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            return bool(current)
+        finally:
+            db.close()
+
+    def requeue_running(self) -> int:
+        """Return jobs left running by a crashed or stopped worker to the queue."""
+        db = self.session_factory()
+        try:
+            jobs = (
+                db.query(IngestionJob).filter(IngestionJob.status == JOB_RUNNING).all()
+            )
+            for job in jobs:
+                if job.file_version != job.document.file_version:
+                    # The file was replaced; a newer job indexes it
+                    job.status = JOB_CANCELLED
+                    job.error = CANCELLED_ERROR
+                    job.finished_at = _now()
+                    continue
+                job.status = JOB_QUEUED
+                job.worker = None
+                job.started_at = None
+                job.document.processing_status = JOB_QUEUED
+            db.commit()
+            return len(jobs)
+        finally:
+            db.close()
+
+    def get_status(self, db: Session, document: Document) -> Dict:
+        """Return the processing status of a document and its latest job."""
+        job = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.document_id == document.id)
+            .order_by(IngestionJob.id.desc())
+            .first()
+        )
+        return {
+            "document_id": document.id,
+            "status": document_status(document),
+            "processed": document.processed,
+            "chunk_count": document.chunk_count,
+            "error": document.processing_error,
+            "job": _job_to_dict(job) if job else None,
+        }
+
+    def batch_status(self, db: Session, batch_id: str) -> Optional[Dict]:
+        """Return progress and throughput of a bulk upload batch.
+
+        Throughput is measured over the wall-clock span from the first job
+        started to the last one finished (or now, while jobs are running).
+        """
+        documents = db.query(Document).filter(Document.batch_id == batch_id).all()
+        if not documents:
+            return None
+        counts = {state: 0 for state in ("queued", "running", "done", "failed")}
+        for document in documents:
+            status = document_status(document)
+            counts[status] = counts.get(status, 0) + 1
+
+        jobs = (
+            db.query(IngestionJob)
+            .filter(IngestionJob.document_id.in_([d.id for d in documents]))
+            .all()
+        )
+        started = [job.started_at for job in jobs if job.started_at]
+        finished = [job.finished_at for job in jobs if job.finished_at]
+        done = [d for d in documents if d.processed]
+        pages = sum(d.page_count or 0 for d in done)
+        chunks = sum(d.chunk_count or 0 for d in done)
+        elapsed = 0.0
+        if started:
+            active = counts["queued"] or counts["running"]
+            end = _now() if active or not finished else max(map(_aware, finished))
+            elapsed = max((end - min(map(_aware, started))).total_seconds(), 0.0)
+        return {
+            "batch_id": batch_id,
+            "total": len(documents),
+            "counts": counts,
+            "pages": pages,
+            "chunks": chunks,
+            "elapsed_seconds": round(elapsed, 3),
+            "pages_per_second": round(pages / elapsed, 2) if elapsed else None,
+            "chunks_per_second": round(chunks / elapsed, 2) if elapsed else None,
+        }
+
+    def run_jobs(self, job_ids: List[int]):
+        """Process the documents of claimed jobs together and record outcomes.
+
+        The documents share embedding batches; each job still succeeds or
+        fails on its own. A document deleted or replaced while its job runs
+        stops at the next stored batch and its job is cancelled; chunks the
+        job stored for a deleted document are dropped again.
+        """
+        from app.services.document_processor import IngestResult, document_processor
+
+        # Documents keep the values they were claimed with across progress
+        # commits, even if another session deletes or replaces them
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            jobs = [db.get(IngestionJob, job_id) for job_id in job_ids]
+            jobs = [job for job in jobs if job is not None]
+            documents = [job.document for job in jobs]
+            versions = {job.document_id: job.file_version for job in jobs}
+
+            def record_progress(document: Document, last_chunk_index: int):
+                # Committed per batch so a restarted job resumes after it, but
+                # only into the document version this job is indexing
+                current = (
+                    db.query(Document)
+                    .filter(
+                        Document.id == document.id,
+                        Document.file_version == versions[document.id],
+                    )
+                    .update(
+                        {Document.last_chunk_index: last_chunk_index},
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if not current:
+                    raise JobCancelled(CANCELLED_ERROR)
+
+            try:
+                results = document_processor.process_documents(
+                    documents, on_progress=record_progress
+                )
+            except Exception as e:
+                results = [
+                    IngestResult(job.document_id, 0, 0, 0, str(e)) for job in jobs
+                ]
+            outcomes = [(job.id, result) for job, result in zip(jobs, results)]
+        finally:
+            db.close()
+        stopped = []
+        for job_id, result in outcomes:
+            if result.error:
+                finished = self.fail(job_id, result.error)
+            else:
+                finished = self.complete(job_id, result.chunk_count, result.page_count)
+            if not finished:
+                stopped.append(result.document_id)
+        if stopped:
+            self._drop_deleted(stopped)
+
+    def _drop_deleted(self, document_ids: List[int]):
+        """Delete the chunks of documents deleted while their job ran."""
+        from app.services.document_processor import document_processor
+
+        db = self.session_factory()
+        try:
+            existing = {
+                document_id
+                for (document_id,) in db.query(Document.id).filter(
+                    Document.id.in_(document_ids)
+                )
+            }
+        finally:
+            db.close()
+        for document_id in document_ids:
+            if document_id not in existing:
+                document_processor.delete_document_chunks(document_id)
+
+
+def document_status(document: Document) -> str:
+    """Return the processing status, accounting for rows created before jobs."""
+    if document.processed:
+        return JOB_DONE
+    return document.processing_status or "uploaded"
+
+
+def _aware(moment: datetime) -> datetime:
+    # SQLite returns naive datetimes for timezone-aware columns
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _job_to_dict(job: IngestionJob) -> Dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "worker": job.worker,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _worker_main(
+    worker: str, stop_event, poll_interval: float, exit_when_idle: bool = False
+):
+    """Worker process loop: claim batches of jobs until asked to stop."""
+    queue = JobQueue()
+    while not stop_event.is_set():
+        job_ids = queue.claim_many(worker, max(1, settings.ingestion_batch_documents))
+        if not job_ids:
+            if exit_when_idle:
+                return
+            stop_event.wait(poll_interval)
+            continue
+        print(f"[{worker}] processing ingestion jobs {job_ids}")
+        queue.run_jobs(job_ids)
+
+
+class WorkerPool:
+    """Pool of separate processes that drain the ingestion job queue."""
+
+    def __init__(
+        self, num_workers: int, poll_interval: float, exit_when_idle: bool = False
+    ):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        # Offline bulk loads let workers exit once the queue is drained
+        self.exit_when_idle = exit_when_idle
+        # Spawned workers load their own model and DB connections instead of
+        # inheriting the web server's state through fork.
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._processes: List = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._processes)
+
+    def start(self):
+        """Start the worker processes."""
+        if self._processes:
+            return
+        self._stop_event = self._context.Event()
+        for i in range(self.num_workers):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(
+                    f"worker-{os.getpid()}-{i}",
+                    self._stop_event,
+                    self.poll_interval,
+                    self.exit_when_idle,
+                ),
+                # Not a daemon: workers fan PDF pages out to their own process
+                # pools, which daemonic processes are not allowed to create.
+                daemon=False,
+            )
+            process.start()
+            self._processes.append(process)
+        print(f"Started {self.num_workers} ingestion worker(s)")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` for the workers to exit; True once all have."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for process in self._processes:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            process.join(remaining)
+        if any(process.is_alive() for process in self._processes):
+            return False
+        self._processes = []
+        return True
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Signal workers to stop and wait for them to exit.
+
+        Workers stop claiming jobs and finish the batch they are running.
+        Those still running after `timeout` seconds (None waits as long as
+        it takes) are terminated, leaving their jobs for `requeue_running`.
+        """
+        if not self._processes:
+            return
+        self._stop_event.set()
+        self.wait(timeout)
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._processes = []
+
+
+# Global job queue and worker pool instances
+job_queue = JobQueue()
+worker_pool = WorkerPool(settings.ingestion_workers, settings.ingestion_poll_interval)
@@ -0,0 +1,160 @@
+"""Persistent BM25 keyword index for hybrid retrieval."""
+
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.shared_sqlite import SQLITE_MAX_VARS, connect_shared_sqlite
+
+# Latin/digit terms keep inner "-", "/" and "." so IPC codes (G06F16/33),
+# claim references and chemical names (2-methylpropane) stay single terms
+_LATIN_TERM = r"[0-9a-z]+(?:[-/.][0-9a-z]+)*"
+_HANGUL_RUN = r"[가-힣]+"
+_TOKEN_RE = re.compile(f"{_LATIN_TERM}|{_HANGUL_RUN}")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms.
+
+    Korean words carry attached particles and endings (특허를, 특허의), so
+    Hangul runs are indexed as overlapping character bigrams, which match
+    regardless of inflection without a morphological analyzer.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if "가" <= token[0] <= "힣" and len(token) > 1:
+            terms.extend(token[i : i + 2] for i in range(len(token) - 1))
+        else:
+            terms.append(token)
+    return terms
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Sequence[str]], k: int = 60
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists by summing 1 / (k + rank) per id."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class KeywordIndex:
+    """Inverted index of chunk text in a SQLite FTS5 table, ranked by BM25.
+
+    Terms come from `tokenize` and are stored space-separated, so FTS5 only
+    has to split on whitespace.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect_shared_sqlite(self.path)
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms "
+                "USING fts5(terms, tokenize = \"unicode61 tokenchars '-/.'\")"
+            )
+            # FTS5 cannot index extra columns; map chunk ids to its rowids here
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunks (
+                    chunk_id TEXT PRIMARY KEY,
+                    document_id INTEGER NOT NULL,
+                    term_rowid INTEGER NOT NULL
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_chunks_document_id "
+                "ON chunks (document_id)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def add_chunks(
+        self, document_id: int, chunk_ids: Sequence[str], texts: Sequence[str]
+    ):
+        """Index chunk texts, replacing earlier versions of the same chunks."""
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, chunk_ids)
+            for chunk_id, text in zip(chunk_ids, texts):
+                cursor = conn.execute(
+                    "INSERT INTO chunk_terms (terms) VALUES (?)",
+                    (" ".join(tokenize(text)),),
+                )
+                conn.execute(
+                    "INSERT INTO chunks (chunk_id, document_id, term_rowid) "
+                    "VALUES (?, ?, ?)",
+                    (chunk_id, document_id, cursor.lastrowid),
+                )
+            conn.commit()
+
+    def delete_chunks(self, chunk_ids: Sequence[str]):
+        """Remove chunks from the index."""
+        with self._lock:
+            conn = self._connect()
+            self._delete(conn, chunk_ids)
+            conn.commit()
+
+    def delete_document(self, document_id: int):
+        """Remove every chunk of a document from the index."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "DELETE FROM chunk_terms WHERE rowid IN "
+                "(SELECT term_rowid FROM chunks WHERE document_id = ?)",
+                (document_id,),
+            )
+            conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            conn.commit()
+
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        document_ids: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return (chunk id, BM25 score) pairs, best first."""
+        terms = sorted(set(tokenize(query)))
+        if not terms or (document_ids is not None and not document_ids):
+            return []
+        match = " OR ".join('"{}"'.format(term) for term in terms)
+        sql = (
+            "SELECT chunks.chunk_id, bm25(chunk_terms) AS score "
+            "FROM chunk_terms JOIN chunks ON chunks.term_rowid = chunk_terms.rowid "
+            "WHERE chunk_terms MATCH ?"
+        )
+        params = [match]
+        if document_ids is not None:
+            sql += f" AND chunks.document_id IN ({','.join('?' * len(document_ids))})"
+            params.extend(document_ids)
+        with self._lock:
+            rows = (
+                self._connect()
+                .execute(f"{sql} ORDER BY score LIMIT ?", (*params, n_results))
+                .fetchall()
+            )
+        # FTS5 reports BM25 negated so that ascending order is best first
+        return [(chunk_id, -score) for chunk_id, score in rows]
+
+    def count(self) -> int:
+        """Return the number of indexed chunks."""
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _delete(self, conn: sqlite3.Connection, chunk_ids: Sequence[str]):
+        for start in range(0, len(chunk_ids), SQLITE_MAX_VARS):
+            part = list(chunk_ids[start : start + SQLITE_MAX_VARS])
+            placeholders = ",".join("?" * len(part))
+            conn.execute(
+                "DELETE FROM chunk_terms WHERE rowid IN (SELECT term_rowid "
+                f"FROM chunks WHERE chunk_id IN ({placeholders}))",
+                part,
+            )
+            conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", part)
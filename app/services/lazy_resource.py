@@ -0,0 +1,79 @@
+"""Thread-safe, load-once initialization of expensive resources."""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyResource(Generic[T]):
+    """Load a resource on first use, exactly once, however many threads ask.
+
+    The first caller runs `factory`; concurrent callers wait on the same
+    future instead of loading their own copy. A failed load is not cached, so
+    a later call retries it.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self.init_seconds: Optional[float] = None
+        self.loads = 0
+        self.failures = 0
+        self.waiters = 0
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        future = self._future
+        return future is not None and future.done() and future.exception() is None
+
+    def get(self) -> T:
+        """Return the resource, loading it if no other thread has."""
+        future = self._future
+        if future is None or not future.done():
+            owner = False
+            with self._lock:
+                if self._future is None:
+                    self._future = Future()
+                    owner = True
+                else:
+                    self.waiters += 1
+                future = self._future
+            if owner:
+                self._load(future)
+        return future.result()
+
+    def reset(self):
+        """Forget the loaded resource so the next `get` loads it again."""
+        with self._lock:
+            self._future = None
+
+    def stats(self) -> Dict:
+        """Return load count, time and contention counters."""
+        return {
+            "loaded": self.loaded,
+            "init_seconds": (
+                round(self.init_seconds, 3) if self.init_seconds is not None else None
+            ),
+            "loads": self.loads,
+            "failures": self.failures,
+            "waiters": self.waiters,
+        }
+
+    def _load(self, future: Future):
+        started = time.perf_counter()
+        try:
+            value = self.factory()
+        except BaseException as e:
+            self.failures += 1
+            with self._lock:
+                self._future = None
+            future.set_exception(e)
+            return
+        self.loads += 1
+        self.init_seconds = time.perf_counter() - started
+        future.set_result(value)
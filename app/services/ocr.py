@@ -0,0 +1,223 @@
+"""OCR fallback for PDF pages without a text layer."""
+
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from pypdf import PageObject, PdfReader
+
+from app.services.process_pool import spawn_pool
+from app.services.shared_sqlite import connect_shared_sqlite
+
+
+class OcrCache:
+    """OCR text of scanned pages in a SQLite table, keyed by page hash.
+
+    The hash covers the page's image data and the OCR languages, so a scan
+    that shows up again (a re-upload, a revision, the same drawing sheet in
+    another filing) is recognized only once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = connect_shared_sqlite(self.path)
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS ocr_pages (
+                    page_hash TEXT PRIMARY KEY,
+                    text TEXT NOT NULL
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, page_hash: str) -> Optional[str]:
+        """Return the cached text of a page, or None."""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute("SELECT text FROM ocr_pages WHERE page_hash = ?", (page_hash,))
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def put(self, page_hash: str, text: str):
+        """Cache the OCR text of a page."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_pages (page_hash, text) VALUES (?, ?)",
+                (page_hash, text),
+            )
+            conn.commit()
+
+    def count(self) -> int:
+        """Return the number of cached pages."""
+        with self._lock:
+            return (
+                self._connect().execute("SELECT COUNT(*) FROM ocr_pages").fetchone()[0]
+            )
+
+
+def _page_images(page: PageObject) -> Iterator:
+    """Yield the image XObjects drawn by a page, including inside forms."""
+    resources = page.get("/Resources")
+    stack = [resources.get_object()] if resources is not None else []
+    while stack:
+        xobjects = stack.pop().get("/XObject")
+        if xobjects is None:
+            continue
+        for ref in xobjects.get_object().values():
+            xobject = ref.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                yield xobject
+            elif subtype == "/Form" and "/Resources" in xobject:
+                stack.append(xobject["/Resources"].get_object())
+
+
+def page_hash(page: PageObject, languages: str) -> Optional[str]:
+    """Hash a page's image data and the OCR languages; None without images."""
+    digest = hashlib.sha256(languages.encode("utf-8"))
+    found = False
+    for image in _page_images(page):
+        digest.update(image.get_data())
+        found = True
+    return digest.hexdigest() if found else None
+
+
+_reader_cache: Dict[str, PdfReader] = {}
+_ocr_caches: Dict[str, OcrCache] = {}
+
+
+def ocr_page(
+    file_path: str, page_index: int, languages: str, cache_path: Optional[str]
+) -> str:
+    """Recognize the text of one page in a worker process, through the cache."""
+    # Workers get many pages of the same scan; keep it parsed between calls
+    reader = _reader_cache.get(file_path)
+    if reader is None:
+        _reader_cache.clear()
+        reader = _reader_cache[file_path] = PdfReader(file_path)
+    page = reader.pages[page_index]
+
+    key = page_hash(page, languages)
+    if key is None:  # nothing drawn from an image, nothing to recognize
+        return ""
+    cache = None
+    if cache_path:
+        cache = _ocr_caches.get(cache_path)
+        if cache is None:
+            cache = _ocr_caches[cache_path] = OcrCache(cache_path)
+        text = cache.get(key)
+        if text is not None:
+            return text
+
+    import pytesseract
+
+    texts = [
+        pytesseract.image_to_string(image.image, lang=languages).strip()
+        for image in page.images
+    ]
+    text = "\n".join(text for text in texts if text)
+    if cache is not None:
+        cache.put(key, text)
+    return text
+
+
+class OcrFallback:
+    """Fills in the text of scanned pages with OCR in a bounded process pool.
+
+    Pages whose text layer has fewer than `min_chars` non-blank characters
+    are sent to Tesseract; the others pass straight through. The pool is
+    only started at the first such page, so born-digital PDFs never pay for
+    it, and pages come out in their original order.
+    """
+
+    def __init__(
+        self,
+        languages: str,
+        workers: int,
+        min_chars: int,
+        cache_path: Optional[str] = None,
+        ocr: Callable[[str, int, str, Optional[str]], str] = ocr_page,
+    ):
+        self.languages = languages
+        self.workers = max(1, workers)
+        self.min_chars = min_chars
+        self.cache_path = cache_path
+        self.ocr = ocr
+        self._available: Optional[bool] = None
+
+    def available(self) -> bool:
+        """Check once whether pytesseract and the Tesseract binary are usable."""
+        if self._available is None:
+            try:
+                import pytesseract
+
+                pytesseract.get_tesseract_version()
+                self._available = True
+            except Exception as e:
+                print(f"OCR fallback disabled, Tesseract is not available: {e}")
+                self._available = False
+        return self._available
+
+    def needs_ocr(self, text: str) -> bool:
+        return len("".join(text.split())) < self.min_chars
+
+    def fill(self, pages: Iterable, file_path: str) -> Iterator:
+        """Yield (page_number, text) pages in order, OCR-ing text-less ones."""
+        executor = None
+        pending = deque()  # (page, OCR future or None), in page order
+        try:
+            for page in pages:
+                future = None
+                if self.needs_ocr(page.text) and self.available():
+                    if executor is None:
+                        # This module imports nothing heavy, so spawning is cheap
+                        executor = spawn_pool(self.workers)
+                    future = executor.submit(
+                        self.ocr,
+                        file_path,
+                        page.page_number - 1,
+                        self.languages,
+                        self.cache_path,
+                    )
+                pending.append((page, future))
+                # Hand over finished pages; past two pages per worker wait
+                # for the oldest so a long scan does not pile up in memory
+                while pending and (
+                    pending[0][1] is None
+                    or pending[0][1].done()
+                    or len(pending) > self.workers * 2
+                ):
+                    yield self._resolve(*pending.popleft())
+            while pending:
+                yield self._resolve(*pending.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _resolve(self, page, future):
+        if future is None:
+            return page
+        try:
+            text = future.result()
+        except Exception as e:
+            # A page that cannot be recognized keeps its (short) text layer
+            # rather than failing the whole document
+            print(f"OCR failed for page {page.page_number}: {e}")
+            return page
+        if not text:
+            return page
+        # A short text layer, such as a figure label over a scanned drawing,
+        # is kept ahead of the recognized text rather than replaced by it
+        layer = page.text.strip()
+        return page._replace(text=f"{layer}\n{text}" if layer else text)
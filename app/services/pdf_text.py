@@ -0,0 +1,22 @@
+"""Text layer extraction in worker processes.
+
+Kept apart from the document processor so the spawned extraction workers
+import only pypdf, not the embedding model stack.
+"""
+
+from typing import Dict, List
+
+from pypdf import PdfReader
+
+_reader_cache: Dict[str, PdfReader] = {}
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract text of pages [start, stop) in a worker process."""
+    # Workers receive many consecutive ranges of the same file; keep its parsed
+    # cross-reference table around instead of re-reading it for every range.
+    reader = _reader_cache.get(file_path)
+    if reader is None:
+        _reader_cache.clear()
+        reader = _reader_cache[file_path] = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
@@ -0,0 +1,18 @@
+"""Process pools for CPU-bound ingestion work."""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def spawn_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return a process pool whose workers are spawned rather than forked.
+
+    Ingestion workers run threaded model code (tokenizers, torch), and a
+    forked child inherits its locks in whatever state they were in, so it
+    can deadlock on them. A spawned child starts a fresh interpreter and
+    only imports the module of the function it runs, so keep those modules
+    light.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
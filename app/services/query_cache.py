@@ -0,0 +1,126 @@
+"""Query-level caches for the RAG service."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+
+class TTLCache:
+    """Thread-safe exact-match LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or time.monotonic() - item[0] > self.ttl:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._items)}
+
+
+class SemanticCache:
+    """Answer cache matched by cosine similarity of query embeddings.
+
+    An entry is only served while the corpus fingerprint it was stored under
+    is still current, so answers never outlive the documents they cite.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None  # one normalized row per entry
+        # (stored at, corpus fingerprint, value), aligned with _vectors rows
+        self._entries: List[Tuple[float, str, Any]] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding: np.ndarray, fingerprint: str) -> Optional[Any]:
+        """Return the value of the most similar fresh entry above the threshold."""
+        query = _normalize(embedding)
+        with self._lock:
+            self._expire(fingerprint)
+            if not self._entries:
+                self.misses += 1
+                return None
+            scores = self._vectors @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._entries[best][2]
+
+    def store(self, embedding: np.ndarray, fingerprint: str, value: Any):
+        """Add an entry, dropping the oldest one if full."""
+        vector = _normalize(embedding)[np.newaxis, :]
+        with self._lock:
+            self._expire(fingerprint)
+            self._entries.append((time.monotonic(), fingerprint, value))
+            self._vectors = (
+                vector if self._vectors is None else np.vstack([self._vectors, vector])
+            )
+            if len(self._entries) > self.maxsize:
+                self._entries.pop(0)
+                self._vectors = self._vectors[1:]
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries = []
+            self._vectors = None
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current size."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def _expire(self, fingerprint: str):
+        now = time.monotonic()
+        keep = [
+            i
+            for i, (stored, entry_fingerprint, _) in enumerate(self._entries)
+            if entry_fingerprint == fingerprint and now - stored <= self.ttl
+        ]
+        if len(keep) == len(self._entries):
+            return
+        self._entries = [self._entries[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else None
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -1,41 +1,153 @@
 """RAG (Retrieval-Augmented Generation) service."""
 
+import asyncio
 import json
 from datetime import datetime
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
-from openai import OpenAI
+import numpy as np
+from openai import AsyncOpenAI
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
-from app.models.database import SearchHistory, User
-from app.services.document_processor import document_processor
+from app.models.database import (
+    Document,
+    IngestionJob,
+    SearchHistory,
+    SessionLocal,
+    User,
+)
+from app.services.document_processor import SearchFilters, document_processor
+from app.services.executor import ExecutorOverloaded, vector_executor
+from app.services.lazy_resource import LazyResource
+from app.services.query_cache import SemanticCache, TTLCache
+from app.services.reranker import reranker
+
+SYSTEM_PROMPT = (
+    "당신은 특허 문서 전문가입니다. "
+    "주어진 문서를 바탕으로 정확하고 도움이 되는 답변을 제공하세요."
+)
+
+
+class Retrieval(NamedTuple):
+    """Outcome of the retrieval half of a question."""
+
+    fingerprint: str  # corpus state and filters the retrieval ran against
+    query_embedding: np.ndarray
+    chunks: List[Dict]
+    sources: List[Dict]
+    cached_response: Optional[str]  # set when the answer cache matched
 
 
 class RAGService:
     """RAG service for question answering with document retrieval."""
 
     def __init__(self):
-        # Initialize OpenAI client
-        if settings.openai_api_key:
-            self.openai_client = OpenAI(api_key=settings.openai_api_key)
-        else:
-            self.openai_client = None
+        # The OpenAI client is created on first use, once across threads
+        self.async_client_loader = LazyResource(
+            "async_openai_client",
+            lambda: AsyncOpenAI(
+                api_key=settings.openai_api_key, base_url=settings.openai_base_url
+            ),
+        )
+        if not settings.openai_api_key:
             print("Warning: OpenAI API key not set. Using mock responses.")
 
-    def generate_response(self, query: str, context_chunks: List[Dict]) -> str:
-        """Generate response using retrieved context and LLM."""
-        try:
-            # Prepare context from retrieved chunks
-            context = "\n\n".join(
-                [
-                    f"문서: {chunk['metadata']['filename']}\n내용: {chunk['text']}"
-                    for chunk in context_chunks
-                ]
+        self.reranker = reranker
+
+        # Exact-match caches keyed by query text
+        self.embedding_cache = TTLCache(
+            settings.query_cache_size, settings.query_cache_ttl
+        )
+        self.retrieval_cache = TTLCache(
+            settings.query_cache_size, settings.query_cache_ttl
+        )
+        # Answers for near-identical questions over an unchanged corpus
+        self.answer_cache = (
+            SemanticCache(
+                settings.semantic_cache_size,
+                settings.semantic_cache_ttl,
+                settings.semantic_cache_threshold,
+            )
+            if settings.semantic_cache_enabled
+            else None
+        )
+
+    @property
+    def async_openai_client(self) -> Optional[AsyncOpenAI]:
+        """Async OpenAI client, or None to use mock responses."""
+        if not settings.openai_api_key:
+            return None
+        return self.async_client_loader.get()
+
+    def invalidate_caches(self):
+        """Forget cached retrievals and answers after the corpus changed."""
+        self.retrieval_cache.clear()
+        if self.answer_cache:
+            self.answer_cache.clear()
+
+    def cache_stats(self) -> Dict:
+        """Return hit/miss counters of the query caches."""
+        return {
+            "query_embeddings": self.embedding_cache.stats(),
+            "retrievals": self.retrieval_cache.stats(),
+            "answers": self.answer_cache.stats() if self.answer_cache else None,
+        }
+
+    def corpus_fingerprint(self, db: Session) -> str:
+        """Return a value that changes whenever the searchable corpus changes.
+
+        Ingestion runs in worker processes, so this is read from the database
+        rather than tracked in memory.
+        """
+        count, chunks = (
+            db.query(func.count(Document.id), func.sum(Document.chunk_count))
+            .filter(Document.processed)
+            .one()
+        )
+        last_indexed = db.query(func.max(IngestionJob.finished_at)).scalar()
+        return f"{count}:{chunks or 0}:{last_indexed}"
+
+    async def _acomplete(self, query: str, context_chunks: List[Dict]) -> str:
+        """Generate response with the async LLM client, raising on failure."""
+        if self.async_openai_client:
+            response = await self.async_openai_client.chat.completions.create(
+                **self._completion_params(query, context_chunks)
             )
+            return response.choices[0].message.content.strip()
+        else:
+            return self._mock_response(query, context_chunks)
+
+    async def _astream(
+        self, query: str, context_chunks: List[Dict]
+    ) -> AsyncIterator[str]:
+        """Yield answer tokens as the LLM produces them."""
+        if not self.async_openai_client:
+            yield self._mock_response(query, context_chunks)
+            return
+
+        stream = await self.async_openai_client.chat.completions.create(
+            **self._completion_params(query, context_chunks), stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    def _completion_params(self, query: str, context_chunks: List[Dict]) -> Dict:
+        """Build chat completion arguments for a query and its context."""
+        # Prepare context from retrieved chunks
+        context = "\n\n".join(
+            [
+                f"문서: {chunk['metadata']['filename']}\n내용: {chunk['text']}"
+                for chunk in context_chunks
+            ]
+        )
 
-            # Create prompt for the LLM
-            prompt = f"""다음 문서들을 참고하여 질문에 답변해주세요.
+        # Create prompt for the LLM
+        prompt = f"""다음 문서들을 참고하여 질문에 답변해주세요.
 
 문서 내용:
 {context}
@@ -50,24 +162,19 @@ class RAGService:
 
 답변:"""
 
-            # Use OpenAI API if available, otherwise use mock response
-            if self.openai_client:
-                response = self.openai_client.chat.completions.create(
-                    model=settings.openai_model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "당신은 특허 문서 전문가입니다. 주어진 문서를 바탕으로 정확하고 도움이 되는 답변을 제공하세요.",
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                    max_tokens=1000,
-                    temperature=0.3,
-                )
-                return response.choices[0].message.content.strip()
-            else:
-                # Mock response for development
-                return f"""[개발 모드] 질문 '{query}'에 대한 답변입니다.
+        return {
+            "model": settings.openai_model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            "max_tokens": 1000,
+            "temperature": 0.3,
+        }
+
+    def _mock_response(self, query: str, context_chunks: List[Dict]) -> str:
+        """Mock response for development without an API key."""
+        return f"""[개발 모드] 질문 '{query}'에 대한 답변입니다.
 
 검색된 문서에서 관련 정보를 찾았습니다:
 {", ".join([chunk["metadata"]["filename"] for chunk in context_chunks])}
@@ -78,67 +185,282 @@ class RAGService:
 {context_chunks[0]["text"][:200] + "..." if context_chunks else "관련 문서를 찾지 못했습니다."}
 """
 
-        except Exception as e:
-            return f"답변 생성 중 오류가 발생했습니다: {str(e)}"
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """Return the query embedding, reusing it for repeated queries.
+
+        Waits on the query batcher without holding a thread.
+        """
+        embedding = self.embedding_cache.get(query)
+        if embedding is None:
+            embedding = await asyncio.wrap_future(
+                document_processor.submit_query(query)
+            )
+            self.embedding_cache.set(query, embedding)
+        return embedding
+
+    def retrieve(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        fingerprint: str,
+        n_results: int = 5,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[Dict]:
+        """Return the chunks most relevant to a query, cached per corpus state.
+
+        With a reranker, a larger candidate set is retrieved and the
+        cross-encoder keeps the best `settings.rerank_top_k` of it.
+        """
+        key = (query, n_results, fingerprint, filters)
+        chunks = self.retrieval_cache.get(key)
+        if chunks is None:
+            if self.reranker is None:
+                chunks = document_processor.search_similar_chunks(
+                    query=query,
+                    n_results=n_results,
+                    query_embedding=query_embedding,
+                    filters=filters,
+                )
+            else:
+                candidates = document_processor.search_similar_chunks(
+                    query=query,
+                    n_results=max(settings.rerank_candidates, n_results),
+                    query_embedding=query_embedding,
+                    filters=filters,
+                )
+                chunks, reranked = self.reranker.rerank(
+                    query, candidates, min(settings.rerank_top_k, n_results)
+                )
+                # A fallback ordering is not worth pinning in the cache
+                if not reranked:
+                    return chunks
+            self.retrieval_cache.set(key, chunks)
+        return chunks
+
+    def resolve_filters(
+        self, db: Session, filters: Optional[SearchFilters]
+    ) -> Optional[SearchFilters]:
+        """Turn a filename prefix into document ids, which Chroma can filter on."""
+        if filters is None or not filters.filename_prefix:
+            return filters
+        prefix = (
+            filters.filename_prefix.replace("\\", "\\\\")
+            .replace("%", "\\%")
+            .replace("_", "\\_")
+        )
+        ids = {
+            document_id
+            for (document_id,) in db.query(Document.id).filter(
+                Document.original_filename.like(f"{prefix}%", escape="\\")
+            )
+        }
+        if filters.document_ids is not None:
+            ids &= set(filters.document_ids)
+        return filters._replace(document_ids=tuple(sorted(ids)), filename_prefix=None)
+
+    def corpus_state(
+        self, db: Session, filters: Optional[SearchFilters] = None
+    ) -> Tuple[str, Optional[SearchFilters]]:
+        """Return the corpus fingerprint and the resolved filters."""
+        return self.corpus_fingerprint(db), self.resolve_filters(db, filters)
+
+    async def aretrieve_context(
+        self, db: Session, query: str, filters: Optional[SearchFilters] = None
+    ) -> Retrieval:
+        """Embed the query and find its sources, or a cached answer.
+
+        The database is read on the threadpool and the search runs on the
+        vector executor, so the event loop never blocks.
+        """
+        fingerprint, filters = await run_in_threadpool(self.corpus_state, db, filters)
+        query_embedding = await self.aembed_query(query)
+        return await vector_executor.run(
+            self.search_context, query, fingerprint, query_embedding, filters
+        )
+
+    def search_context(
+        self,
+        query: str,
+        fingerprint: str,
+        query_embedding: np.ndarray,
+        filters: Optional[SearchFilters] = None,
+    ) -> Retrieval:
+        """Search the corpus identified by `fingerprint` for an embedded query."""
+        # Answers are only reusable for the same corpus and the same filters
+        if filters is not None:
+            fingerprint = f"{fingerprint}:{filters}"
+
+        # Serve near-identical questions from the semantic answer cache
+        cached = (
+            self.answer_cache.lookup(query_embedding, fingerprint)
+            if self.answer_cache
+            else None
+        )
+        if cached:
+            response, sources = cached
+            return Retrieval(fingerprint, query_embedding, [], sources, response)
+
+        # Search for relevant chunks
+        relevant_chunks = self.retrieve(
+            query, query_embedding, fingerprint, filters=filters
+        )
+
+        # Prepare source information
+        sources = [
+            {
+                "filename": chunk["metadata"]["filename"],
+                "page_number": chunk["metadata"].get("page_number"),
+                "chunk_text": chunk["text"][:200] + "..."
+                if len(chunk["text"]) > 200
+                else chunk["text"],
+                "similarity": round(chunk["similarity"], 3),
+            }
+            for chunk in relevant_chunks
+        ]
+        return Retrieval(fingerprint, query_embedding, relevant_chunks, sources, None)
+
+    def remember_answer(self, retrieval: Retrieval, response: str):
+        """Store a successfully generated answer in the semantic cache."""
+        if self.answer_cache:
+            self.answer_cache.store(
+                retrieval.query_embedding,
+                retrieval.fingerprint,
+                (response, retrieval.sources),
+            )
 
-    def ask_question(self, db: Session, user: User, query: str) -> Dict:
-        """Process a question and return answer with sources."""
+    def record_answer(
+        self,
+        db: Session,
+        user_id: int,
+        query: str,
+        response: str,
+        retrieval: Retrieval,
+        start_time: datetime,
+    ) -> Dict:
+        """Save an answered question to search history and build the result."""
+        # Calculate response time
+        response_time = int((datetime.now() - start_time).total_seconds() * 1000)
+
+        # Save to search history
+        search_record = SearchHistory(
+            user_id=user_id,
+            query=query,
+            response=response,
+            sources=json.dumps(retrieval.sources, ensure_ascii=False),
+            response_time=response_time,
+        )
+        db.add(search_record)
+        db.commit()
+
+        return {
+            "query": query,
+            "response": response,
+            "sources": retrieval.sources,
+            "response_time": response_time,
+            "search_id": search_record.id,
+            "cached": retrieval.cached_response is not None,
+        }
+
+    async def aask_question(
+        self,
+        db: Session,
+        user: User,
+        query: str,
+        filters: Optional[SearchFilters] = None,
+    ) -> Dict:
+        """Process a question and return answer with sources.
+
+        The LLM is awaited through the async client, so waiting on it holds
+        neither the event loop nor a thread.
+        """
         start_time = datetime.now()
 
         try:
-            # Search for relevant chunks
-            relevant_chunks = document_processor.search_similar_chunks(
-                query=query, n_results=5
+            retrieval = await self.aretrieve_context(db, query, filters)
+            response = retrieval.cached_response
+            if response is None:
+                try:
+                    response = await self._acomplete(query, retrieval.chunks)
+                    self.remember_answer(retrieval, response)
+                except Exception as e:
+                    response = f"답변 생성 중 오류가 발생했습니다: {str(e)}"
+
+            return await run_in_threadpool(
+                self.record_answer, db, user.id, query, response, retrieval, start_time
             )
 
-            # Generate response
-            response = self.generate_response(query, relevant_chunks)
+        except ExecutorOverloaded:
+            raise
+        except Exception as e:
+            return self._error_result(query, e, start_time)
 
-            # Calculate response time
-            response_time = int((datetime.now() - start_time).total_seconds() * 1000)
+    async def stream_answer(
+        self, user_id: int, query: str, filters: Optional[SearchFilters] = None
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """Yield (event, data) pairs: sources first, then tokens, then done.
 
-            # Prepare source information
-            sources = [
+        Sources are sent as soon as retrieval finishes, so the client sees a
+        first byte after retrieval latency instead of full generation latency.
+        Uses its own session, as it outlives the request's dependencies.
+        """
+        start_time = datetime.now()
+        db = SessionLocal()
+        try:
+            retrieval = await self.aretrieve_context(db, query, filters)
+            yield (
+                "sources",
                 {
-                    "filename": chunk["metadata"]["filename"],
-                    "chunk_text": chunk["text"][:200] + "..."
-                    if len(chunk["text"]) > 200
-                    else chunk["text"],
-                    "similarity": round(chunk["similarity"], 3),
-                }
-                for chunk in relevant_chunks
-            ]
+                    "sources": retrieval.sources,
+                    "cached": retrieval.cached_response is not None,
+                },
+            )
+
+            response = retrieval.cached_response
+            if response is not None:
+                yield "token", {"text": response}
+            else:
+                parts = []
+                try:
+                    async for token in self._astream(query, retrieval.chunks):
+                        parts.append(token)
+                        yield "token", {"text": token}
+                    response = "".join(parts).strip()
+                    self.remember_answer(retrieval, response)
+                except Exception as e:
+                    response = f"답변 생성 중 오류가 발생했습니다: {str(e)}"
+                    yield "error", {"message": response}
 
-            # Save to search history
-            search_record = SearchHistory(
-                user_id=user.id,
-                query=query,
-                response=response,
-                sources=json.dumps(sources, ensure_ascii=False),
-                response_time=response_time,
+            result = await run_in_threadpool(
+                self.record_answer, db, user_id, query, response, retrieval, start_time
+            )
+            yield (
+                "done",
+                {
+                    "search_id": result["search_id"],
+                    "response_time": result["response_time"],
+                    "cached": result["cached"],
+                },
             )
-            db.add(search_record)
-            db.commit()
-
-            return {
-                "query": query,
-                "response": response,
-                "sources": sources,
-                "response_time": response_time,
-                "search_id": search_record.id,
-            }
 
+        except ExecutorOverloaded:
+            yield (
+                "error",
+                {"message": "서버가 혼잡합니다. 잠시 후 다시 시도해주세요."},
+            )
         except Exception as e:
-            error_msg = f"질문 처리 중 오류가 발생했습니다: {str(e)}"
-            return {
-                "query": query,
-                "response": error_msg,
-                "sources": [],
-                "response_time": int(
-                    (datetime.now() - start_time).total_seconds() * 1000
-                ),
-                "error": True,
-            }
+            yield "error", {"message": f"질문 처리 중 오류가 발생했습니다: {str(e)}"}
+        finally:
+            db.close()
+
+    def _error_result(self, query: str, error: Exception, start_time: datetime) -> Dict:
+        error_msg = f"질문 처리 중 오류가 발생했습니다: {str(error)}"
+        return {
+            "query": query,
+            "response": error_msg,
+            "sources": [],
+            "response_time": int((datetime.now() - start_time).total_seconds() * 1000),
+            "error": True,
+        }
 
     def get_search_history(
         self, db: Session, user: User, limit: int = 20
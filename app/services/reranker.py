@@ -0,0 +1,113 @@
+"""Cross-encoder reranking of retrieved chunks."""
+
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from sentence_transformers import CrossEncoder
+
+from app.config import settings
+from app.services.lazy_resource import LazyResource
+from app.services.metrics import LATENCY_BUCKETS_MS, Histogram
+
+
+class Reranker:
+    """Rescore retrieval candidates with a cross-encoder and keep the best.
+
+    Scoring runs in batches and stops at the latency budget; a query that
+    runs over it (or arrives while the model is still loading) keeps the
+    vector ordering instead, so reranking never stalls an answer.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 16, budget_ms: float = 300):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000
+        self.reranked = 0
+        self.over_budget = 0
+        self.not_loaded = 0
+        self.errors = 0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.model_loader = LazyResource("reranker_model", self._load_model)
+        self._warming = False
+
+    def _load_model(self) -> CrossEncoder:
+        print("Loading reranker model...")
+        model = CrossEncoder(self.model_name)
+        print("Reranker model loaded successfully")
+        return model
+
+    def warmup(self):
+        """Load the model in the background so the first queries are not held."""
+        self._warming = True
+        threading.Thread(
+            target=self._warmup, name="reranker-warmup", daemon=True
+        ).start()
+
+    def rerank(
+        self, query: str, chunks: List[Dict], top_k: int
+    ) -> Tuple[List[Dict], bool]:
+        """Return the `top_k` best chunks and whether the cross-encoder ranked them."""
+        if len(chunks) <= 1:
+            return chunks[:top_k], True
+        if not self.model_loader.loaded:
+            self.not_loaded += 1
+            if not self._warming:
+                self.warmup()
+            return chunks[:top_k], False
+
+        started = time.perf_counter()
+        scores: List[float] = []
+        try:
+            model = self.model_loader.get()
+            for start in range(0, len(chunks), self.batch_size):
+                if time.perf_counter() - started > self.budget:
+                    self.over_budget += 1
+                    return chunks[:top_k], False
+                batch = chunks[start : start + self.batch_size]
+                scores.extend(
+                    float(score)
+                    for score in model.predict(
+                        [(query, chunk["text"]) for chunk in batch]
+                    )
+                )
+        except Exception as e:
+            self.errors += 1
+            print(f"Reranking failed, keeping vector order: {e}")
+            return chunks[:top_k], False
+
+        self.reranked += 1
+        self.latency_ms.observe((time.perf_counter() - started) * 1000)
+        order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+        return [{**chunks[i], "rerank_score": scores[i]} for i in order[:top_k]], True
+
+    def stats(self) -> Dict:
+        """Return rerank/fallback counters and the scoring latency histogram."""
+        return {
+            "model": self.model_name,
+            "reranked": self.reranked,
+            "over_budget": self.over_budget,
+            "not_loaded": self.not_loaded,
+            "errors": self.errors,
+            "latency_ms": self.latency_ms.stats(),
+            "initialization": self.model_loader.stats(),
+        }
+
+    def _warmup(self):
+        try:
+            self.model_loader.get()
+        except Exception as e:
+            self._warming = False  # let a later query retry the load
+            print(f"Reranker warmup failed: {e}")
+
+
+# Global reranker instance, None unless reranking is enabled
+reranker = (
+    Reranker(
+        settings.rerank_model,
+        batch_size=settings.rerank_batch_size,
+        budget_ms=settings.rerank_budget_ms,
+    )
+    if settings.rerank_enabled
+    else None
+)
@@ -0,0 +1,444 @@
+"""Sharded vector storage across several Chroma collections."""
+
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+SHARD_BY_DOCUMENT = "document"
+SHARD_BY_YEAR = "year"
+UNDATED_SHARD = "undated"
+
+# Chunk fields that Chroma returns as one list per item
+_ITEM_FIELDS = ("ids", "embeddings", "documents", "metadatas")
+
+
+def document_id_of(chunk_id: str) -> int:
+    """Return the document id encoded in a `{document_id}_{index}` chunk id."""
+    return int(chunk_id.split("_", 1)[0])
+
+
+def plain_metadata(metadata: Optional[Dict]) -> Dict:
+    """Collection metadata without `hnsw:` keys, which `modify` rejects."""
+    return {
+        key: value
+        for key, value in (metadata or {}).items()
+        if not key.startswith("hnsw:")
+    }
+
+
+def hnsw_metadata_of(collection) -> Dict:
+    """The HNSW settings a collection was built with, as `hnsw:` metadata keys."""
+    config = (getattr(collection, "configuration_json", None) or {}).get("hnsw") or {}
+    keys = {
+        "space": "hnsw:space",
+        "ef_construction": "hnsw:construction_ef",
+        "ef_search": "hnsw:search_ef",
+        "max_neighbors": "hnsw:M",
+    }
+    return {keys[key]: value for key, value in config.items() if key in keys}
+
+
+def hnsw_metadata(metadata: Optional[Dict]) -> Dict:
+    """Only the `hnsw:` keys of collection metadata."""
+    return {
+        key: value for key, value in (metadata or {}).items() if key.startswith("hnsw:")
+    }
+
+
+def copy_collection(source, target, page_size: int = 1000) -> int:
+    """Copy every chunk, embeddings included, from one collection to another."""
+    copied = 0
+    while True:
+        page = source.get(
+            limit=page_size,
+            offset=copied,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not page["ids"]:
+            return copied
+        target.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+        )
+        copied += len(page["ids"])
+
+
+def rebuild_collection(
+    client, name: str, metadata: Optional[Dict] = None, page_size: int = 1000
+):
+    """Rebuild a collection's index by copying it into a fresh collection.
+
+    The copy is built under a temporary name and swapped in by rename, so an
+    interrupted rebuild leaves the original untouched. Writes that land on
+    the original while it is being copied are lost, so rebuild while
+    ingestion is idle. Returns the new collection.
+    """
+    source = client.get_collection(name)
+    temp_name = f"{name}__rebuild"
+    try:
+        client.delete_collection(temp_name)  # left over by an interrupted run
+    except Exception:
+        pass
+    if metadata is None:
+        metadata = {**plain_metadata(source.metadata), **hnsw_metadata_of(source)}
+    target = client.create_collection(temp_name, metadata=metadata)
+    copy_collection(source, target, page_size)
+    client.delete_collection(name)
+    target.modify(name=name)
+    return target
+
+
+class ShardedCollection:
+    """Chroma collection facade that spreads chunks over shard collections.
+
+    Chunks are routed by document id modulo the shard count, or by upload
+    year into per-year shards created on demand. Writes go to the owning
+    shard; reads fan out to the shards a `where` clause can match, in
+    parallel, and queries merge the per-shard top-k by distance. Each shard
+    keeps its own, bounded HNSW index and can be rebuilt on its own.
+    """
+
+    def __init__(
+        self,
+        client,
+        name: str,
+        shard_by: str = SHARD_BY_DOCUMENT,
+        shard_count: int = 1,
+        metadata: Optional[Dict] = None,
+        max_workers: int = 8,
+    ):
+        if shard_by not in (SHARD_BY_DOCUMENT, SHARD_BY_YEAR):
+            raise ValueError(f"Unknown shard key: {shard_by}")
+        self.client = client
+        self.name = name
+        self.shard_by = shard_by
+        self.shard_count = shard_count
+        self.layout = (
+            shard_by if shard_by == SHARD_BY_YEAR else f"{shard_by}:{shard_count}"
+        )
+        self._base_metadata = {**(metadata or {}), "shard_layout": self.layout}
+        self.shards: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="shard"
+        )
+
+        if shard_by == SHARD_BY_DOCUMENT:
+            for i in range(shard_count):
+                self._shard(f"{name}_{i}")
+        else:
+            self._refresh_shards()
+        self._rebalance()
+
+    # Routing
+
+    def shard_name(self, chunk_id: str, metadata: Optional[Dict] = None) -> str:
+        """Return the name of the shard that owns a chunk."""
+        if self.shard_by == SHARD_BY_DOCUMENT:
+            document_id = (
+                metadata["document_id"] if metadata else document_id_of(chunk_id)
+            )
+            return f"{self.name}_{document_id % self.shard_count}"
+        upload_ts = (metadata or {}).get("upload_ts")
+        if upload_ts is None:
+            return f"{self.name}_{UNDATED_SHARD}"
+        return f"{self.name}_{datetime.fromtimestamp(upload_ts, timezone.utc).year}"
+
+    def _is_year_shard(self, name: str) -> bool:
+        suffix = name[len(self.name) + 1 :]
+        return name.startswith(f"{self.name}_") and (
+            (suffix.isdigit() and len(suffix) == 4) or suffix == UNDATED_SHARD
+        )
+
+    def _refresh_shards(self):
+        """Pick up year shards created since, possibly by another process.
+
+        Ingestion workers create year shards on demand, so the web server
+        re-reads the collection list before each read instead of trusting
+        the shards it saw at startup.
+        """
+        if self.shard_by != SHARD_BY_YEAR:
+            return
+        for collection in self.client.list_collections():
+            if collection.name not in self.shards and self._is_year_shard(
+                collection.name
+            ):
+                self._shard(collection.name)
+
+    def _candidate_shards(self, where: Optional[Dict], ids=None) -> List[str]:
+        """Shards that can hold chunks matching `ids` and `where`."""
+        self._refresh_shards()
+        names = list(self.shards)
+        if ids is not None and self.shard_by == SHARD_BY_DOCUMENT:
+            names = sorted({self.shard_name(chunk_id) for chunk_id in ids})
+        clauses = where.get("$and", [where]) if where else []
+        for clause in clauses:
+            if self.shard_by == SHARD_BY_DOCUMENT and "document_id" in clause:
+                condition = clause["document_id"]
+                document_ids = (
+                    condition["$in"] if isinstance(condition, dict) else [condition]
+                )
+                wanted = {f"{self.name}_{i % self.shard_count}" for i in document_ids}
+                names = [name for name in names if name in wanted]
+            if self.shard_by == SHARD_BY_YEAR and "upload_ts" in clause:
+                names = [
+                    name
+                    for name in names
+                    if self._year_may_match(name, clause["upload_ts"])
+                ]
+        return [name for name in names if name in self.shards]
+
+    def _year_may_match(self, name: str, condition: Dict) -> bool:
+        suffix = name[len(self.name) + 1 :]
+        if suffix == UNDATED_SHARD:
+            return False  # undated chunks have no upload_ts to match
+        year = int(suffix)
+        start = datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()
+        end = datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+        if "$gte" in condition and end <= condition["$gte"]:
+            return False
+        if "$lt" in condition and start >= condition["$lt"]:
+            return False
+        return True
+
+    def _shard(self, name: str):
+        collection = self.shards.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self.shards.get(name)
+                if collection is None:
+                    collection = self.client.get_or_create_collection(
+                        name=name, metadata=self._base_metadata
+                    )
+                    self.shards[name] = collection
+        return collection
+
+    def _group(self, ids: Sequence[str], metadatas=None) -> Dict[str, List[int]]:
+        groups: Dict[str, List[int]] = defaultdict(list)
+        for position, chunk_id in enumerate(ids):
+            metadata = metadatas[position] if metadatas is not None else None
+            groups[self.shard_name(chunk_id, metadata)].append(position)
+        return groups
+
+    def _map(self, names: Iterable[str], call: Callable) -> List:
+        names = list(names)
+        if len(names) <= 1:
+            return [call(self.shards[name]) for name in names]
+        return list(self._pool.map(lambda name: call(self.shards[name]), names))
+
+    # Collection API
+
+    @property
+    def metadata(self) -> Dict:
+        shard = next(iter(self.shards.values()), None)
+        return shard.metadata if shard is not None else self._base_metadata
+
+    @property
+    def configuration_json(self) -> Optional[Dict]:
+        shard = next(iter(self.shards.values()), None)
+        return shard.configuration_json if shard is not None else None
+
+    def modify(self, metadata: Dict):
+        """Set the metadata of every shard, and of shards created later."""
+        self._base_metadata = {
+            **metadata,
+            **hnsw_metadata(self._base_metadata),
+            "shard_layout": self.layout,
+        }
+        for shard in self.shards.values():
+            shard.modify(metadata=plain_metadata(self._base_metadata))
+
+    def count(self) -> int:
+        self._refresh_shards()
+        return sum(self._map(self.shards, lambda shard: shard.count()))
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._write("add", ids, embeddings, documents, metadatas)
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._write("upsert", ids, embeddings, documents, metadatas)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        self._write("update", ids, embeddings, documents, metadatas)
+
+    def delete(self, ids):
+        if self.shard_by == SHARD_BY_DOCUMENT:
+            for name, positions in self._group(ids).items():
+                self._shard(name).delete(ids=[ids[p] for p in positions])
+        else:
+            self._refresh_shards()
+            self._map(self.shards, lambda shard: shard.delete(ids=list(ids)))
+
+    def get(self, ids=None, where=None, limit=None, offset=None, **kwargs) -> Dict:
+        names = self._candidate_shards(where, ids)
+        kwargs.update(where=where)
+        if ids is not None:
+            kwargs.update(ids=list(ids))
+        if limit is None and not offset:
+            return _merge_items(self._map(names, lambda shard: shard.get(**kwargs)))
+
+        # Page through the shards in a fixed order; offsets count every chunk
+        # of a shard, so only page without `where`
+        offset = offset or 0
+        remaining = limit
+        pages = []
+        for name in names:
+            if remaining is not None and remaining <= 0:
+                break
+            size = self.shards[name].count()
+            if offset >= size:
+                offset -= size
+                continue
+            page = self.shards[name].get(limit=remaining, offset=offset, **kwargs)
+            pages.append(page)
+            offset = 0
+            if remaining is not None:
+                remaining -= len(page["ids"])
+        return _merge_items(pages)
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, **kwargs):
+        """Query every candidate shard in parallel and merge the top-k."""
+        names = self._candidate_shards(where)
+        include = kwargs.get("include")
+        if include is not None and "distances" not in include:
+            kwargs["include"] = [*include, "distances"]  # needed to merge
+        results = self._map(
+            names,
+            lambda shard: shard.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                **kwargs,
+            ),
+        )
+        return _merge_queries(results, len(query_embeddings), n_results)
+
+    # Maintenance
+
+    def rebuild_shard(self, name: str) -> int:
+        """Rebuild one shard's index; return its chunk count."""
+        if name not in self.shards:
+            raise ValueError(f"Unknown shard: {name}")
+        with self._lock:
+            self.shards[name] = rebuild_collection(
+                self.client, name, self._base_metadata
+            )
+        return self.shards[name].count()
+
+    def stats(self) -> Dict:
+        """Return the layout and chunk count of every shard."""
+        self._refresh_shards()
+        names = list(self.shards)
+        counts = self._map(names, lambda shard: shard.count())
+        return {"layout": self.layout, "shards": dict(zip(names, counts))}
+
+    def _write(self, method, ids, embeddings, documents, metadatas):
+        for name, positions in self._group(ids, metadatas).items():
+            columns = {
+                "embeddings": embeddings,
+                "documents": documents,
+                "metadatas": metadatas,
+            }
+            getattr(self._shard(name), method)(
+                ids=[ids[p] for p in positions],
+                **{
+                    key: values[positions]
+                    if isinstance(values, np.ndarray)
+                    else [values[p] for p in positions]
+                    for key, values in columns.items()
+                    if values is not None
+                },
+            )
+
+    def _rebalance(self, page_size: int = 1000):
+        """Move chunks out of collections written under another layout.
+
+        Covers the unsharded `name` collection and shards left by a different
+        shard count or key; collections outside the layout are dropped once
+        empty.
+        """
+        sources = [
+            collection
+            for collection in self.client.list_collections()
+            if collection.name == self.name
+            or (
+                collection.name.startswith(f"{self.name}_")
+                and "__" not in collection.name
+            )
+        ]
+        for source in sources:
+            source = self.client.get_collection(source.name)
+            if (source.metadata or {}).get("shard_layout") == self.layout:
+                continue
+            ids = source.get(include=[])["ids"]
+            moved = 0
+            for start in range(0, len(ids), page_size):
+                page = source.get(
+                    ids=ids[start : start + page_size],
+                    include=["embeddings", "documents", "metadatas"],
+                )
+                misplaced = [
+                    i
+                    for i, (chunk_id, metadata) in enumerate(
+                        zip(page["ids"], page["metadatas"])
+                    )
+                    if self.shard_name(chunk_id, metadata) != source.name
+                ]
+                if not misplaced:
+                    continue
+                self.upsert(
+                    ids=[page["ids"][i] for i in misplaced],
+                    embeddings=[page["embeddings"][i] for i in misplaced],
+                    documents=[page["documents"][i] for i in misplaced],
+                    metadatas=[page["metadatas"][i] for i in misplaced],
+                )
+                source.delete(ids=[page["ids"][i] for i in misplaced])
+                moved += len(misplaced)
+            if source.name in self.shards:
+                source.modify(
+                    metadata={
+                        **plain_metadata(source.metadata),
+                        "shard_layout": self.layout,
+                    }
+                )
+                self.shards[source.name] = self.client.get_collection(source.name)
+            elif source.count() == 0:
+                self.client.delete_collection(source.name)
+            if moved:
+                print(f"Moved {moved} chunks from {source.name} into shards")
+
+
+def _merge_items(results: List[Dict]) -> Dict:
+    merged = {field: [] for field in _ITEM_FIELDS}
+    for result in results:
+        for field in _ITEM_FIELDS:
+            values = result.get(field)
+            if values is not None:
+                merged[field].extend(list(values))
+    return merged
+
+
+def _merge_queries(results: List[Dict], query_count: int, n_results: int) -> Dict:
+    fields = ("ids", "embeddings", "documents", "metadatas", "distances")
+    merged = {field: [] for field in fields}
+    for q in range(query_count):
+        hits = []
+        for result in results:
+            for i, distance in enumerate(result["distances"][q]):
+                hits.append((distance, result, i))
+        hits.sort(key=lambda hit: hit[0])
+        for field in fields:
+            merged[field].append(
+                [
+                    result[field][q][i]
+                    for _, result, i in hits[:n_results]
+                    if result.get(field) is not None
+                ]
+            )
+    return merged
@@ -0,0 +1,25 @@
+"""SQLite files shared by the web server and the ingestion worker processes."""
+
+import os
+import sqlite3
+
+# Placeholders per statement, well under SQLite's default variable limit
+SQLITE_MAX_VARS = 500
+
+
+def connect_shared_sqlite(path: str, **kwargs) -> sqlite3.Connection:
+    """Open a SQLite file that several processes read and write.
+
+    The web server and every ingestion worker process open the same files
+    (embedding cache, keyword index, chunk store, OCR cache, vector store
+    sidecar). WAL lets readers go on while one writer commits, and writers
+    wait up to 30 seconds for the write lock instead of failing. The
+    connection may be used from several threads, so callers serialize on
+    their own lock. Creates the parent directory if needed.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
@@ -0,0 +1,1067 @@
+"""Vector store backends for chunk embeddings, text and metadata."""
+
+import json
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+from app.services.index_maintenance import collection_space, pairwise_distances
+from app.services.sharding import (
+    SHARD_BY_DOCUMENT,
+    SHARD_BY_YEAR,
+    ShardedCollection,
+    copy_collection,
+    hnsw_metadata,
+    hnsw_metadata_of,
+    plain_metadata,
+    rebuild_collection,
+)
+from app.services.shared_sqlite import SQLITE_MAX_VARS, connect_shared_sqlite
+
+BACKEND_CHROMA = "chroma"
+BACKEND_NUMPY = "numpy"
+
+_GET_INCLUDE = ("metadatas", "documents")
+_QUERY_INCLUDE = ("metadatas", "documents", "distances")
+
+
+def matches_where(metadata: Optional[Dict], where: Optional[Dict]) -> bool:
+    """Evaluate a Chroma `where` clause against one chunk's metadata."""
+    if not where:
+        return True
+    if metadata is None:
+        return False
+    if "$and" in where:
+        return all(matches_where(metadata, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches_where(metadata, clause) for clause in where["$or"])
+    for key, condition in where.items():
+        if key not in metadata:
+            return False
+        value = metadata[key]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if not {
+                "$eq": lambda: value == operand,
+                "$ne": lambda: value != operand,
+                "$gt": lambda: value > operand,
+                "$gte": lambda: value >= operand,
+                "$lt": lambda: value < operand,
+                "$lte": lambda: value <= operand,
+                "$in": lambda: value in operand,
+                "$nin": lambda: value not in operand,
+            }[op]():
+                return False
+    return True
+
+
+class VectorStore(ABC):
+    """Chunk storage with nearest-neighbor search.
+
+    The interface is the part of Chroma's collection API the app uses, so
+    the processor and the index maintenance helpers work with any backend.
+    Results come back in Chroma's shape: `get` returns one list per field,
+    `query` one list per query embedding.
+    """
+
+    name: str
+
+    @property
+    @abstractmethod
+    def space(self) -> str:
+        """Distance function: "l2" (squared), "cosine" or "ip"."""
+
+    @property
+    @abstractmethod
+    def metadata(self) -> Dict:
+        """Store-level metadata."""
+
+    @abstractmethod
+    def modify(self, metadata: Dict):
+        """Replace the store-level metadata."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks."""
+
+    @abstractmethod
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        """Store new chunks; ids that already exist are left unchanged."""
+
+    @abstractmethod
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        """Store chunks, replacing existing ones with the same id."""
+
+    @abstractmethod
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        """Change fields of existing chunks; metadata is merged."""
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]):
+        """Remove chunks by id."""
+
+    @abstractmethod
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = _GET_INCLUDE,
+    ) -> Dict:
+        """Fetch chunks by id and/or metadata filter, in storage order."""
+
+    @abstractmethod
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = _QUERY_INCLUDE,
+    ) -> Dict:
+        """Return the nearest chunks to each query embedding."""
+
+    def shard(self, name: Optional[str] = None):
+        """The part of the store named `name` (default: all of it)."""
+        if name and name != self.name:
+            raise ValueError(f"Unknown shard: {name}")
+        return self
+
+    @abstractmethod
+    def rebuild(self, shard: Optional[str] = None) -> Dict[str, int]:
+        """Rebuild and compact the index; return chunk counts per rebuilt part."""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Backend name and chunk counts per part."""
+
+
+class ChromaVectorStore(VectorStore):
+    """Chunks in Chroma HNSW collections, optionally sharded.
+
+    `metadata` carries the `hnsw:` parameters new (and rebuilt) collections
+    are created with. `prepare` is called on each existing collection before
+    chunks are moved into shards, so it can add the metadata routing needs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        metadata: Dict,
+        shard_by: str = SHARD_BY_DOCUMENT,
+        shard_count: int = 1,
+        prepare: Optional[Callable] = None,
+    ):
+        self.name = name
+        self._created_metadata = metadata
+        self.client = chromadb.PersistentClient(
+            path=path, settings=Settings(anonymized_telemetry=False)
+        )
+        if shard_count > 1 or shard_by == SHARD_BY_YEAR:
+            if prepare is not None:
+                for existing in self.client.list_collections():
+                    if existing.name.startswith(name):
+                        prepare(self.client.get_collection(existing.name))
+            self.collection = ShardedCollection(
+                self.client,
+                name,
+                shard_by=shard_by,
+                shard_count=shard_count,
+                metadata=metadata,
+            )
+        else:
+            self.collection = self.client.get_or_create_collection(
+                name=name, metadata=metadata
+            )
+            self._merge_shards()
+        self._sync_hnsw()
+
+    @property
+    def sharded(self) -> bool:
+        return isinstance(self.collection, ShardedCollection)
+
+    def _merge_shards(self):
+        """Fold shard collections from an earlier sharded setup back in."""
+        for existing in self.client.list_collections():
+            existing = self.client.get_collection(existing.name)
+            if existing.name.startswith(f"{self.name}_") and (
+                existing.metadata or {}
+            ).get("shard_layout"):
+                moved = copy_collection(existing, self.collection)
+                self.client.delete_collection(existing.name)
+                print(f"Merged {moved} chunks from shard {existing.name}")
+
+    def _sync_hnsw(self):
+        """Apply the configured ef_search and flag indexes built differently."""
+        collections = (
+            list(self.collection.shards.values()) if self.sharded else [self.collection]
+        )
+        wanted = hnsw_metadata(self._created_metadata)
+        search_ef = wanted.get("hnsw:search_ef")
+        for each in collections:
+            built = hnsw_metadata_of(each)
+            if search_ef is not None and built.get("hnsw:search_ef") not in (
+                None,
+                search_ef,
+            ):
+                try:
+                    each.modify(configuration={"hnsw": {"ef_search": search_ef}})
+                except Exception as e:
+                    print(f"Failed to set ef_search on {each.name}: {e}")
+            stale = [
+                key
+                for key in ("hnsw:space", "hnsw:construction_ef", "hnsw:M")
+                if key in built and key in wanted and built[key] != wanted[key]
+            ]
+            if stale:
+                print(
+                    f"{each.name} was built with different {', '.join(stale)}; "
+                    "run `python manage.py rebuild-index` to apply the settings"
+                )
+
+    @property
+    def space(self) -> str:
+        return collection_space(self.collection)
+
+    @property
+    def metadata(self) -> Dict:
+        return self.collection.metadata or {}
+
+    @property
+    def configuration_json(self) -> Optional[Dict]:
+        return self.collection.configuration_json
+
+    def modify(self, metadata: Dict):
+        if self.sharded:
+            self.collection.modify(metadata=metadata)
+        else:
+            self.collection.modify(metadata=plain_metadata(metadata))
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self.collection.add(
+            ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+        )
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self.collection.upsert(
+            ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+        )
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        self.collection.update(
+            ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+        )
+
+    def delete(self, ids: Sequence[str]):
+        self.collection.delete(ids=ids)
+
+    def get(
+        self, ids=None, where=None, limit=None, offset=None, include=_GET_INCLUDE
+    ) -> Dict:
+        return self.collection.get(
+            ids=ids, where=where, limit=limit, offset=offset, include=list(include)
+        )
+
+    def query(
+        self, query_embeddings, n_results=10, where=None, include=_QUERY_INCLUDE
+    ) -> Dict:
+        return self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=list(include),
+        )
+
+    def shard(self, name: Optional[str] = None):
+        if self.sharded and name:
+            if name not in self.collection.shards:
+                raise ValueError(f"Unknown shard: {name}")
+            return self.collection.shards[name]
+        return super().shard(name)
+
+    def rebuild(self, shard: Optional[str] = None) -> Dict[str, int]:
+        """Copy chunks into fresh collections built with the configured HNSW
+        parameters, which also drops the tombstones deletes leave behind."""
+        self.shard(shard)  # validate the name
+        if self.sharded:
+            names = [shard] if shard else list(self.collection.shards)
+            return {name: self.collection.rebuild_shard(name) for name in names}
+        self.collection = rebuild_collection(
+            self.client,
+            self.name,
+            {
+                **plain_metadata(self.collection.metadata),
+                **hnsw_metadata(self._created_metadata),
+            },
+        )
+        return {self.name: self.collection.count()}
+
+    def stats(self) -> Dict:
+        if self.sharded:
+            return {"backend": BACKEND_CHROMA, **self.collection.stats()}
+        return {
+            "backend": BACKEND_CHROMA,
+            "layout": None,
+            "shards": {self.name: self.collection.count()},
+        }
+
+
+class NumpyVectorStore(VectorStore):
+    """Flat-scan store: a memory-mapped matrix plus a SQLite sidecar.
+
+    Embeddings are rows of a `.npy` file mapped into memory; ids, text and
+    metadata live in SQLite next to it. A query is a blocked matrix-vector
+    product over all rows and an `argpartition` top-k, so cost grows
+    linearly with the corpus, which beats HNSW up to a few hundred thousand
+    chunks. float32 rows give exact results.
+
+    float16 halves and int8 quarters the matrix. int8 stores each dimension
+    scaled by a calibrated range (the 99.99th percentile of absolute values),
+    so queries multiply by the scales instead of dequantizing rows. Ingestion
+    writes a few dozen chunks at a time, too few to calibrate on, so until
+    the scales have seen `calibration_rows` rows a float32 copy is kept and
+    the store is recalibrated and requantized from it whenever it doubles;
+    rebuilds recalibrate on everything stored. With `rescore`, the float32
+    copy is kept for good in a second file that is never scanned: the
+    quantized scan picks `rescore` times k candidates and only their
+    original rows are read to rank them exactly.
+
+    Rows are appended; deletes leave holes until `rebuild` compacts them.
+    Matrices grow by copying into new files whose names SQLite records in
+    the same transaction as the rows, so a crash never pairs rows with the
+    wrong matrix. Writers in every process serialize on the SQLite write
+    lock.
+    Every write transaction stamps the rows it writes or deletes with a
+    sequence number, so other processes catch up by reading just those rows.
+    Only a rebuild or recalibration, which rewrite every row, bump the
+    generation and make them reload everything; a query scored against the
+    previous generation's row numbers is scored again.
+    """
+
+    calibration_rows = 10000  # int8 scales are final once measured on this many
+
+    def __init__(
+        self,
+        path: str,
+        space: str = "l2",
+        dtype: str = "float32",
+        name: str = "vectors",
+        rescore: int = 0,
+        block_rows: int = 4096,
+    ):
+        if space not in ("l2", "cosine", "ip"):
+            raise ValueError(f"Unknown distance function: {space}")
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.rescore = rescore if self.dtype != np.float32 else 0
+        self.block_rows = block_rows  # small blocks keep upcasts in cache
+        self._space = space
+        self._lock = threading.RLock()
+        self._conn = connect_shared_sqlite(
+            os.path.join(path, "store.db"),
+            isolation_level=None,  # transactions are explicit
+        )
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT,
+                seq INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        columns = [info[1] for info in self._conn.execute("PRAGMA table_info(chunks)")]
+        if "seq" not in columns:
+            self._conn.execute(
+                "ALTER TABLE chunks ADD COLUMN seq INTEGER NOT NULL DEFAULT 0"
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_seq ON chunks (seq)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS deleted_rows (
+                row INTEGER PRIMARY KEY,
+                seq INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.execute("COMMIT")
+        self._data_version = None
+        self._generation = 0  # bumped by every full load, which may renumber rows
+        self._refresh()
+        if self._matrix is not None and self._matrix.dtype != self.dtype:
+            print(
+                f"{self.name} stores {self._matrix.dtype} vectors; "
+                f"run `python manage.py rebuild-index` to convert to {self.dtype}"
+            )
+        if self._matrix is not None and self.rescore and self._originals is None:
+            print(
+                f"{self.name} has no float32 copy to rescore with; "
+                "re-index documents to enable rescoring"
+            )
+
+    # Persistence
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def _bump_generation(self):
+        """Make other processes reload everything instead of catching up."""
+        self._set_meta("generation", str(int(self._meta("generation") or 0) + 1))
+
+    def _refresh(self):
+        """Catch up if another process committed since we last looked."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        snapshot = not self._conn.in_transaction
+        if snapshot:  # read the meta and the rows as of one commit
+            self._conn.execute("BEGIN")
+        try:
+            if (
+                self._data_version is None
+                or self._meta("generation") != self._stored_generation
+            ):
+                self._load()
+            else:
+                self._catch_up()
+        finally:
+            if snapshot:
+                self._conn.execute("COMMIT")
+        self._data_version = version
+
+    def _open_array(self, key: str) -> Optional[np.ndarray]:
+        name = self._meta(key)
+        if not name:
+            return None
+        return np.load(os.path.join(self.path, name), mmap_mode="r+")
+
+    def _load(self):
+        """Read every row; at startup and after rows were rewritten."""
+        self._generation += 1
+        self._stored_generation = self._meta("generation")
+        self._seq = int(self._meta("seq") or 0)
+        self._files = {key: self._meta(key) for key in ("matrix", "originals")}
+        rows = self._conn.execute(
+            "SELECT row, id, metadata FROM chunks ORDER BY row"
+        ).fetchall()
+        # Deleted rows are not reused before a rebuild, or catching up could
+        # apply a deletion to the row's next chunk
+        last_deleted = self._conn.execute("SELECT MAX(row) FROM deleted_rows")
+        last_deleted = last_deleted.fetchone()[0]
+        self._matrix = self._open_array("matrix")
+        self._originals = self._open_array("originals")
+        scales = self._meta("scales")
+        self._scales = np.asarray(json.loads(scales), np.float32) if scales else None
+        # Stores quantized before calibration was tracked count as calibrated
+        calibrated = self._meta("calibrated_rows")
+        self._calibrated_rows = int(calibrated or self.calibration_rows)
+        self._size = max(
+            rows[-1][0] + 1 if rows else 0,
+            last_deleted + 1 if last_deleted is not None else 0,
+        )
+        self._ids: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._resize(len(self._matrix) if self._matrix is not None else 0)
+        self._rows: Dict[str, int] = {}
+        for row, chunk_id, metadata in rows:
+            self._ids[row] = chunk_id
+            self._metadatas[row] = json.loads(metadata) if metadata else None
+            self._alive[row] = True
+            self._rows[chunk_id] = row
+        for start in range(0, self._size, self.block_rows):
+            block = self._decode(self._matrix[start : start + self.block_rows])
+            self._norms[start : start + len(block)] = self._norm(block)
+
+    def _catch_up(self):
+        """Apply the rows other processes wrote or deleted since `_seq`."""
+        seq = int(self._meta("seq") or 0)
+        if seq == self._seq:
+            return
+        files = {key: self._meta(key) for key in ("matrix", "originals")}
+        if files["matrix"] != self._files["matrix"]:  # grown, or first written
+            self._matrix = self._open_array("matrix")
+            scales = self._meta("scales")
+            self._scales = (
+                np.asarray(json.loads(scales), np.float32) if scales else None
+            )
+            calibrated = self._meta("calibrated_rows")
+            self._calibrated_rows = int(calibrated or self.calibration_rows)
+        if files["originals"] != self._files["originals"]:
+            self._originals = self._open_array("originals")
+        self._files = files
+        self._resize(len(self._matrix) if self._matrix is not None else 0)
+
+        written = self._conn.execute(
+            "SELECT row, id, metadata FROM chunks WHERE seq > ? ORDER BY row",
+            (self._seq,),
+        ).fetchall()
+        for row, chunk_id, metadata in written:
+            self._ids[row] = chunk_id
+            self._metadatas[row] = json.loads(metadata) if metadata else None
+            self._alive[row] = True
+            self._rows[chunk_id] = row
+            self._size = max(self._size, row + 1)
+        rows = np.asarray([row for row, _, _ in written], dtype=np.int64)
+        for start in range(0, len(rows), self.block_rows):
+            block = rows[start : start + self.block_rows]
+            self._norms[block] = self._norm(self._decode(self._matrix[block]))
+
+        deleted = self._conn.execute(
+            "SELECT row FROM deleted_rows WHERE seq > ?", (self._seq,)
+        ).fetchall()
+        for (row,) in deleted:
+            chunk_id = self._ids[row]
+            if chunk_id is not None and self._rows.get(chunk_id) == row:
+                del self._rows[chunk_id]
+            self._ids[row] = None
+            self._metadatas[row] = None
+            self._alive[row] = False
+            self._size = max(self._size, row + 1)
+        self._seq = seq
+
+    def _resize(self, capacity: int):
+        """Grow the in-memory row state to `capacity` rows."""
+        grow = capacity - len(self._ids)
+        if grow > 0:
+            self._ids.extend([None] * grow)
+            self._metadatas.extend([None] * grow)
+            self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+            self._norms = np.concatenate(
+                [self._norms, np.zeros(grow, dtype=np.float32)]
+            )
+
+    def _norm(self, vectors: np.ndarray) -> np.ndarray:
+        squared = np.einsum("ij,ij->i", vectors, vectors)
+        return np.sqrt(squared) if self._space == "cosine" else squared
+
+    # Quantization
+
+    @staticmethod
+    def _calibrate(vectors: np.ndarray, sample: int = calibration_rows) -> np.ndarray:
+        """Per-dimension int8 scales from a sample of float32 vectors."""
+        if len(vectors) > sample:
+            picked = np.random.default_rng(0).choice(len(vectors), sample, False)
+            vectors = vectors[np.sort(picked)]
+        vectors = np.asarray(vectors[:], dtype=np.float32)
+        limit = np.percentile(np.abs(vectors), 99.99, axis=0)
+        return (np.maximum(limit, 1e-6) / 127).astype(np.float32)
+
+    def _encode(self, vectors: np.ndarray, dtype, scales=None) -> np.ndarray:
+        """Convert float32 vectors to the stored representation."""
+        if dtype != np.int8:
+            return vectors.astype(dtype)
+        scales = self._scales if scales is None else scales
+        return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+
+    def _decode(self, stored: np.ndarray, scales=None) -> np.ndarray:
+        """Convert stored rows back to (approximate) float32 vectors."""
+        vectors = np.asarray(stored, dtype=np.float32)
+        if stored.dtype == np.int8:
+            vectors *= self._scales if scales is None else scales
+        return vectors
+
+    def _recalibrate(self, matrix, originals, end: int, files: Dict[str, str]):
+        """Recalibrate int8 scales on the float32 copy of the first `end` rows
+        and requantize them; call inside the write transaction."""
+        scales = self._calibrate(originals[:end])
+        if "matrix" not in files:  # readers still scan the current file
+            files["matrix"] = self._new_array([], len(matrix), matrix.shape[1], np.int8)
+            matrix = np.load(os.path.join(self.path, files["matrix"]), "r+")
+        for start in range(0, end, self.block_rows):
+            stop = min(start + self.block_rows, end)
+            matrix[start:stop] = self._encode(originals[start:stop], np.int8, scales)
+        matrix.flush()
+        self._set_meta("scales", json.dumps(scales.tolist()))
+        self._set_meta("calibrated_rows", str(end))
+        self._bump_generation()
+        if end >= self.calibration_rows and not self.rescore:
+            if files.get("originals"):  # grown in this same write
+                os.remove(os.path.join(self.path, files["originals"]))
+            files["originals"] = ""
+
+    # Writes
+
+    def _new_array(self, source, capacity: int, dim: int, dtype) -> str:
+        """Write `source` rows into a new array file with room for `capacity`."""
+        name = f"vectors-{uuid.uuid4().hex[:12]}.npy"
+        array = np.lib.format.open_memmap(
+            os.path.join(self.path, name),
+            mode="w+",
+            dtype=dtype,
+            shape=(capacity, dim),
+        )
+        for start in range(0, len(source), self.block_rows):
+            end = min(start + self.block_rows, len(source))
+            array[start:end] = source[start:end]
+        array.flush()
+        del array
+        return name
+
+    def _transaction(self, change: Callable[[], Optional[Dict[str, str]]]):
+        """Run `change` in a write transaction, then drop replaced arrays.
+
+        `change` returns the files of new arrays it wrote by meta key
+        ("matrix", "originals"; "" for none); they are recorded in the same
+        transaction and removed on rollback. Rows it writes or deletes are
+        stamped with `self._write_seq`.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            new_files: Dict[str, str] = {}
+            try:
+                self._refresh()
+                old_files = {key: self._meta(key) for key in ("matrix", "originals")}
+                self._write_seq = int(self._meta("seq") or 0) + 1
+                new_files = change() or {}
+                for key, name in new_files.items():
+                    self._set_meta(key, name)
+                self._set_meta("seq", str(self._write_seq))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                for name in filter(None, new_files.values()):
+                    os.remove(os.path.join(self.path, name))
+                self._data_version = None  # reload rather than trust memory
+                raise
+            self._seq = self._write_seq
+            self._files.update(new_files)
+            for key in new_files:
+                if old_files.get(key):
+                    try:
+                        os.remove(os.path.join(self.path, old_files[key]))
+                    except OSError:
+                        pass  # still mapped by another process on some platforms
+
+    def _write(self, ids, embeddings, documents, metadatas, replace: bool):
+        """Insert, or with `replace` also overwrite, chunks."""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        written = []
+        recalibrated = []
+
+        def change():
+            rows, positions = [], []
+            end = self._size
+            for position, chunk_id in enumerate(ids):
+                row = self._rows.get(chunk_id)
+                if row is not None and not replace:
+                    continue
+                if row is None:
+                    row, end = end, end + 1
+                rows.append(row)
+                positions.append(position)
+            if not rows:
+                return None
+
+            files = {}
+            dim = embeddings.shape[1]
+            matrix, originals = self._matrix, self._originals
+            if matrix is None:
+                capacity = max(end, 1024)
+                files["matrix"] = self._new_array([], capacity, dim, self.dtype)
+                if self.rescore or self.dtype == np.int8:
+                    files["originals"] = self._new_array([], capacity, dim, np.float32)
+                if self.dtype == np.int8:
+                    self._scales = self._calibrate(embeddings)
+                    self._calibrated_rows = end
+                    self._set_meta("scales", json.dumps(self._scales.tolist()))
+                    self._set_meta("calibrated_rows", str(end))
+            elif end > len(matrix):
+                capacity = max(end, 2 * len(matrix))
+                files["matrix"] = self._new_array(
+                    matrix[: self._size], capacity, dim, matrix.dtype
+                )
+                if originals is not None:
+                    files["originals"] = self._new_array(
+                        originals[: self._size], capacity, dim, np.float32
+                    )
+            if "matrix" in files:
+                matrix = np.load(os.path.join(self.path, files["matrix"]), "r+")
+            if "originals" in files:
+                originals = np.load(os.path.join(self.path, files["originals"]), "r+")
+            if matrix.shape[1] != dim:
+                raise ValueError(
+                    f"Embedding dimension {dim} does not match the store's "
+                    f"{matrix.shape[1]}"
+                )
+
+            matrix[rows] = self._encode(embeddings[positions], matrix.dtype)
+            matrix.flush()
+            if originals is not None:
+                originals[rows] = embeddings[positions]
+                originals.flush()
+            if (
+                matrix.dtype == np.int8
+                and originals is not None
+                and self._calibrated_rows < self.calibration_rows
+                and end >= 2 * self._calibrated_rows
+            ):
+                self._recalibrate(matrix, originals, end, files)
+                recalibrated.append(True)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata, seq) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        row,
+                        ids[position],
+                        documents[position] if documents is not None else None,
+                        json.dumps(metadatas[position], ensure_ascii=False)
+                        if metadatas is not None
+                        else None,
+                        self._write_seq,
+                    )
+                    for row, position in zip(rows, positions)
+                ],
+            )
+            written.extend([matrix, originals, rows, positions, end])
+            return files
+
+        with self._lock:
+            self._transaction(change)
+            if recalibrated:  # every row changed; reload the requantized matrix
+                self._data_version = None
+                self._refresh()
+                return
+            if not written:
+                return
+            matrix, originals, rows, positions, end = written
+            self._matrix, self._originals = matrix, originals
+            self._resize(len(matrix))
+            for row, position in zip(rows, positions):
+                self._ids[row] = ids[position]
+                self._rows[ids[position]] = row
+                self._metadatas[row] = (
+                    metadatas[position] if metadatas is not None else None
+                )
+                self._alive[row] = True
+            # Norms of the stored values, which are what queries are scored on
+            self._norms[rows] = self._norm(self._decode(matrix[rows]))
+            self._size = max(self._size, end)
+
+    # Store API
+
+    @property
+    def space(self) -> str:
+        return self._space
+
+    @property
+    def metadata(self) -> Dict:
+        with self._lock:
+            value = self._meta("metadata")
+        return json.loads(value) if value else {}
+
+    def modify(self, metadata: Dict):
+        with self._lock:
+            self._set_meta("metadata", json.dumps(metadata, ensure_ascii=False))
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, replace=False)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._write(ids, embeddings, documents, metadatas, replace=True)
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None):
+        with self._lock:
+            self._refresh()
+            existing = [i for i, chunk_id in enumerate(ids) if chunk_id in self._rows]
+            if not existing:
+                return
+            current = self.get(
+                ids=[ids[i] for i in existing],
+                include=["embeddings", "documents", "metadatas"],
+            )
+            self._write(
+                current["ids"],
+                np.asarray(embeddings, dtype=np.float32)[existing]
+                if embeddings is not None
+                else current["embeddings"],
+                [documents[i] for i in existing]
+                if documents is not None
+                else current["documents"],
+                [
+                    {**(old or {}), **metadatas[i]}
+                    for old, i in zip(current["metadatas"], existing)
+                ]
+                if metadatas is not None
+                else current["metadatas"],
+                replace=True,
+            )
+
+    def delete(self, ids: Sequence[str]):
+        rows: List[int] = []
+
+        def change():
+            rows.extend(self._rows[i] for i in ids if i in self._rows)
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE row = ?", [(row,) for row in rows]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO deleted_rows (row, seq) VALUES (?, ?)",
+                [(row, self._write_seq) for row in rows],
+            )
+
+        with self._lock:
+            self._transaction(change)
+            for row in rows:
+                del self._rows[self._ids[row]]
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._alive[row] = False
+
+    def _select(self, ids, where) -> np.ndarray:
+        """Rows holding chunks that match `ids` and `where`; call under the lock."""
+        if ids is not None:
+            rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+        else:
+            rows = np.flatnonzero(self._alive[: self._size])
+        if where:
+            rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+        return np.asarray(rows, dtype=np.int64)
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        """The most precise float32 vectors held for `rows`."""
+        if self._originals is not None:
+            return np.asarray(self._originals[rows], dtype=np.float32)
+        return self._decode(self._matrix[rows])
+
+    def _result(self, rows: np.ndarray, include: Sequence[str]) -> Dict:
+        """Chroma-style fields for `rows`; call under the lock."""
+        result: Dict = {"ids": [self._ids[row] for row in rows]}
+        result["embeddings"] = None
+        if "embeddings" in include:
+            result["embeddings"] = (
+                self._vectors(rows) if len(rows) else np.empty((0, 0), dtype=np.float32)
+            )
+        result["metadatas"] = None
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[row] for row in rows]
+        result["documents"] = None
+        if "documents" in include:
+            # By id: another process's rebuild may have renumbered the rows
+            found = {}
+            for start in range(0, len(rows), SQLITE_MAX_VARS):
+                batch = result["ids"][start : start + SQLITE_MAX_VARS]
+                found.update(
+                    self._conn.execute(
+                        "SELECT id, document FROM chunks WHERE id IN "
+                        f"({','.join('?' * len(batch))})",
+                        batch,
+                    ).fetchall()
+                )
+            result["documents"] = [found.get(chunk_id) for chunk_id in result["ids"]]
+        return result
+
+    def get(
+        self, ids=None, where=None, limit=None, offset=None, include=_GET_INCLUDE
+    ) -> Dict:
+        with self._lock:
+            self._refresh()
+            rows = self._select(ids, where)
+            start = offset or 0
+            rows = rows[start : start + limit if limit is not None else None]
+            return self._result(rows, include)
+
+    def query(
+        self, query_embeddings, n_results=10, where=None, include=_QUERY_INCLUDE
+    ) -> Dict:
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        while True:
+            with self._lock:
+                self._refresh()
+                generation = self._generation
+                matrix, norms, size = self._matrix, self._norms, self._size
+                originals, scales = self._originals, self._scales
+                if matrix is None:  # nothing stored yet
+                    empty = (np.empty(0, dtype=np.int64), np.empty(0, np.float32))
+                    return self._query_results([empty] * len(queries), include)
+                if where:
+                    rows = self._select(None, where)
+                else:
+                    rows = None
+                    alive = self._alive[:size].copy()
+
+            # Score outside the lock so concurrent queries overlap; int8 rows
+            # are scored against the query scaled per dimension, not decoded
+            scan = queries * scales if matrix.dtype == np.int8 else queries
+            if rows is not None:
+                distances = self._distances(queries, scan, matrix[rows], norms[rows])
+            else:
+                distances = np.empty((len(queries), size), dtype=np.float32)
+                for start in range(0, size, self.block_rows):
+                    end = min(start + self.block_rows, size)
+                    distances[:, start:end] = self._distances(
+                        queries, scan, matrix[start:end], norms[start:end]
+                    )
+                if alive.all():
+                    rows = np.arange(size)
+                else:
+                    rows = np.flatnonzero(alive)
+                    distances = distances[:, rows]
+
+            k = min(n_results, len(rows))
+            rescore = self.rescore if originals is not None else 0
+            candidates = min(k * rescore, len(rows)) if rescore else k
+            tops = []
+            for query, row_distances in zip(queries, distances):
+                top = (
+                    np.argpartition(row_distances, candidates - 1)[:candidates]
+                    if k
+                    else rows[:0]
+                )
+                top_distances = row_distances[top]
+                if rescore and k:
+                    top_distances = pairwise_distances(
+                        query, originals[rows[top]], self._space
+                    )[0]
+                order = np.argsort(top_distances, kind="stable")[:k]
+                tops.append((rows[top[order]], top_distances[order]))
+
+            with self._lock:
+                self._refresh()
+                if self._generation == generation:
+                    return self._query_results(tops, include)
+            # A rebuild renumbered the rows while we scored them; score again
+
+    def _query_results(self, tops, include: Sequence[str]) -> Dict:
+        """Chroma-style query results from (rows, distances) per query; call
+        under the lock, in the generation the rows were scored in."""
+        fields = ("ids", "documents", "metadatas", "embeddings", "distances")
+        results: Dict = {field: [] for field in fields}
+        for rows, distances in tops:
+            still_alive = self._alive[rows]  # deleted while scoring
+            found = self._result(rows[still_alive], include)
+            for field in ("ids", "documents", "metadatas", "embeddings"):
+                results[field].append(found[field])
+            results["distances"].append(distances[still_alive].tolist())
+        for field in fields[1:]:
+            if field not in include:
+                results[field] = None
+        return results
+
+    def _distances(
+        self,
+        queries: np.ndarray,
+        scan: np.ndarray,
+        stored: np.ndarray,
+        norms: np.ndarray,
+    ) -> np.ndarray:
+        dots = scan @ np.asarray(stored, dtype=np.float32).T
+        if self._space == "ip":
+            return 1 - dots
+        if self._space == "cosine":
+            query_norms = np.linalg.norm(queries, axis=1)[:, np.newaxis]
+            return 1 - dots / np.maximum(query_norms * norms, 1e-12)
+        return np.sum(queries**2, axis=1)[:, np.newaxis] - 2 * dots + norms
+
+    def rebuild(self, shard: Optional[str] = None) -> Dict[str, int]:
+        """Compact deleted rows, apply the configured dtype and rescore copy,
+        and recalibrate int8 scales on everything stored."""
+        self.shard(shard)  # validate the name
+
+        def change():
+            if self._matrix is None:
+                return None
+            alive = np.flatnonzero(self._alive[: self._size])
+            capacity, dim = max(len(alive), 1024), self._matrix.shape[1]
+            vectors = _Rows(alive, self._vectors)
+            scales = None
+            if self.dtype == np.int8 and len(alive):
+                scales = self._calibrate(vectors)
+                self._set_meta("scales", json.dumps(scales.tolist()))
+                self._set_meta("calibrated_rows", str(len(alive)))
+            calibrating = self.dtype == np.int8 and len(alive) < self.calibration_rows
+            files = {
+                "matrix": self._new_array(
+                    _Rows(
+                        alive,
+                        lambda rows: self._encode(
+                            self._vectors(rows), self.dtype, scales
+                        ),
+                    ),
+                    capacity,
+                    dim,
+                    self.dtype,
+                ),
+                "originals": "",
+            }
+            if (self.rescore and self._originals is not None) or calibrating:
+                files["originals"] = self._new_array(vectors, capacity, dim, np.float32)
+            # Renumber rows; going through negatives keeps the key unique
+            self._conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(-new - 1, int(old)) for new, old in enumerate(alive)],
+            )
+            self._conn.execute("UPDATE chunks SET row = -row - 1")
+            self._conn.execute("DELETE FROM deleted_rows")
+            self._bump_generation()
+            return files
+
+        with self._lock:
+            self._transaction(change)
+            self._data_version = None  # reload into the compacted matrix
+            self._refresh()
+            return {self.name: len(self._rows)}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            matrix, originals = self._matrix, self._originals
+            return {
+                "backend": BACKEND_NUMPY,
+                "layout": None,
+                "shards": {self.name: len(self._rows)},
+                "dtype": str(matrix.dtype if matrix is not None else self.dtype),
+                "rescore": self.rescore if originals is not None else 0,
+                "deleted_rows": self._size - len(self._rows),
+                "matrix_bytes": int(matrix.nbytes) if matrix is not None else 0,
+                "originals_bytes": int(originals.nbytes)
+                if originals is not None
+                else 0,
+            }
+
+
+class _Rows:
+    """Sliceable view of selected rows, loaded block by block by `load`."""
+
+    def __init__(self, rows: np.ndarray, load: Callable[[np.ndarray], np.ndarray]):
+        self.rows = rows
+        self.load = load
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index: slice) -> np.ndarray:
+        return self.load(self.rows[index])
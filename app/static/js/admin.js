@@ -116,12 +116,14 @@ function renderDocuments() {
                     <span class="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium ${
                         doc.processed ? 
                         'bg-green-100 text-green-800' : 
+                        doc.processing_status === 'failed' ?
+                        'bg-red-100 text-red-800' :
                         'bg-yellow-100 text-yellow-800'
                     }">
-                        <i class="fas ${doc.processed ? 'fa-check-circle' : 'fa-clock'} mr-1"></i>
-                        ${doc.processed ? '처리완료' : '처리중'}
+                        <i class="fas ${doc.processed ? 'fa-check-circle' : doc.processing_status === 'failed' ? 'fa-exclamation-circle' : 'fa-clock'} mr-1"></i>
+                        ${processingStatusLabel(doc)}
                     </span>
-                    ${!doc.processed ? `
+                    ${!doc.processed && !['queued', 'running'].includes(doc.processing_status) ? `
                     <button onclick="processDocument(${doc.id})" 
                             class="text-blue-600 hover:text-blue-800 p-2" 
                             title="문서 처리">
@@ -317,20 +319,47 @@ function hideDeleteModal() {
     deleteDocumentId = null;
 }
 
+// Processing status label
+function processingStatusLabel(doc) {
+    if (doc.processed) return '처리완료';
+    switch (doc.processing_status) {
+        case 'queued': return '대기중';
+        case 'running': return '처리중';
+        case 'failed': return '처리실패';
+        default: return '미처리';
+    }
+}
+
+// Poll document status until its ingestion job finishes
+async function waitForProcessing(documentId, intervalMs = 2000) {
+    while (true) {
+        const response = await axios.get(`/api/documents/${documentId}/status`);
+        if (['done', 'failed'].includes(response.data.status)) {
+            return response.data;
+        }
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
 // Process document
 async function processDocument(documentId) {
     try {
         showMessage('문서 처리를 시작합니다...', 'info');
         
-        const response = await axios.post(`/api/documents/${documentId}/process`, {}, {
-            timeout: 300000 // 5 minutes timeout
-        });
+        await axios.post(`/api/documents/${documentId}/process`);
+        await loadDocuments();
+        
+        const result = await waitForProcessing(documentId);
         
         // Reload documents and stats
         await loadDocuments();
         await loadStats();
         
-        showMessage(response.data.message, 'success');
+        if (result.status === 'failed') {
+            showMessage(result.error || '문서 처리에 실패했습니다.', 'error');
+        } else {
+            showMessage('문서 처리가 완료되었습니다.', 'success');
+        }
         
     } catch (error) {
         console.error('Process error:', error);
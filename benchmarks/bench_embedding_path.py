@@ -0,0 +1,80 @@
+"""Benchmark storing embeddings as NumPy arrays vs. Python float lists.
+
+Replays the ingest loop of `DocumentProcessor._store_groups` with a
+synthetic encoder, once converting each batch with `.tolist()` as the
+processor used to and once handing the array to the store as is.
+Time is measured without tracing; peak memory in a second, traced run.
+
+Usage:
+    python -m benchmarks.bench_embedding_path [--chunks 10000] [--dim 384]
+                                              [--batch 64] [--backend chroma]
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.services.vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+def _ingest(store, chunks: int, dim: int, batch: int, as_lists: bool):
+    rng = np.random.default_rng(0)
+    for start in range(0, chunks, batch):
+        ids = [str(i) for i in range(start, min(start + batch, chunks))]
+        embeddings = rng.standard_normal((len(ids), dim), dtype=np.float32)
+        store.upsert(
+            ids=ids,
+            embeddings=embeddings.tolist() if as_lists else embeddings,
+            documents=[f"chunk {i}" for i in ids],
+            metadatas=[{"document_id": int(i) // 100} for i in ids],
+        )
+
+
+def _run(args, as_lists: bool, traced: bool):
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.backend == "numpy":
+            store = NumpyVectorStore(tmp)
+        else:
+            store = ChromaVectorStore(tmp, "bench", metadata={})
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        _ingest(store, args.chunks, args.dim, args.batch, as_lists)
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma")
+    args = parser.parse_args()
+
+    print(f"chunks: {args.chunks}, dim: {args.dim}, batch: {args.batch}")
+    results = {}
+    for label, as_lists in (("lists", True), ("arrays", False)):
+        elapsed, _ = _run(args, as_lists, traced=False)
+        _, peak = _run(args, as_lists, traced=True)
+        results[label] = elapsed, peak
+        print(
+            f"{label:<7} {elapsed:.2f}s ({args.chunks / elapsed:.0f} chunks/s), "
+            f"peak traced {peak / 2**20:.1f} MB"
+        )
+    (list_time, list_peak), (array_time, array_peak) = results.values()
+    print(
+        f"arrays: {list_time / array_time:.2f}x faster, "
+        f"{list_peak / max(array_peak, 1):.1f}x lower peak"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark serial vs. page-parallel PDF text extraction.
+
+Usage:
+    python -m benchmarks.bench_pdf_extraction [--pages 400] [--workers 4] [PDF]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from app.services.document_processor import DocumentProcessor
+from benchmarks.pdf_fixtures import make_text_pdf
+
+
+def _timed(processor: DocumentProcessor, path: str, workers: int):
+    start = time.perf_counter()
+    pages = processor.extract_pages_from_pdf(path, workers=workers)
+    return time.perf_counter() - start, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf", nargs="?", help="PDF to extract (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf or make_text_pdf(os.path.join(tmp, "bench.pdf"), args.pages)
+
+        serial = min(_timed(processor, path, 1)[0] for _ in range(args.repeat))
+        runs = [_timed(processor, path, args.workers) for _ in range(args.repeat)]
+        parallel = min(elapsed for elapsed, _ in runs)
+        pages = runs[0][1]
+
+        assert [p.text for p in pages] == [
+            p.text for p in processor.extract_pages_from_pdf(path, workers=1)
+        ], "parallel extraction changed page order or content"
+
+    print(f"pages:    {len(pages)}")
+    print(f"serial:   {serial:.3f}s ({len(pages) / serial:.1f} pages/s)")
+    print(
+        f"parallel: {parallel:.3f}s ({len(pages) / parallel:.1f} pages/s, "
+        f"{args.workers} workers)"
+    )
+    print(f"speedup:  {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark vector store backends and quantization on synthetic embeddings.
+
+"scan MB" is the matrix a query reads (HNSW's graph is not counted), and
+"disk MB" everything on disk, including any float32 copy kept for rescoring.
+
+Usage:
+    python -m benchmarks.bench_vector_store [--chunks 20000] [--dim 384]
+                                            [--queries 200] [--k 10] [--rescore 4]
+                                            [--batch 64]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.index_maintenance import evaluate_index, pairwise_distances
+from app.services.vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+def make_embeddings(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors around a few hundred topics, like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(count // 50, 1), dim))
+    vectors = topics[rng.integers(len(topics), size=count)]
+    vectors += rng.normal(scale=0.6, size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _size_on_disk(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _fill(store, embeddings: np.ndarray, batch: int) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(embeddings), batch):
+        ids = [str(i) for i in range(offset, min(offset + batch, len(embeddings)))]
+        store.add(
+            ids=ids,
+            embeddings=embeddings[offset : offset + batch],
+            documents=[f"chunk {i}" for i in ids],
+            metadatas=[{"document_id": int(i) // 20} for i in ids],
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=4)
+    # Ingestion stores this many chunks per write (INGEST_BATCH_SIZE)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    embeddings = make_embeddings(args.chunks, args.dim)
+    queries = make_embeddings(args.queries, args.dim, seed=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "chroma (hnsw)": lambda path: ChromaVectorStore(
+                path, "bench", metadata={"hnsw:space": "cosine"}
+            ),
+            "numpy float32": lambda path: NumpyVectorStore(path, space="cosine"),
+            "numpy float16": lambda path: NumpyVectorStore(
+                path, space="cosine", dtype="float16"
+            ),
+            "numpy int8": lambda path: NumpyVectorStore(
+                path, space="cosine", dtype="int8"
+            ),
+            "numpy int8 rescore": lambda path: NumpyVectorStore(
+                path, space="cosine", dtype="int8", rescore=args.rescore
+            ),
+        }
+        distances = pairwise_distances(queries, embeddings, "cosine")
+        truth = [[str(i) for i in row] for row in np.argsort(distances)[:, : args.k]]
+        print(
+            f"chunks: {args.chunks}, dim: {args.dim}, queries: {args.queries}, "
+            f"batch: {args.batch}"
+        )
+        print(
+            f"{'backend':<19} {'ingest/s':>9} {'scan MB':>8} {'disk MB':>8} "
+            f"{'recall@k':>9} {'p50 ms':>7} {'p95 ms':>7}"
+        )
+        for i, (name, open_store) in enumerate(backends.items()):
+            path = os.path.join(tmp, str(i))
+            store = open_store(path)
+            ingest = _fill(store, embeddings, args.batch)
+            dtype = np.dtype(store.stats().get("dtype", "float32"))
+            report = evaluate_index(store, queries, truth, args.k)
+            print(
+                f"{name:<19} {args.chunks / ingest:>9.0f} "
+                f"{embeddings.size * dtype.itemsize / 2**20:>8.1f} "
+                f"{_size_on_disk(path) / 2**20:>8.1f} {report['recall']:>9.3f} "
+                f"{report['latency_ms']['p50']:>7.2f} "
+                f"{report['latency_ms']['p95']:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
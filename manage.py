@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pat.AI 관리 명령
+
+Usage:
+    python manage.py rebuild-index [--shard NAME] [--sample 200] [--k 10]
+                                   [--queries FILE]
+    python manage.py index-dir DIRECTORY [--workers N] [--batch-documents N]
+                                         [--batch-size N] [--extract-workers N]
+                                         [--ocr-workers N] [--no-recursive]
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+from app.config import settings
+from app.models import init_db
+from app.models.database import SessionLocal
+from app.services.bulk_ingest import BulkStager, stage_directory
+from app.services.document_processor import document_processor
+from app.services.job_queue import WorkerPool, job_queue
+
+
+def rebuild_index(args):
+    """Rebuild the vector index offline and print the recall/latency report."""
+    queries = None
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    report = document_processor.rebuild_index(
+        args.shard, sample=args.sample, k=args.k, queries=queries
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+def index_dir(args):
+    """Register the PDFs under a directory and ingest them with worker processes."""
+    directory = Path(args.directory)
+    if not directory.is_dir():
+        raise SystemExit(f"Not a directory: {directory}")
+
+    # Share the cores between workers instead of each taking all of them
+    cores_per_worker = max(1, (os.cpu_count() or 1) // args.workers)
+    extract_workers = args.extract_workers
+    if extract_workers is None and not settings.pdf_extract_workers:
+        extract_workers = cores_per_worker
+    ocr_workers = args.ocr_workers
+    if ocr_workers is None:
+        ocr_workers = min(settings.ocr_workers or cores_per_worker, cores_per_worker)
+    # Spawned workers read their settings from the environment
+    overrides = {
+        "ingest_batch_size": args.batch_size,
+        "ingestion_batch_documents": args.batch_documents,
+        "pdf_extract_workers": extract_workers,
+        "ocr_workers": ocr_workers,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            os.environ[name.upper()] = str(value)
+            setattr(settings, name, value)
+
+    db = SessionLocal()
+    try:
+        stager = BulkStager(settings.upload_path)
+        try:
+            skipped = stage_directory(db, stager, directory, args.recursive)
+        except BaseException:
+            stager.discard()
+            raise
+        documents, duplicates, batch_id = stager.register(db)
+        print(
+            f"Registered {len(documents)} new PDF(s), skipped {len(duplicates)} "
+            f"already in the library and {skipped} unchanged file(s) taken in "
+            f"before, rejected {len(stager.rejected)}"
+        )
+        for entry in stager.rejected:
+            print(f"  rejected {entry['filename']}: {entry['reason']}")
+
+        # Jobs of an interrupted run resume after their last stored chunk
+        requeued = job_queue.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} interrupted ingestion job(s)")
+
+        pool = WorkerPool(
+            args.workers, settings.ingestion_poll_interval, exit_when_idle=True
+        )
+        pool.start()
+        try:
+            while not pool.wait(args.progress_interval):
+                if batch_id:
+                    db.expire_all()
+                    batch = job_queue.batch_status(db, batch_id)
+                    print(
+                        f"{batch['counts']} pages/s={batch['pages_per_second']} "
+                        f"chunks/s={batch['chunks_per_second']}"
+                    )
+        except KeyboardInterrupt:
+            pool.stop()
+            raise SystemExit("Interrupted; run the command again to resume")
+
+        if batch_id:
+            db.expire_all()
+            report = job_queue.batch_status(db, batch_id)
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pat.AI management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser(
+        "rebuild-index",
+        help="rebuild/compact the vector index with the configured HNSW settings",
+        description="Stop the server first: running workers keep handles to the "
+        "collections being replaced.",
+    )
+    rebuild.add_argument("--shard", help="only rebuild this shard collection")
+    rebuild.add_argument(
+        "--sample",
+        type=int,
+        default=200,
+        help="stored embeddings to evaluate recall/latency with (0 to skip)",
+    )
+    rebuild.add_argument("--k", type=int, default=10, help="neighbors for recall@k")
+    rebuild.add_argument("--queries", help="file of held-out query texts, one per line")
+    rebuild.set_defaults(handler=rebuild_index)
+
+    index = commands.add_parser(
+        "index-dir",
+        help="register and ingest every PDF (and zip/tar of PDFs) in a directory",
+        description="Files are copied into the upload directory, skipping ones "
+        "already indexed, and ingested by worker processes until the queue is "
+        "empty. Re-running resumes an interrupted load. Jobs left running are "
+        "requeued, so stop the server's ingestion workers first.",
+    )
+    index.add_argument("directory", help="directory to scan for PDFs")
+    index.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, settings.ingestion_workers),
+        help="ingestion worker processes, each with its own embedding model",
+    )
+    index.add_argument(
+        "--batch-documents", type=int, help="documents a worker embeds together"
+    )
+    index.add_argument(
+        "--batch-size", type=int, help="chunks embedded and stored per batch"
+    )
+    index.add_argument(
+        "--extract-workers",
+        type=int,
+        help="PDF page extraction processes per worker (default: cores / workers)",
+    )
+    index.add_argument(
+        "--ocr-workers",
+        type=int,
+        help="OCR processes per worker (default: OCR_WORKERS, at most cores / workers)",
+    )
+    index.add_argument(
+        "--no-recursive",
+        dest="recursive",
+        action="store_false",
+        help="only scan the top level of the directory",
+    )
+    index.add_argument(
+        "--progress-interval",
+        type=float,
+        default=10.0,
+        help="seconds between progress reports",
+    )
+    index.set_defaults(handler=index_dir)
+
+    args = parser.parse_args()
+    init_db()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Shared test fixtures."""
+
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+MOCK_ANSWER_TOKENS = ["청구항 1은", " 센서를", " 포함합니다."]
+
+
+def _mock_openai_app() -> FastAPI:
+    """Minimal OpenAI-compatible chat completions server."""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests.append(body)
+        base = {"id": "chatcmpl-mock", "created": 0, "model": body["model"]}
+
+        if not body.get("stream"):
+            return {
+                **base,
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": "".join(MOCK_ANSWER_TOKENS),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+
+        async def events():
+            for token in MOCK_ANSWER_TOKENS:
+                chunk = {
+                    **base,
+                    "object": "chat.completion.chunk",
+                    "choices": [
+                        {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                    ],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app.state.requests = []
+    app.state.tokens = MOCK_ANSWER_TOKENS
+    return app
+
+
+@pytest.fixture(scope="session")
+def mock_openai_server():
+    """Run the mock OpenAI server on a free local port; yields (base_url, app)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    app = _mock_openai_app()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    yield f"http://127.0.0.1:{port}/v1", app
+
+    server.should_exit = True
+    thread.join(timeout=5)
@@ -0,0 +1,226 @@
+"""Tests for bulk ingestion staging and registration."""
+
+import asyncio
+import io
+import os
+import tarfile
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base, Document, IngestionJob
+from app.services.bulk_ingest import (
+    BulkStager,
+    FileTooLarge,
+    InvalidPdf,
+    copy_stream,
+    stage_directory,
+    stream_upload,
+)
+
+PDF = b"%PDF-1.4 patent"
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'bulk.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class AsyncReader:
+    """Async stand-in for an UploadFile that records how much was read."""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    async def read(self, size=-1):
+        return self.stream.read(size)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def _tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+class TestBulkStager:
+    """Test cases for BulkStager class."""
+
+    def test_stages_pdfs_from_archives_under_fresh_names(self, tmp_path):
+        stager = BulkStager(str(tmp_path / "uploads"))
+        stager.add(
+            "set.zip",
+            None,
+            _zip({"../../evil.pdf": PDF + b"1", "notes.txt": b"x", "bad.pdf": b"no"}),
+        )
+        stager.add("set.tar.gz", None, _tar({"a/one.pdf": PDF + b"2"}))
+        stager.add("plain.pdf", None, io.BytesIO(PDF + b"3"))
+        stager.add("broken.zip", None, io.BytesIO(b"not a zip"))
+
+        assert [item.original_filename for item in stager.staged] == [
+            "evil.pdf",
+            "one.pdf",
+            "plain.pdf",
+        ]
+        assert all(
+            os.path.dirname(item.file_path) == str(tmp_path / "uploads")
+            for item in stager.staged
+        )
+        assert [entry["filename"] for entry in stager.rejected] == [
+            "set.zip/bad.pdf",
+            "broken.zip",
+        ]
+
+    def test_archive_limit_counts_extracted_bytes(self, tmp_path):
+        stager = BulkStager(str(tmp_path))
+        members = {f"{i}.pdf": PDF + bytes([i]) * 1000 for i in range(3)}
+
+        # No declared size to check up front, as for a streamed upload
+        with patch("app.services.bulk_ingest.settings.max_archive_size", 2500):
+            stager.add("set.zip", None, _zip(members))
+
+        assert [item.original_filename for item in stager.staged] == [
+            "0.pdf",
+            "1.pdf",
+        ]
+        assert stager.rejected == [
+            {"filename": "set.zip/2.pdf", "reason": "archive too large"}
+        ]
+
+    def test_register_skips_duplicates_in_one_transaction(
+        self, tmp_path, session_factory
+    ):
+        db = session_factory()
+        first = BulkStager(str(tmp_path))
+        first.add("a.pdf", None, io.BytesIO(PDF + b"a"))
+        first.register(db)
+
+        stager = BulkStager(str(tmp_path))
+        for name, data in [("a2.pdf", b"a"), ("b.pdf", b"b"), ("b2.pdf", b"b")]:
+            stager.add(name, None, io.BytesIO(PDF + data))
+        documents, duplicates, batch_id = stager.register(db, uploaded_by=None)
+
+        assert [d.original_filename for d in documents] == ["b.pdf"]
+        assert [d.original_filename for d in duplicates] == ["a.pdf"]
+        assert stager.rejected == [
+            {"filename": "b2.pdf", "reason": "repeated in upload"}
+        ]
+        assert documents[0].batch_id == batch_id
+        assert documents[0].processing_status == "queued"
+        assert db.query(Document).count() == 2
+        assert db.query(IngestionJob).count() == 2
+        assert len(os.listdir(tmp_path)) == 3  # two PDFs plus the database
+        db.close()
+
+
+class TestStreamingCopy:
+    """Test cases for the streaming copy helpers."""
+
+    def test_stream_upload_hashes_while_copying(self, tmp_path):
+        data = PDF + b"x" * (3 * 1024 * 1024)
+        path = tmp_path / "a.pdf"
+
+        size, content_hash = asyncio.run(stream_upload(AsyncReader(data), str(path)))
+
+        assert size == len(data)
+        assert path.read_bytes() == data
+        assert content_hash == copy_stream(io.BytesIO(data), str(tmp_path / "b.pdf"))[1]
+
+    def test_stream_upload_rejects_bogus_file_before_writing(self, tmp_path):
+        path = tmp_path / "a.pdf"
+        reader = AsyncReader(b"MZ" + b"x" * (3 * 1024 * 1024))
+
+        with pytest.raises(InvalidPdf):
+            asyncio.run(stream_upload(reader, str(path)))
+
+        assert not path.exists()
+        assert reader.stream.tell() == 1024 * 1024  # only the first block read
+
+    def test_stream_upload_stops_at_size_limit(self, tmp_path):
+        path = tmp_path / "a.pdf"
+        reader = AsyncReader(PDF + b"x" * (5 * 1024 * 1024))
+
+        with pytest.raises(FileTooLarge):
+            asyncio.run(stream_upload(reader, str(path), limit=2 * 1024 * 1024))
+
+        assert not path.exists()
+        assert reader.stream.tell() == 3 * 1024 * 1024
+
+
+class FailingReader:
+    """Stream that breaks mid-upload, like an encrypted zip member."""
+
+    def read(self, size=-1):
+        raise RuntimeError("File is encrypted, password required for extraction")
+
+
+class TestStageBulkUpload:
+    """Test cases for stage_bulk_upload function."""
+
+    def test_removes_staged_files_when_staging_fails(self, tmp_path):
+        from app.api.documents import stage_bulk_upload
+
+        files = [
+            SimpleNamespace(filename="a.pdf", size=None, file=io.BytesIO(PDF)),
+            SimpleNamespace(filename="b.pdf", size=None, file=FailingReader()),
+        ]
+        with patch("app.api.documents.settings.upload_path", str(tmp_path)):
+            with pytest.raises(RuntimeError):
+                stage_bulk_upload(files)
+
+        assert os.listdir(tmp_path) == []
+
+
+class TestStageDirectory:
+    """Test cases for stage_directory function."""
+
+    def test_resumed_load_skips_unchanged_files_before_copying(
+        self, tmp_path, session_factory
+    ):
+        source = tmp_path / "patents"
+        (source / "2023").mkdir(parents=True)
+        (source / "a.pdf").write_bytes(PDF + b" a")
+        (source / "2023" / "b.pdf").write_bytes(PDF + b" b")
+        (source / "notes.pdf").write_bytes(b"not a pdf")
+        upload = str(tmp_path / "uploads")
+
+        db = session_factory()
+        stager = BulkStager(upload)
+        assert stage_directory(db, stager, source) == 0
+        documents, _, _ = stager.register(db)
+        assert sorted(d.original_filename for d in documents) == ["a.pdf", "b.pdf"]
+
+        (source / "a.pdf").write_bytes(PDF + b" a, revised")
+        stager = BulkStager(upload)
+        with patch("app.services.bulk_ingest.copy_stream", wraps=copy_stream) as copy:
+            # b.pdf is skipped; the rejected notes.pdf is looked at again
+            assert stage_directory(db, stager, source) == 1
+        documents, _, _ = stager.register(db)
+
+        assert copy.call_count == 2
+        assert [d.original_filename for d in documents] == ["a.pdf"]
+        assert stager.rejected == [
+            {"filename": "notes.pdf", "reason": "not a valid PDF"}
+        ]
+        db.close()
@@ -0,0 +1,52 @@
+"""Tests for the compressed chunk text store."""
+
+import os
+import tempfile
+
+import pytest
+
+from app.services.chunk_store import ChunkStore
+
+
+@pytest.fixture
+def store():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield ChunkStore(os.path.join(tmp, "chunks.db"), cache_blocks=1)
+
+
+class TestChunkStore:
+    """Test cases for ChunkStore class."""
+
+    def test_round_trips_text_across_blocks(self, store):
+        store.add_chunks(1, ["1_0", "1_1"], ["센서 융합 시스템", "claim 1. A device"])
+        store.add_chunks(2, ["2_0"], [""])
+
+        assert store.get_many(["1_1", "missing", "2_0", "1_0"]) == [
+            "claim 1. A device",
+            None,
+            "",
+            "센서 융합 시스템",
+        ]
+        assert store.count() == 3
+
+    def test_compresses_repetitive_text(self, store):
+        texts = [f"청구항 {i}. 센서를 포함하는 장치에 있어서, " * 20 for i in range(64)]
+        store.add_chunks(1, [f"1_{i}" for i in range(64)], texts)
+
+        stats = store.stats()
+        assert stats["blocks"] == 1
+        assert stats["stored_bytes"] * 10 < stats["raw_bytes"]
+
+    def test_replacing_and_deleting_drops_unused_blocks(self, store):
+        store.add_chunks(1, ["1_0", "1_1"], ["old zero", "old one"])
+        store.add_chunks(1, ["1_1"], ["new one"])
+        assert store.get_many(["1_0", "1_1"]) == ["old zero", "new one"]
+        assert store.stats()["blocks"] == 2
+
+        store.delete_chunks(["1_0"])
+        assert store.stats()["blocks"] == 1
+
+        store.add_chunks(2, ["2_0"], ["other document"])
+        store.delete_document(1)
+        assert store.get_many(["1_1", "2_0"]) == [None, "other document"]
+        assert store.stats()["blocks"] == 1
@@ -0,0 +1,91 @@
+"""Tests for the patent text chunker."""
+
+from app.services.chunker import (
+    SECTION_ABSTRACT,
+    SECTION_CLAIMS,
+    SECTION_DESCRIPTION,
+    PatentChunker,
+)
+
+PATENT = """【요약】
+본 발명은 센서 융합 시스템에 관한 것이다. 두께는 3.5 mm 이다.
+【청구범위】
+1. A device comprising a sensor; and
+a processor as shown in Fig. 3.
+2. The device of claim 1, wherein the sensor is optical.
+【발명의 상세한 설명】
+[0001] The sensor of No. 5 is described here. It measures 2.5 units.
+[0002] A second paragraph.
+"""
+
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+
+def chunk(pages, max_tokens=40, overlap_tokens=0):
+    chunker = PatentChunker(count_words, max_tokens, overlap_tokens)
+    return list(chunker.chunk(pages))
+
+
+class TestPatentChunker:
+    """Test cases for PatentChunker class."""
+
+    def test_sections_end_chunks(self):
+        chunks = chunk([(1, PATENT)])
+
+        assert [c.section for c in chunks] == [
+            SECTION_ABSTRACT,
+            SECTION_CLAIMS,
+            SECTION_DESCRIPTION,
+        ]
+        assert "3.5 mm" in chunks[0].text
+        assert chunks[1].text.startswith("1. A device")
+        assert "Fig. 3." in chunks[1].text
+        assert not any("【" in c.text for c in chunks)
+
+    def test_claims_are_not_split_when_the_next_does_not_fit(self):
+        chunks = chunk([(1, PATENT)], max_tokens=16)
+        claims = [c.text for c in chunks if c.section == SECTION_CLAIMS]
+
+        assert claims == [
+            "1. A device comprising a sensor; and\na processor as shown in Fig. 3.",
+            "2. The device of claim 1, wherein the sensor is optical.",
+        ]
+
+    def test_long_paragraph_splits_at_sentences_with_overlap(self):
+        sentence = "Each sentence here has exactly eight words total. "
+        chunks = chunk([(1, "[0001] " + sentence * 6)], max_tokens=20, overlap_tokens=8)
+
+        assert all(c.tokens <= 20 for c in chunks)
+        assert all(c.text.endswith("total.") for c in chunks)
+        # The last sentence of a chunk opens the next one
+        assert chunks[1].text.startswith("Each sentence")
+        assert len(chunks) == 5
+
+    def test_overlong_sentence_splits_between_words(self):
+        chunks = chunk([(1, "word " * 25)], max_tokens=10)
+
+        assert [c.tokens for c in chunks] == [10, 10, 5]
+
+    def test_offsets_and_pages_across_page_breaks(self):
+        pages = [
+            (1, "A sentence starts on one page and"),
+            (2, "ends on the next. Done."),
+        ]
+        chunks = chunk(pages, max_tokens=11)
+        text = "".join(f"{page}\n" for _, page in pages)
+
+        assert [c.text for c in chunks] == [
+            "A sentence starts on one page and\nends on the next.",
+            "Done.",
+        ]
+        assert [(c.page_number, c.page_end) for c in chunks] == [(1, 2), (2, 2)]
+        assert all(text[c.start : c.end] == c.text for c in chunks)
+
+    def test_korean_terminators_and_empty_text(self):
+        chunks = chunk([(1, "첫 문장이다。 두 번째 문장！ 세 번째")], max_tokens=3)
+        texts = [c.text for c in chunks]
+
+        assert texts == ["첫 문장이다。", "두 번째 문장！", "세 번째"]
+        assert chunk([(1, "")]) == []
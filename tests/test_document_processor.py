@@ -4,9 +4,117 @@ import tempfile
 import os
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 
-from app.services.document_processor import document_processor
+from app.services.chunker import Chunk
+from app.services.document_processor import DocumentProcessor, document_processor
+
+
+class FakeTokenizer:
+    """Tokenizer stand-in with one token per whitespace-separated word."""
+
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class FakeEmbeddingModel:
+    """Embedding model stand-in that counts encoded texts."""
+
+    max_seq_length = 128
+
+    def __init__(self):
+        self.encoded = 0
+        self.calls = 0
+        self.tokenizer = FakeTokenizer()
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        self.calls += 1
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+class FakeCollection:
+    """In-memory stand-in for the parts of a Chroma collection we use."""
+
+    metadata = None
+
+    def __init__(self):
+        self.items = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if documents is None:
+            documents = [None] * len(ids)
+        for item in zip(ids, embeddings, documents, metadatas):
+            self.items[item[0]] = item[1:]
+
+    def get(self, ids=None, where=None, include=("documents",)):
+        if ids is None:
+            ids = list(self.items)
+        ids = [
+            chunk_id
+            for chunk_id in ids
+            if where is None or _matches(self.items[chunk_id][2], where)
+        ]
+        rows = [self.items[chunk_id] for chunk_id in ids]
+        return {
+            "ids": ids,
+            "embeddings": [row[0] for row in rows],
+            "documents": [row[1] for row in rows] if "documents" in include else None,
+            "metadatas": [row[2] for row in rows],
+        }
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.items.pop(chunk_id, None)
+
+    def query(self, query_embeddings, n_results, where=None, include=()):
+        query = np.asarray(query_embeddings[0])
+        distances = {
+            chunk_id: float(np.sum((np.asarray(row[0]) - query) ** 2))
+            for chunk_id, row in self.items.items()
+            if where is None or _matches(row[2], where)
+        }
+        ids = sorted(distances, key=distances.get)[:n_results]
+        found = self.get(ids=ids, include=include)
+        return {
+            "ids": [ids],
+            "documents": [found["documents"]] if "documents" in include else None,
+            "metadatas": [found["metadatas"]],
+            "distances": [[distances[chunk_id] for chunk_id in ids]],
+        }
+
+
+def _matches(metadata, where):
+    """Evaluate the subset of Chroma `where` clauses the processor builds."""
+    if "$and" in where:
+        return all(_matches(metadata, clause) for clause in where["$and"])
+    ((key, condition),) = where.items()
+    value = metadata.get(key)
+    if not isinstance(condition, dict):
+        return value == condition
+    ((op, operand),) = condition.items()
+    if value is None:
+        return False
+    return {
+        "$in": lambda: value in operand,
+        "$gte": lambda: value >= operand,
+        "$lt": lambda: value < operand,
+    }[op]()
+
+
+def _chunk(text):
+    return Chunk(text, 0, len(text), 1, 1, "text", len(text.split()))
+
+
+def _fake_processor():
+    processor = DocumentProcessor()
+    processor.embedding_model = FakeEmbeddingModel()
+    processor.collection = FakeCollection()
+    processor.embedding_cache = None
+    processor.keyword_index = None
+    processor.chunk_store = None
+    return processor
 
 
 class TestDocumentProcessor:
@@ -14,55 +122,356 @@ class TestDocumentProcessor:
 
     def test_validate_pdf_file_valid(self):
         """Test PDF validation with valid PDF header."""
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
-            f.write(b'%PDF-1.4')  # Valid PDF header
-            f.write(b'some content')
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(b"%PDF-1.4")  # Valid PDF header
+            f.write(b"some content")
             valid_pdf = f.name
 
         try:
             # Import after creating the file to avoid import issues
-            from app.api.documents import validate_pdf_file
+            from app.services.bulk_ingest import validate_pdf_file
+
             assert validate_pdf_file(valid_pdf) is True
         finally:
             os.unlink(valid_pdf)
 
     def test_validate_pdf_file_invalid(self):
         """Test PDF validation with invalid content."""
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
-            f.write(b'Test PDF content')  # Invalid content
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(b"Test PDF content")  # Invalid content
             invalid_pdf = f.name
 
         try:
-            from app.api.documents import validate_pdf_file
+            from app.services.bulk_ingest import validate_pdf_file
+
             assert validate_pdf_file(invalid_pdf) is False
         finally:
             os.unlink(invalid_pdf)
 
     def test_extract_text_from_pdf_invalid_file(self):
         """Test PDF text extraction with invalid file."""
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
-            f.write(b'This is not a PDF file')
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(b"This is not a PDF file")
             fake_pdf = f.name
 
         try:
             with pytest.raises(ValueError) as exc_info:
                 document_processor.extract_text_from_pdf(fake_pdf)
-            
+
             assert "유효하지 않거나 손상된 PDF 파일입니다" in str(exc_info.value)
         finally:
             os.unlink(fake_pdf)
 
     def test_chunk_text_basic(self):
         """Test basic text chunking functionality."""
+        processor = _fake_processor()
         # Use longer text that will create meaningful chunks
-        text = "This is a longer sentence that should be enough to create a meaningful chunk. " * 5
-        chunks = document_processor.chunk_text(text, chunk_size=200, overlap=20)
-        
-        assert len(chunks) > 0
-        # All chunks should be longer than 50 characters (our filter threshold)
-        assert all(len(chunk) > 50 for chunk in chunks)
+        text = (
+            "This is a longer sentence that should be enough to create a meaningful chunk. "
+            * 5
+        )
+        chunks = processor.chunk_text(text, max_tokens=30, overlap_tokens=5)
+
+        assert len(chunks) > 1
+        # Every chunk fits the token window
+        assert all(len(chunk.split()) <= 30 for chunk in chunks)
+
+    def test_chunk_text_defaults_to_model_window(self):
+        """Test chunks fit the model's window minus the special tokens."""
+        processor = _fake_processor()
+        text = "One two three four five six seven eight nine ten. " * 40
+        chunks = processor.chunk_text(text)
+
+        assert max(len(chunk.split()) for chunk in chunks) == 120
 
     def test_chunk_text_empty(self):
         """Test chunking with empty text."""
-        chunks = document_processor.chunk_text("", chunk_size=100, overlap=10)
-        assert chunks == []
\ No newline at end of file
+        chunks = _fake_processor().chunk_text("", max_tokens=100)
+        assert chunks == []
+
+    def test_extract_pages_from_pdf_parallel_keeps_order(self):
+        """Test page-parallel extraction returns every page in order."""
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for _ in range(6):
+            writer.add_blank_page(width=72, height=72)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            writer.write(f)
+            blank_pdf = f.name
+
+        try:
+            with patch("app.services.document_processor.settings") as mock_settings:
+                mock_settings.pdf_extract_workers = 0
+                mock_settings.pdf_parallel_min_pages = 1
+                mock_settings.pdf_pages_per_task = 2
+                pages = document_processor.extract_pages_from_pdf(blank_pdf, workers=2)
+
+            assert [page.page_number for page in pages] == [1, 2, 3, 4, 5, 6]
+            assert all(page.text == "" for page in pages)
+        finally:
+            os.unlink(blank_pdf)
+
+    def test_iter_chunks_records_offsets_and_pages(self):
+        """Test streamed chunks point back into the extracted text."""
+        from app.services.document_processor import PageText
+
+        pages = [
+            PageText(1, "First sentence spans the page break and continues onto"),
+            PageText(2, "the next page. " + "Another sentence that matters. " * 20),
+            PageText(3, "Final words on the last page."),
+        ]
+        chunks = list(_fake_processor().iter_chunks(pages, 30, 5))
+        text = "".join(f"{page.text}\n" for page in pages)
+
+        assert all(text[chunk.start : chunk.end] == chunk.text for chunk in chunks)
+        assert (chunks[0].page_number, chunks[0].page_end) == (1, 2)
+        assert chunks[-1].page_end == 3
+
+    def test_process_document_resumes_after_last_chunk(self):
+        """Test batched ingestion skips chunks committed by an earlier run."""
+        from app.services.document_processor import PageText
+
+        processor = _fake_processor()
+        text = "This sentence is long enough to become its own chunk of text. " * 80
+        document = Mock(id=7, filename="a.pdf", last_chunk_index=1)
+        progress = []
+
+        with (
+            patch.object(
+                processor, "iter_pages", return_value=iter([PageText(1, text)])
+            ),
+            patch("app.services.document_processor.settings") as mock_settings,
+        ):
+            mock_settings.ingest_batch_size = 2
+            mock_settings.chunk_max_tokens = 0
+            mock_settings.chunk_overlap_tokens = 0
+            count = processor.process_document(
+                document, "unused.pdf", on_progress=progress.append
+            )
+
+        assert count == len(processor.chunk_text(text, overlap_tokens=0))
+        assert sorted(processor.collection.items) == sorted(
+            f"7_{i}" for i in range(2, count)
+        )
+        assert progress[-1] == count - 1
+
+    def test_process_document_only_embeds_changed_chunks(self):
+        """Test re-indexing a revision embeds only chunks whose hash changed."""
+        from app.services.document_processor import PageText
+
+        processor = _fake_processor()
+        sentences = [
+            f"Sentence number {i} describing the claimed invention" for i in range(60)
+        ]
+        original = ". ".join(sentences) + "."
+        document = Mock(id=3, filename="a.pdf", last_chunk_index=-1)
+
+        with patch.object(
+            processor, "iter_pages", return_value=iter([PageText(1, original)])
+        ):
+            first_count = processor.process_document(document, "unused.pdf")
+        first_encoded = processor.embedding_model.encoded
+
+        revised = original.replace("Sentence number 59", "Revised sentence 59")
+        processor.embedding_model.encoded = 0
+        with patch.object(
+            processor, "iter_pages", return_value=iter([PageText(1, revised)])
+        ):
+            count = processor.process_document(document, "unused.pdf")
+
+        assert count == first_count
+        assert first_encoded == first_count
+        assert processor.embedding_model.encoded == 1
+
+    def test_process_documents_shares_embedding_batches(self):
+        """Test short documents are embedded together and failures stay isolated."""
+        from app.services.document_processor import PageText
+
+        processor = _fake_processor()
+        pages = {
+            "a.pdf": "First patent about a folding bicycle frame.",
+            "b.pdf": "Second patent about a battery cooling plate.",
+        }
+
+        def iter_pages(path):
+            if path == "broken.pdf":
+                raise ValueError("Failed to extract text from PDF")
+            return iter([PageText(1, pages[path])])
+
+        documents = [
+            Mock(id=1, filename="a.pdf", file_path="a.pdf", last_chunk_index=-1),
+            Mock(id=2, filename="x.pdf", file_path="broken.pdf", last_chunk_index=-1),
+            Mock(id=3, filename="b.pdf", file_path="b.pdf", last_chunk_index=-1),
+        ]
+        progress = []
+        with patch.object(processor, "iter_pages", side_effect=iter_pages):
+            results = processor.process_documents(
+                documents, on_progress=lambda doc, i: progress.append((doc.id, i))
+            )
+
+        assert processor.embedding_model.calls == 1
+        assert [r.chunk_count for r in results] == [1, 0, 1]
+        assert [r.page_count for r in results] == [1, 0, 1]
+        assert results[0].error is None and results[2].error is None
+        assert "PDF" in results[1].error
+        assert sorted(processor.collection.items) == ["1_0", "3_0"]
+        assert progress == [(1, 0), (3, 0)]
+
+    def test_process_documents_isolates_a_document_that_fails_to_store(self):
+        """Test a storage error fails only its document in a shared batch."""
+        from app.services.document_processor import PageText
+
+        processor = _fake_processor()
+        upsert = processor.collection.upsert
+
+        def failing_upsert(ids, **kwargs):
+            if ids[0].startswith("1_"):
+                raise ValueError("metadata rejected")
+            upsert(ids=ids, **kwargs)
+
+        processor.collection.upsert = failing_upsert
+        documents = [
+            Mock(id=i, filename=f"{i}.pdf", file_path=f"{i}.pdf", last_chunk_index=-1)
+            for i in (1, 2)
+        ]
+        with patch.object(
+            processor,
+            "iter_pages",
+            side_effect=lambda path: iter([PageText(1, f"Patent text of {path}.")]),
+        ):
+            results = processor.process_documents(documents)
+
+        assert processor.embedding_model.calls == 1
+        assert "metadata rejected" in results[0].error
+        assert results[1].error is None
+        assert sorted(processor.collection.items) == ["2_0"]
+
+    def test_process_documents_stops_a_document_whose_progress_fails(self):
+        """Test a cancelled job stops its document without failing the batch."""
+        from app.services.document_processor import PageText
+
+        processor = _fake_processor()
+        documents = [
+            Mock(id=i, filename=f"{i}.pdf", file_path=f"{i}.pdf", last_chunk_index=-1)
+            for i in (1, 2)
+        ]
+
+        def on_progress(document, index):
+            if document.id == 1:
+                raise RuntimeError("Document was deleted")
+
+        with patch.object(
+            processor,
+            "iter_pages",
+            side_effect=lambda path: iter([PageText(1, f"Patent text of {path}.")]),
+        ):
+            results = processor.process_documents(documents, on_progress=on_progress)
+
+        assert results[0].error == "Document was deleted"
+        assert results[1].error is None and results[1].chunk_count == 1
+
+    def test_index_texts_takes_the_ingest_store_path(self):
+        """Test text-only documents are chunked and indexed like PDFs."""
+        processor = _fake_processor()
+        processor.keyword_index = Mock()
+        documents = [Mock(id=i, filename=f"sample_{i}.pdf") for i in (1, 2)]
+
+        counts = processor.index_texts(documents, ["센서 하우징", "밀봉 링"])
+
+        assert counts == [1, 1]
+        assert processor.embedding_model.calls == 1
+        assert sorted(processor.collection.items) == ["1_0", "2_0"]
+        assert processor.collection.items["2_0"][2]["chunk_hash"]
+        assert processor.keyword_index.add_chunks.call_count == 2
+
+    def test_search_similar_chunks_fuses_keyword_hits(self):
+        """Test an exact-term match missed by dense search is fused in."""
+        from app.services.keyword_index import KeywordIndex
+
+        processor = _fake_processor()
+        document = Mock(id=4, filename="b.pdf")
+        texts = [
+            "짧은 문장",
+            "조금 더 긴 문장입니다",
+            "분류 코드 G06F16/33 에 해당하는 청구항",
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            processor.keyword_index = KeywordIndex(os.path.join(tmp, "keywords.db"))
+            items = [(i, _chunk(text), str(i)) for i, text in enumerate(texts)]
+            processor._store_groups([(document, items, {})])
+
+            results = processor.search_similar_chunks(
+                "G06F16/33", n_results=2, query_embedding=np.array([5.0])
+            )
+
+        chunk_ids = [result["chunk_id"] for result in results]
+        assert "4_2" in chunk_ids
+        assert len(chunk_ids) == 2
+        keyword_hit = results[chunk_ids.index("4_2")]
+        assert keyword_hit["similarity"] == 1 - (len(texts[2]) - 5.0) ** 2
+
+    def test_search_similar_chunks_applies_filters(self):
+        """Test filters become a where clause that dense and keyword hits obey."""
+        from datetime import datetime
+
+        from app.services.document_processor import SearchFilters
+        from app.services.keyword_index import KeywordIndex
+
+        processor = _fake_processor()
+        old = Mock(id=5, filename="old.pdf", uploaded_by=1)
+        old.upload_date = datetime(2023, 1, 1)
+        new = Mock(id=6, filename="new.pdf", uploaded_by=2)
+        new.upload_date = datetime(2024, 6, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            processor.keyword_index = KeywordIndex(os.path.join(tmp, "keywords.db"))
+            for document in (old, new):
+                processor._store_groups(
+                    [(document, [(0, _chunk("센서 융합 청구항"), "h")], {})]
+                )
+
+            filters = SearchFilters(uploaded_after=datetime(2024, 1, 1))
+            assert filters.where() == {"upload_ts": {"$gte": 1704067200}}
+            results = processor.search_similar_chunks(
+                "센서", query_embedding=np.array([0.0]), filters=filters
+            )
+            assert [result["chunk_id"] for result in results] == ["6_0"]
+
+            results = processor.search_similar_chunks(
+                "센서",
+                query_embedding=np.array([0.0]),
+                filters=SearchFilters(document_ids=(5,), uploaded_by=1),
+            )
+            assert [result["chunk_id"] for result in results] == ["5_0"]
+
+            assert (
+                processor.search_similar_chunks(
+                    "센서",
+                    query_embedding=np.array([0.0]),
+                    filters=SearchFilters(document_ids=()),
+                )
+                == []
+            )
+
+    def test_chunk_text_is_stored_once_and_attached_to_hits(self):
+        """Test chunk text lives in the chunk store and comes back with hits."""
+        from app.services.chunk_store import ChunkStore
+
+        processor = _fake_processor()
+        document = Mock(id=8, filename="c.pdf")
+        texts = ["짧은 청구항", "조금 더 긴 청구항 문장입니다"]
+        with tempfile.TemporaryDirectory() as tmp:
+            processor.chunk_store = ChunkStore(os.path.join(tmp, "chunks.db"))
+            items = [(i, _chunk(text), str(i)) for i, text in enumerate(texts)]
+            processor._store_groups([(document, items, {})])
+
+            rows = processor.collection.items.values()
+            assert all(row[1] is None for row in rows)
+            assert all("chunk_text" not in row[2] for row in rows)
+            results = processor.search_similar_chunks(
+                "청구항", n_results=1, query_embedding=np.array([len(texts[1])])
+            )
+            assert [(r["chunk_id"], r["text"]) for r in results] == [("8_1", texts[1])]
+
+            processor.delete_document_chunks(8)
+            assert processor.chunk_store.count() == 0
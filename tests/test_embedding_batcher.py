@@ -0,0 +1,95 @@
+"""Tests for micro-batched query embedding."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.embedding_batcher import MicroBatcher
+from app.services.executor import ExecutorOverloaded
+from app.services.metrics import Histogram
+
+
+class TestMicroBatcher:
+    """Test cases for MicroBatcher class."""
+
+    def test_coalesces_concurrent_requests(self):
+        batches = []
+
+        def encoder(texts):
+            batches.append(list(texts))
+            return np.array([[float(len(text))] for text in texts])
+
+        batcher = MicroBatcher(encoder, max_batch_size=8, max_wait_ms=200)
+        futures = [batcher.submit("x" * n) for n in range(1, 6)]
+
+        assert [future.result(timeout=5)[0] for future in futures] == [1, 2, 3, 4, 5]
+        assert batches == [["x", "xx", "xxx", "xxxx", "xxxxx"]]
+        stats = batcher.stats()
+        assert stats["batches"] == 1
+        assert stats["batch_size"]["max"] == 5
+        assert stats["latency_ms"]["count"] == 5
+
+    def test_splits_at_max_batch_size(self):
+        batches = []
+
+        def encoder(texts):
+            batches.append(len(texts))
+            return np.zeros((len(texts), 1))
+
+        batcher = MicroBatcher(encoder, max_batch_size=2, max_wait_ms=200)
+        futures = [batcher.submit(str(i)) for i in range(5)]
+        for future in futures:
+            future.result(timeout=5)
+
+        assert sum(batches) == 5
+        assert max(batches) == 2
+
+    def test_encoder_error_fails_every_request_in_batch(self):
+        def encoder(texts):
+            raise RuntimeError("model crashed")
+
+        batcher = MicroBatcher(encoder, max_batch_size=4, max_wait_ms=100)
+        futures = [batcher.submit("a"), batcher.submit("b")]
+
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(timeout=5)
+
+    def test_rejects_when_queue_is_full(self):
+        release = threading.Event()
+
+        def encoder(texts):
+            release.wait()
+            return np.zeros((len(texts), 1))
+
+        batcher = MicroBatcher(encoder, max_batch_size=1, max_wait_ms=0, max_queue=1)
+        try:
+            first = batcher.submit("running")
+            # Wait until the worker has taken the first text off the queue
+            while batcher.stats()["queued"]:
+                threading.Event().wait(0.01)
+            batcher.submit("queued")
+            with pytest.raises(ExecutorOverloaded):
+                batcher.submit("rejected")
+        finally:
+            release.set()
+        first.result(timeout=5)
+        assert batcher.rejected == 1
+
+
+class TestHistogram:
+    """Test cases for Histogram class."""
+
+    def test_percentiles_use_bucket_bounds(self):
+        histogram = Histogram((1, 10, 100))
+        for value in [0.5] * 90 + [50] * 9 + [500]:
+            histogram.observe(value)
+
+        stats = histogram.stats()
+        assert stats["count"] == 100
+        assert stats["p50"] == 1
+        assert stats["p95"] == 100
+        assert stats["p99"] == 100
+        assert stats["max"] == 500
+        assert stats["buckets"] == {"le_1": 90, "le_10": 0, "le_100": 9, "inf": 1}
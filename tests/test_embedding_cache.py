@@ -0,0 +1,64 @@
+"""Tests for the persistent embedding cache."""
+
+import numpy as np
+
+from app.services.embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    """Encoder stand-in that records which texts it was asked to embed."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+class TestEmbeddingCache:
+    """Test cases for EmbeddingCache class."""
+
+    def test_encode_only_computes_misses(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path / "cache.db"), "model-a")
+        encoder = CountingEncoder()
+
+        first = cache.encode(["alpha", "beta", "alpha"], encoder)
+        second = cache.encode(["beta", "gamma"], encoder)
+
+        assert encoder.calls == [["alpha", "beta"], ["gamma"]]
+        assert first.shape == (3, 2)
+        np.testing.assert_array_equal(first[0], first[2])
+        np.testing.assert_array_equal(second[0], first[1])
+        assert cache.stats()["hits_memory"] == 1
+
+    def test_persists_across_instances_per_model(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        EmbeddingCache(path, "model-a").encode(["alpha"], CountingEncoder())
+
+        encoder = CountingEncoder()
+        cache = EmbeddingCache(path, "model-a")
+        cache.encode(["alpha"], encoder)
+        assert encoder.calls == []
+        assert cache.stats()["hits_disk"] == 1
+
+        other_model = CountingEncoder()
+        EmbeddingCache(path, "model-b").encode(["alpha"], other_model)
+        assert other_model.calls == [["alpha"]]
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = EmbeddingCache(
+            str(tmp_path / "cache.db"), "model-a", memory_items=1, max_items=3
+        )
+        encoder = CountingEncoder()
+        for text in ["a", "b", "c", "d"]:
+            cache.encode([text], encoder)
+
+        stats = cache.stats()
+        assert stats["disk_items"] <= 3
+        assert stats["evictions"] >= 1
+        assert stats["memory_items"] == 1
+
+        encoder.calls.clear()
+        cache.encode(["a"], encoder)
+        assert encoder.calls == [["a"]]
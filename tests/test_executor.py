@@ -0,0 +1,60 @@
+"""Tests for the bounded executor."""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.services.executor import BoundedExecutor, ExecutorOverloaded
+
+
+class TestBoundedExecutor:
+    """Test cases for BoundedExecutor class."""
+
+    def test_rejects_work_beyond_queue_depth(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            running = executor.submit(release.wait)
+            queued = executor.submit(lambda: "queued")
+
+            with pytest.raises(ExecutorOverloaded):
+                executor.submit(lambda: "rejected")
+
+            release.set()
+            assert running.result(timeout=5) is True
+            assert queued.result(timeout=5) == "queued"
+        finally:
+            release.set()
+            executor.shutdown()
+
+        stats = executor.stats()
+        assert stats["pending"] == 0
+        assert stats["peak_pending"] == 2
+        assert stats["completed"] == 2
+        assert stats["rejected"] == 1
+
+    def test_accepts_work_again_after_draining(self):
+        executor = BoundedExecutor("test", max_workers=1, max_queue=0)
+        try:
+            assert executor.submit(lambda: 1).result(timeout=5) == 1
+            assert executor.submit(lambda: 2).result(timeout=5) == 2
+        finally:
+            executor.shutdown()
+
+    def test_run_awaits_result_off_the_event_loop(self):
+        executor = BoundedExecutor("test", max_workers=2, max_queue=0)
+        loop_thread = threading.get_ident()
+
+        async def main():
+            return await asyncio.gather(
+                executor.run(threading.get_ident), executor.run(sum, [1, 2, 3])
+            )
+
+        try:
+            worker_thread, total = asyncio.run(main())
+        finally:
+            executor.shutdown()
+
+        assert worker_thread != loop_thread
+        assert total == 6
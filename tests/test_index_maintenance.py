@@ -0,0 +1,90 @@
+"""Tests for vector index evaluation and rebuilds."""
+
+import tempfile
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+
+from app.services.index_maintenance import (
+    collection_space,
+    evaluate_index,
+    exact_neighbors,
+    pairwise_distances,
+    sample_queries,
+)
+from app.services.sharding import rebuild_collection
+
+
+@pytest.fixture
+def client():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield chromadb.PersistentClient(
+            path=tmp, settings=Settings(anonymized_telemetry=False)
+        )
+
+
+def _collection(client, space="l2", count=60, seed=0):
+    collection = client.create_collection(
+        "patents", metadata={"description": "test", "hnsw:space": space}
+    )
+    rng = np.random.default_rng(seed)
+    collection.add(
+        ids=[str(i) for i in range(count)],
+        embeddings=rng.normal(size=(count, 8)),
+    )
+    return collection, rng
+
+
+class TestIndexMaintenance:
+    """Test cases for index evaluation helpers."""
+
+    @pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+    def test_distances_match_chroma(self, client, space):
+        collection, rng = _collection(client, space)
+        query = rng.normal(size=8)
+
+        found = collection.query(
+            query_embeddings=[query], n_results=5, include=["embeddings", "distances"]
+        )
+        expected = pairwise_distances(query, found["embeddings"][0], space)[0]
+
+        assert collection_space(collection) == space
+        assert np.allclose(found["distances"][0], expected, atol=1e-4)
+
+    def test_exact_neighbors_across_pages(self, client):
+        collection, rng = _collection(client)
+        queries = rng.normal(size=(3, 8))
+
+        truth = exact_neighbors(collection, queries, k=4, page_size=7)
+        expected = collection.query(query_embeddings=queries, n_results=4)["ids"]
+
+        assert [sorted(ids) for ids in truth] == [sorted(ids) for ids in expected]
+
+    def test_evaluate_reports_recall_and_latency(self, client):
+        collection, _ = _collection(client)
+        queries = sample_queries(collection, 5)
+        truth = exact_neighbors(collection, queries, k=3)
+
+        report = evaluate_index(collection, queries, truth, k=3)
+
+        assert report["queries"] == 5
+        assert report["recall"] == 1.0
+        assert report["latency_ms"]["max"] > 0
+
+    def test_rebuild_applies_new_hnsw_settings(self, client):
+        collection, _ = _collection(client)
+        deleted = [str(i) for i in range(10)]
+        collection.delete(ids=deleted)
+
+        rebuilt = rebuild_collection(
+            client,
+            "patents",
+            {"description": "test", "hnsw:space": "cosine", "hnsw:M": 32},
+        )
+
+        assert rebuilt.count() == 50
+        assert rebuilt.configuration_json["hnsw"]["space"] == "cosine"
+        assert rebuilt.configuration_json["hnsw"]["max_neighbors"] == 32
+        assert not set(rebuilt.get()["ids"]) & set(deleted)
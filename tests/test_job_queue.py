@@ -0,0 +1,218 @@
+"""Tests for the ingestion job queue."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base, Document, IngestionJob
+from app.services.job_queue import JobCancelled, JobQueue, WorkerPool
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def document(session_factory):
+    db = session_factory()
+    doc = Document(
+        filename="a.pdf",
+        original_filename="a.pdf",
+        file_path="/tmp/a.pdf",
+        file_size=10,
+    )
+    db.add(doc)
+    db.commit()
+    doc_id = doc.id
+    db.close()
+    return doc_id
+
+
+class TestJobQueue:
+    """Test cases for JobQueue class."""
+
+    def test_enqueue_reuses_active_job(self, session_factory, document):
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        doc = db.get(Document, document)
+
+        first = queue.enqueue(db, doc)
+        second = queue.enqueue(db, doc)
+
+        assert first.id == second.id
+        assert doc.processing_status == "queued"
+        db.close()
+
+    def test_claim_is_exclusive(self, session_factory, document):
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        job = queue.enqueue(db, db.get(Document, document))
+        db.close()
+
+        assert queue.claim("w1") == job.id
+        assert queue.claim("w2") is None
+
+    def test_complete_and_fail_update_document(self, session_factory, document):
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        job = queue.enqueue(db, db.get(Document, document))
+        queue.claim("w1")
+        queue.complete(job.id, chunk_count=7)
+
+        db.expire_all()
+        doc = db.get(Document, document)
+        assert doc.processed is True
+        assert doc.chunk_count == 7
+        assert queue.get_status(db, doc)["job"]["status"] == "done"
+
+        job = queue.enqueue(db, doc)
+        queue.claim("w1")
+        queue.fail(job.id, "boom")
+        db.expire_all()
+        status = queue.get_status(db, db.get(Document, document))
+        assert status["job"]["status"] == "failed"
+        assert status["error"] == "boom"
+        db.close()
+
+    def test_requeue_running(self, session_factory, document):
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        job = queue.enqueue(db, db.get(Document, document))
+        db.close()
+        queue.claim("w1")
+
+        assert queue.requeue_running() == 1
+        assert queue.claim("w2") == job.id
+
+    def test_replaced_file_gets_a_new_job(self, session_factory, document):
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        doc = db.get(Document, document)
+        old = queue.enqueue(db, doc)
+        queue.claim("w1")
+
+        doc.file_version += 1
+        db.commit()
+        new = queue.enqueue(db, doc)
+
+        assert new.id != old.id
+        assert queue.claim("w2") is None  # not while the old job still runs
+        assert queue.complete(old.id, chunk_count=3) is False
+        db.expire_all()
+        assert db.get(IngestionJob, old.id).status == "cancelled"
+        assert db.get(Document, document).processed is False
+        assert queue.claim("w2") == new.id
+        db.close()
+
+    def test_run_jobs_stops_and_cleans_up_for_deleted_document(
+        self, session_factory, document
+    ):
+        from app.services.document_processor import IngestResult
+
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        queue.enqueue(db, db.get(Document, document))
+        db.close()
+        job_id = queue.claim("w1")
+
+        def process_documents(documents, on_progress):
+            # Deleted by an admin while the first batch was being stored
+            other = session_factory()
+            other.delete(other.get(Document, document))
+            other.commit()
+            other.close()
+            with pytest.raises(JobCancelled) as cancelled:
+                on_progress(documents[0], 63)
+            return [IngestResult(documents[0].id, 64, 2, 64, str(cancelled.value))]
+
+        processor = MagicMock()
+        processor.process_documents.side_effect = process_documents
+        with patch("app.services.document_processor.document_processor", processor):
+            queue.run_jobs([job_id])
+
+        processor.delete_document_chunks.assert_called_once_with(document)
+
+    def test_run_jobs_does_not_complete_a_replaced_document(
+        self, session_factory, document
+    ):
+        from app.services.document_processor import IngestResult
+
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        queue.enqueue(db, db.get(Document, document))
+        job_id = queue.claim("w1")
+
+        def process_documents(documents, on_progress):
+            other = session_factory()
+            other.get(Document, document).file_version += 1
+            other.commit()
+            other.close()
+            return [IngestResult(documents[0].id, 5, 1, 5)]
+
+        processor = MagicMock()
+        processor.process_documents.side_effect = process_documents
+        with patch("app.services.document_processor.document_processor", processor):
+            queue.run_jobs([job_id])
+
+        db.expire_all()
+        assert db.get(Document, document).processed is False
+        assert db.get(IngestionJob, job_id).status == "cancelled"
+        processor.delete_document_chunks.assert_not_called()
+        db.close()
+
+    def test_bulk_enqueue_claim_many_and_batch_status(self, session_factory):
+        queue = JobQueue(session_factory)
+        db = session_factory()
+        documents = [
+            Document(
+                filename=f"{i}.pdf",
+                original_filename=f"{i}.pdf",
+                file_path=f"/tmp/{i}.pdf",
+                file_size=10,
+                batch_id="batch-1",
+            )
+            for i in range(3)
+        ]
+        db.add_all(documents)
+        db.flush()
+        queue.enqueue_many(db, documents)
+        db.commit()
+
+        claimed = queue.claim_many("w1", limit=2)
+        assert len(claimed) == 2
+        queue.complete(claimed[0], chunk_count=10, page_count=4)
+        queue.fail(claimed[1], "boom")
+
+        status = queue.batch_status(db, "batch-1")
+        assert status["total"] == 3
+        assert status["counts"] == {"queued": 1, "running": 0, "done": 1, "failed": 1}
+        assert (status["pages"], status["chunks"]) == (4, 10)
+        assert queue.batch_status(db, "missing") is None
+        db.close()
+
+
+class TestWorkerPool:
+    """Test cases for WorkerPool class."""
+
+    def test_stop_lets_running_jobs_finish_before_terminating(self):
+        pool = WorkerPool(2, poll_interval=1.0)
+        finishing, stuck = MagicMock(), MagicMock()
+        finishing.is_alive.return_value = False
+        stuck.is_alive.return_value = True
+        pool._stop_event = MagicMock()
+        pool._processes = [finishing, stuck]
+
+        pool.stop(timeout=5)
+
+        pool._stop_event.set.assert_called_once()
+        assert 0 < finishing.join.call_args[0][0] <= 5  # waited on the deadline
+        finishing.terminate.assert_not_called()
+        stuck.terminate.assert_called_once()
+        assert not pool.running
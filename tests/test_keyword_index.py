@@ -0,0 +1,61 @@
+"""Tests for the BM25 keyword index."""
+
+import os
+import tempfile
+
+import pytest
+
+from app.services.keyword_index import KeywordIndex, reciprocal_rank_fusion, tokenize
+
+
+@pytest.fixture
+def index():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield KeywordIndex(os.path.join(tmp, "keywords.db"))
+
+
+class TestTokenize:
+    """Test cases for tokenize function."""
+
+    def test_keeps_codes_and_chemical_names_whole(self):
+        terms = tokenize("IPC G06F16/33, 2-methylpropane 및 claim 12.")
+        assert "g06f16/33" in terms
+        assert "2-methylpropane" in terms
+        assert "12" in terms
+
+    def test_splits_hangul_into_bigrams(self):
+        assert tokenize("특허를") == ["특허", "허를"]
+        assert "특허" in tokenize("특허의 범위")
+
+
+class TestKeywordIndex:
+    """Test cases for KeywordIndex class."""
+
+    def test_search_ranks_exact_terms(self, index):
+        index.add_chunks(1, ["1_0", "1_1"], ["센서 융합 시스템", "IPC G06F16/33 분류"])
+        index.add_chunks(2, ["2_0"], ["특허를 검색하는 시스템"])
+
+        assert [chunk_id for chunk_id, _ in index.search("G06F16/33")] == ["1_1"]
+        assert [chunk_id for chunk_id, _ in index.search("특허 검색")] == ["2_0"]
+        assert index.search("") == []
+
+    def test_add_replaces_and_delete_removes(self, index):
+        index.add_chunks(1, ["1_0", "1_1"], ["old text", "other"])
+        index.add_chunks(1, ["1_0"], ["new text"])
+        assert index.search("old") == []
+        assert [chunk_id for chunk_id, _ in index.search("new")] == ["1_0"]
+
+        index.delete_chunks(["1_1"])
+        assert index.count() == 1
+        index.delete_document(1)
+        assert index.count() == 0
+        assert index.search("new") == []
+
+
+class TestReciprocalRankFusion:
+    """Test cases for reciprocal_rank_fusion function."""
+
+    def test_items_in_both_rankings_win(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+        assert fused[0][0] == "c"
+        assert [item for item, _ in fused] == ["c", "a", "b", "d"]
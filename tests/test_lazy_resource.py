@@ -0,0 +1,56 @@
+"""Tests for thread-safe lazy resource initialization."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.lazy_resource import LazyResource
+
+
+class TestLazyResource:
+    """Test cases for LazyResource class."""
+
+    def test_concurrent_callers_share_one_load(self):
+        calls = []
+        start = threading.Event()
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.1)
+            return object()
+
+        resource = LazyResource("model", factory)
+
+        def get():
+            start.wait()
+            return resource.get()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(get) for _ in range(8)]
+            start.set()
+            results = [future.result() for future in futures]
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        stats = resource.stats()
+        assert stats["loaded"] is True
+        assert stats["loads"] == 1
+        assert stats["init_seconds"] >= 0.1
+
+    def test_failed_load_is_retried(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("model download failed")
+            return "model"
+
+        resource = LazyResource("model", factory)
+
+        with pytest.raises(RuntimeError):
+            resource.get()
+        assert resource.get() == "model"
+        assert resource.stats()["failures"] == 1
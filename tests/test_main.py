@@ -0,0 +1,29 @@
+"""Tests for the application endpoints."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+from app.main import readiness_check
+
+
+class TestReadiness:
+    """Test cases for the /ready probe."""
+
+    def test_ready_without_startup_warmup(self):
+        with (
+            patch("app.main.settings.warmup_on_startup", False),
+            patch("app.main.document_processor.warm", False),
+        ):
+            assert asyncio.run(readiness_check())["status"] == "ready"
+
+    def test_not_ready_until_warmup_finishes(self):
+        with (
+            patch("app.main.settings.warmup_on_startup", True),
+            patch("app.main.document_processor.warm", False),
+            patch("app.main.document_processor.warmup_error", None),
+        ):
+            response = asyncio.run(readiness_check())
+
+        assert response.status_code == 503
+        assert json.loads(response.body)["status"] == "warming_up"
@@ -0,0 +1,115 @@
+"""Tests for the OCR fallback."""
+
+from typing import NamedTuple
+from unittest.mock import patch
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+
+from app.services.ocr import OcrCache, OcrFallback, ocr_page, page_hash
+
+
+class PageText(NamedTuple):
+    # Same shape as document_processor.PageText, without importing the model
+    # stack into every spawned OCR worker
+    page_number: int
+    text: str
+
+
+def _fake_ocr(file_path, page_index, languages, cache_path):
+    return f"recognized text of page {page_index + 1}"
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """A PDF whose first page draws an image and whose second page is blank."""
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    image = DecodedStreamObject()
+    image.set_data(b"\x00\xff\xff\x00")
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(2),
+            NameObject("/Height"): NumberObject(2),
+            NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+        }
+    )
+    page[NameObject("/Resources")] = DictionaryObject(
+        {
+            NameObject("/XObject"): DictionaryObject(
+                {NameObject("/Im0"): writer._add_object(image)}
+            )
+        }
+    )
+    writer.add_blank_page(100, 100)
+    path = tmp_path / "scan.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+class TestOcr:
+    """Test cases for the OCR fallback."""
+
+    def test_page_hash_covers_images_and_languages(self, scanned_pdf):
+        scan, blank = PdfReader(scanned_pdf).pages
+
+        assert page_hash(scan, "kor") is not None
+        assert page_hash(scan, "kor") != page_hash(scan, "eng")
+        assert page_hash(blank, "kor") is None
+
+    def test_ocr_page_reuses_cached_text(self, tmp_path, scanned_pdf):
+        cache_path = str(tmp_path / "ocr.db")
+        key = page_hash(PdfReader(scanned_pdf).pages[0], "kor+eng")
+        OcrCache(cache_path).put(key, "청구항 1. 센서")
+
+        # Served from the cache, so Tesseract is never needed
+        assert ocr_page(scanned_pdf, 0, "kor+eng", cache_path) == "청구항 1. 센서"
+        assert ocr_page(scanned_pdf, 1, "kor+eng", cache_path) == ""
+
+    def test_fill_ocrs_only_text_less_pages_in_order(self):
+        fallback = OcrFallback("eng", workers=2, min_chars=10, ocr=_fake_ocr)
+        text = "A claimed sensor housing with a sealing ring."
+        pages = [PageText(i, text if i % 3 else " 12 ") for i in range(1, 8)]
+
+        with patch.object(OcrFallback, "available", return_value=True):
+            filled = list(fallback.fill(iter(pages), "unused.pdf"))
+
+        assert [page.page_number for page in filled] == list(range(1, 8))
+        assert [page.text for page in filled] == [
+            text,
+            text,
+            "12\nrecognized text of page 3",
+            text,
+            text,
+            "12\nrecognized text of page 6",
+            text,
+        ]
+
+    def test_fill_keeps_a_short_text_layer_ahead_of_the_ocr_text(self):
+        fallback = OcrFallback("eng", workers=1, min_chars=10, ocr=_fake_ocr)
+        pages = [PageText(1, "FIG. 3 "), PageText(2, "  ")]
+
+        with patch.object(OcrFallback, "available", return_value=True):
+            filled = list(fallback.fill(iter(pages), "unused.pdf"))
+
+        assert [page.text for page in filled] == [
+            "FIG. 3\nrecognized text of page 1",
+            "recognized text of page 2",
+        ]
+
+    def test_fill_passes_pages_through_without_tesseract(self):
+        fallback = OcrFallback("eng", workers=2, min_chars=10, ocr=_fake_ocr)
+        pages = [PageText(1, ""), PageText(2, "")]
+
+        with patch.object(OcrFallback, "available", return_value=False):
+            assert list(fallback.fill(iter(pages), "unused.pdf")) == pages
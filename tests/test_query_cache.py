@@ -0,0 +1,55 @@
+"""Tests for the RAG query caches."""
+
+from unittest.mock import patch
+
+import numpy as np
+
+from app.services.query_cache import SemanticCache, TTLCache
+
+
+class TestTTLCache:
+    """Test cases for TTLCache class."""
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.stats()["size"] == 2
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=2, ttl=10)
+        with patch("app.services.query_cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("app.services.query_cache.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+
+
+class TestSemanticCache:
+    """Test cases for SemanticCache class."""
+
+    def test_matches_similar_query_within_threshold(self):
+        cache = SemanticCache(maxsize=10, ttl=60, threshold=0.95)
+        cache.store(np.array([1.0, 0.0]), "v1", "answer")
+
+        assert cache.lookup(np.array([0.99, 0.05]), "v1") == "answer"
+        assert cache.lookup(np.array([0.5, 0.5]), "v1") is None
+
+    def test_corpus_change_invalidates_entries(self):
+        cache = SemanticCache(maxsize=10, ttl=60, threshold=0.95)
+        cache.store(np.array([1.0, 0.0]), "v1", "answer")
+
+        assert cache.lookup(np.array([1.0, 0.0]), "v2") is None
+        assert cache.stats()["size"] == 0
+
+    def test_drops_oldest_entry_when_full(self):
+        cache = SemanticCache(maxsize=1, ttl=60, threshold=0.95)
+        cache.store(np.array([1.0, 0.0]), "v1", "first")
+        cache.store(np.array([0.0, 1.0]), "v1", "second")
+
+        assert cache.lookup(np.array([1.0, 0.0]), "v1") is None
+        assert cache.lookup(np.array([0.0, 1.0]), "v1") == "second"
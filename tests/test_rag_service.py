@@ -0,0 +1,64 @@
+"""Tests for the RAG service LLM paths."""
+
+import asyncio
+from unittest.mock import patch
+
+import numpy as np
+
+from app.services.rag_service import RAGService, Retrieval
+
+CHUNKS = [{"metadata": {"filename": "a.pdf"}, "text": "센서를 포함하는 장치"}]
+
+
+def _service(base_url):
+    with patch("app.services.rag_service.settings") as mock_settings:
+        mock_settings.openai_api_key = "test-key"
+        mock_settings.openai_base_url = base_url
+        mock_settings.openai_model = "mock-model"
+        mock_settings.semantic_cache_enabled = False
+        mock_settings.query_cache_size = 8
+        mock_settings.query_cache_ttl = 60
+        service = RAGService()
+    return service, mock_settings
+
+
+class TestRAGService:
+    """Test cases for RAGService against a mock OpenAI-compatible server."""
+
+    def test_async_completion(self, mock_openai_server):
+        base_url, app = mock_openai_server
+        service, mock_settings = _service(base_url)
+
+        with patch("app.services.rag_service.settings", mock_settings):
+            answer = asyncio.run(service._acomplete("센서?", CHUNKS))
+
+        assert answer == "".join(app.state.tokens)
+        assert app.state.requests[-1]["model"] == "mock-model"
+
+    def test_stream_answer_sends_sources_before_tokens(self, mock_openai_server):
+        base_url, app = mock_openai_server
+        tokens = app.state.tokens
+        service, mock_settings = _service(base_url)
+        retrieval = Retrieval("v1", np.ones(2), CHUNKS, [{"filename": "a.pdf"}], None)
+
+        async def collect():
+            return [event async for event in service.stream_answer(1, "센서?")]
+
+        with (
+            patch("app.services.rag_service.settings", mock_settings),
+            patch("app.services.rag_service.SessionLocal"),
+            patch.object(service, "aretrieve_context", return_value=retrieval),
+            patch.object(
+                service,
+                "record_answer",
+                return_value={"search_id": 5, "response_time": 3, "cached": False},
+            ) as record,
+        ):
+            events = asyncio.run(collect())
+
+        names = [name for name, _ in events]
+        assert names == ["sources"] + ["token"] * len(tokens) + ["done"]
+        assert events[0][1]["sources"] == [{"filename": "a.pdf"}]
+        assert [data["text"] for name, data in events if name == "token"] == tokens
+        assert record.call_args.args[3] == "".join(tokens)
+        assert events[-1][1]["search_id"] == 5
@@ -0,0 +1,66 @@
+"""Tests for cross-encoder reranking."""
+
+import time
+
+from app.services.reranker import Reranker
+
+
+class FakeCrossEncoder:
+    """Cross-encoder stand-in that scores pairs by text length."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [float(len(text)) for _, text in pairs]
+
+
+def _reranker(model, budget_ms=1000):
+    reranker = Reranker("fake", batch_size=2, budget_ms=budget_ms)
+    reranker.model_loader.factory = lambda: model
+    reranker.model_loader.get()
+    return reranker
+
+
+def _chunks(*texts):
+    return [{"chunk_id": str(i), "text": text} for i, text in enumerate(texts)]
+
+
+class TestReranker:
+    """Test cases for Reranker class."""
+
+    def test_keeps_top_k_by_cross_encoder_score(self):
+        model = FakeCrossEncoder()
+        reranker = _reranker(model)
+
+        chunks, reranked = reranker.rerank(
+            "q", _chunks("a", "aaaa", "aa", "aaa", "b"), 2
+        )
+
+        assert reranked is True
+        assert [chunk["text"] for chunk in chunks] == ["aaaa", "aaa"]
+        assert chunks[0]["rerank_score"] == 4.0
+        assert model.batches == [2, 2, 1]
+        assert reranker.stats()["reranked"] == 1
+
+    def test_falls_back_to_vector_order_over_budget(self):
+        reranker = _reranker(FakeCrossEncoder(delay=0.05), budget_ms=10)
+
+        chunks, reranked = reranker.rerank("q", _chunks("a", "aaaa", "aa"), 2)
+
+        assert reranked is False
+        assert [chunk["text"] for chunk in chunks] == ["a", "aaaa"]
+        assert reranker.stats()["over_budget"] == 1
+
+    def test_falls_back_while_model_is_loading(self):
+        reranker = Reranker("fake", batch_size=2)
+        reranker.warmup = lambda: None  # don't actually load in the background
+
+        chunks, reranked = reranker.rerank("q", _chunks("a", "aaaa"), 1)
+
+        assert reranked is False
+        assert [chunk["text"] for chunk in chunks] == ["a"]
+        assert reranker.stats()["not_loaded"] == 1
@@ -0,0 +1,126 @@
+"""Tests for sharded vector storage."""
+
+import tempfile
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+
+from app.services.sharding import ShardedCollection
+
+DAY = 24 * 60 * 60
+
+
+@pytest.fixture
+def client():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield chromadb.PersistentClient(
+            path=tmp, settings=Settings(anonymized_telemetry=False)
+        )
+
+
+def _add_chunks(collection, documents=8, chunks=5, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"{d}_{i}" for d in range(documents) for i in range(chunks)]
+    collection.add(
+        ids=ids,
+        embeddings=rng.normal(size=(len(ids), 8)),
+        documents=[f"text {chunk_id}" for chunk_id in ids],
+        metadatas=[
+            {
+                "document_id": d,
+                "chunk_index": i,
+                "upload_ts": 1_704_067_200 + d * 200 * DAY,  # from 2024-01-01
+            }
+            for d in range(documents)
+            for i in range(chunks)
+        ],
+    )
+    return rng
+
+
+class TestShardedCollection:
+    """Test cases for ShardedCollection class."""
+
+    def test_fan_out_query_matches_single_collection(self, client):
+        single = client.create_collection("reference")
+        sharded = ShardedCollection(client, "patents", shard_count=3)
+        _add_chunks(single)
+        rng = _add_chunks(sharded)
+
+        query = rng.normal(size=8)
+        expected = single.query(query_embeddings=[query], n_results=7)
+        results = sharded.query(query_embeddings=[query], n_results=7)
+
+        assert results["ids"][0] == expected["ids"][0]
+        assert np.allclose(results["distances"][0], expected["distances"][0])
+        assert sharded.count() == 40
+        assert sorted(sharded.stats()["shards"].values()) == [10, 15, 15]
+
+    def test_where_on_document_ids_only_touches_owning_shards(self, client):
+        sharded = ShardedCollection(client, "patents", shard_count=4)
+        _add_chunks(sharded)
+
+        where = {"document_id": {"$in": [1, 5]}}
+        assert sharded._candidate_shards(where) == ["patents_1"]
+        assert len(sharded.get(where=where)["ids"]) == 10
+
+        sharded.delete(ids=["1_0", "5_0"])
+        assert len(sharded.get(where=where)["ids"]) == 8
+
+    def test_year_shards_are_pruned_by_upload_range(self, client):
+        sharded = ShardedCollection(client, "patents", shard_by="year")
+        _add_chunks(sharded)
+
+        assert set(sharded.shards) == {
+            "patents_2024",
+            "patents_2025",
+            "patents_2026",
+            "patents_2027",
+        }
+        where = {"upload_ts": {"$gte": 1_735_689_600}}  # 2025-01-01
+        assert "patents_2024" not in sharded._candidate_shards(where)
+
+    def test_changing_layout_moves_chunks(self, client):
+        legacy = client.create_collection("patents")
+        _add_chunks(legacy)
+
+        sharded = ShardedCollection(client, "patents", shard_count=2)
+        assert sharded.count() == 40
+        assert "patents" not in [c.name for c in client.list_collections()]
+
+        resharded = ShardedCollection(client, "patents", shard_count=4)
+        assert resharded.count() == 40
+        for name, count in resharded.stats()["shards"].items():
+            ids = resharded.shards[name].get()["ids"]
+            assert len(ids) == count
+            assert all(resharded.shard_name(chunk_id) == name for chunk_id in ids)
+
+    def test_paged_get_and_shard_rebuild(self, client):
+        sharded = ShardedCollection(client, "patents", shard_count=3)
+        _add_chunks(sharded)
+
+        pages = [sharded.get(limit=15, offset=offset)["ids"] for offset in (0, 15, 30)]
+        assert sorted(sum(pages, [])) == sorted(sharded.get()["ids"])
+
+        before = sharded.shards["patents_1"].get()["ids"]
+        assert sharded.rebuild_shard("patents_1") == len(before)
+        assert sorted(sharded.shards["patents_1"].get()["ids"]) == sorted(before)
+
+    def test_year_shards_created_elsewhere_are_searched(self, client):
+        web = ShardedCollection(client, "patents", shard_by="year")
+        worker = ShardedCollection(client, "patents", shard_by="year")
+        rng = _add_chunks(worker, documents=2)
+        worker.add(
+            ids=["9_0"],
+            embeddings=rng.normal(size=(1, 8)),
+            documents=["undated"],
+            metadatas=[{"document_id": 9, "chunk_index": 0}],
+        )
+
+        results = web.query(query_embeddings=[rng.normal(size=8)], n_results=20)
+
+        assert len(results["ids"][0]) == 11
+        assert sorted(web.shards) == sorted(worker.shards)
+        assert web.count() == 11
@@ -0,0 +1,14 @@
+"""Tests for shared SQLite connections."""
+
+from app.services.shared_sqlite import connect_shared_sqlite
+
+
+class TestConnectSharedSqlite:
+    """Test cases for connect_shared_sqlite function."""
+
+    def test_creates_the_directory_and_uses_wal(self, tmp_path):
+        conn = connect_shared_sqlite(str(tmp_path / "data" / "shared.db"))
+
+        assert (tmp_path / "data" / "shared.db").exists()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.close()
@@ -0,0 +1,210 @@
+"""Tests for vector store backends."""
+
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.services.vector_store import (
+    ChromaVectorStore,
+    NumpyVectorStore,
+    matches_where,
+)
+
+
+@pytest.fixture
+def tmp():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+def _fill(store, documents=20, chunks=10, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"{d}_{i}" for d in range(documents) for i in range(chunks)]
+    store.add(
+        ids=ids,
+        embeddings=rng.normal(size=(len(ids), dim)),
+        documents=[f"text {chunk_id}" for chunk_id in ids],
+        metadatas=[
+            {"document_id": d, "chunk_index": i}
+            for d in range(documents)
+            for i in range(chunks)
+        ],
+    )
+    return rng
+
+
+class TestNumpyVectorStore:
+    """Test cases for NumpyVectorStore class."""
+
+    @pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+    def test_query_matches_chroma(self, tmp, space):
+        chroma = ChromaVectorStore(
+            f"{tmp}/chroma", "patents", metadata={"hnsw:space": space}
+        )
+        flat = NumpyVectorStore(f"{tmp}/numpy", space=space)
+        _fill(chroma)
+        rng = _fill(flat)
+
+        queries = rng.normal(size=(2, 16))
+        for where in (None, {"document_id": {"$in": [3, 7]}}):
+            expected = chroma.query(queries, n_results=5, where=where)
+            results = flat.query(queries, n_results=5, where=where)
+            assert results["ids"] == expected["ids"]
+            assert results["documents"] == expected["documents"]
+            assert np.allclose(results["distances"], expected["distances"], atol=1e-4)
+
+    def test_query_before_anything_is_stored(self, tmp):
+        store = NumpyVectorStore(tmp)
+        queries = np.ones((2, 16))
+
+        for where in (None, {"document_id": 3}):
+            results = store.query(queries, n_results=5, where=where)
+            assert results["ids"] == [[], []]
+            assert results["distances"] == [[], []]
+            assert results["metadatas"] == [[], []]
+
+    def test_writes_are_seen_by_other_instances(self, tmp):
+        writer = NumpyVectorStore(tmp)
+        reader = NumpyVectorStore(tmp)
+        _fill(writer, documents=50)
+        _fill(writer, documents=200)  # adds the rest, growing the matrix
+
+        assert reader.count() == 2000
+        writer.delete(ids=["0_0", "0_1"])
+        writer.update(ids=["1_0"], metadatas=[{"reviewed": True}])
+
+        assert reader.count() == 1998
+        assert reader.get(ids=["0_0", "1_0"])["metadatas"] == [
+            {"document_id": 1, "chunk_index": 0, "reviewed": True}
+        ]
+        assert len(reader.get(where={"document_id": 0})["ids"]) == 8
+
+    def test_other_instances_catch_up_without_reloading(self, tmp):
+        writer = NumpyVectorStore(tmp)
+        reader = NumpyVectorStore(tmp)
+        rng = _fill(writer)
+        reader.count()
+        generation = reader._generation
+
+        writer.delete(ids=["0_0", "0_1"])
+        writer.add(ids=["0_0"], embeddings=rng.normal(size=(1, 16)))  # new row
+        _fill(writer, documents=150)  # grows the matrix
+        query = rng.normal(size=16)
+
+        assert reader.count() == 1500
+        assert reader._generation == generation
+        assert reader.query(query, n_results=5) == writer.query(query, n_results=5)
+        writer.delete(ids=["0_0"])
+        writer.rebuild()  # renumbers the rows: the reader loads them afresh
+        expected = writer.query(query, n_results=5)
+        assert reader.query(query, n_results=5)["ids"] == expected["ids"]
+        assert reader._generation == generation + 1
+
+    def test_query_scores_again_after_a_concurrent_rebuild(self, tmp):
+        store = NumpyVectorStore(tmp)
+        rng = _fill(store)
+        store.delete(ids=[f"{d}_0" for d in range(20)])
+        query = rng.normal(size=16)
+        expected = store.query(query, n_results=5)
+        distances = store._distances
+        rebuilt = []
+
+        def rebuild_while_scoring(*args):
+            if not rebuilt:  # renumbers the rows under the query's feet
+                rebuilt.append(store.rebuild())
+            return distances(*args)
+
+        with patch.object(store, "_distances", side_effect=rebuild_while_scoring):
+            results = store.query(query, n_results=5)
+
+        assert rebuilt
+        assert results["ids"] == expected["ids"]
+        assert results["documents"] == expected["documents"]
+
+    def test_rebuild_compacts_deleted_rows(self, tmp):
+        store = NumpyVectorStore(tmp)
+        rng = _fill(store)
+        store.delete(ids=[f"{d}_0" for d in range(20)])
+        query = rng.normal(size=16)
+        before = store.query(query, n_results=5)
+
+        assert store.stats()["deleted_rows"] == 20
+        assert store.rebuild() == {"vectors": 180}
+        assert store.stats()["deleted_rows"] == 0
+        assert store.query(query, n_results=5)["ids"] == before["ids"]
+
+    def test_float16_halves_the_matrix(self, tmp):
+        full = NumpyVectorStore(f"{tmp}/full")
+        half = NumpyVectorStore(f"{tmp}/half", dtype="float16")
+        _fill(full)
+        rng = _fill(half)
+
+        query = rng.normal(size=16)
+        assert half.stats()["matrix_bytes"] * 2 == full.stats()["matrix_bytes"]
+        assert (
+            half.query(query, n_results=1)["ids"]
+            == full.query(query, n_results=1)["ids"]
+        )
+
+    def test_int8_with_rescoring_keeps_float32_ranking(self, tmp):
+        full = NumpyVectorStore(f"{tmp}/full")
+        quantized = NumpyVectorStore(f"{tmp}/int8", dtype="int8", rescore=4)
+        _fill(full)
+        rng = _fill(quantized)
+
+        queries = rng.normal(size=(5, 16))
+        expected = full.query(queries, n_results=5)
+        results = quantized.query(queries, n_results=5)
+
+        assert quantized.stats()["matrix_bytes"] * 4 == full.stats()["matrix_bytes"]
+        assert results["ids"] == expected["ids"]
+        assert np.allclose(results["distances"], expected["distances"], atol=1e-4)
+
+    def test_int8_recalibrates_as_small_writes_add_up(self, tmp):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(1000, 16)).astype(np.float32)
+        vectors[:64] *= 0.1  # the first batch spans a tenth of the range
+        store = NumpyVectorStore(tmp, dtype="int8")
+        store.calibration_rows = 512
+        for start in range(0, len(vectors), 64):
+            store.add(
+                ids=[str(i) for i in range(start, min(start + 64, len(vectors)))],
+                embeddings=vectors[start : start + 64],
+            )
+
+        stored = NumpyVectorStore(tmp, dtype="int8").get(include=["embeddings"])
+        error = np.abs(stored["embeddings"] - vectors[[int(i) for i in stored["ids"]]])
+        assert error.mean() < 0.01
+        # Calibrated on enough rows: the float32 copy is gone
+        assert store.stats()["originals_bytes"] == 0
+
+    def test_rebuild_converts_to_the_configured_dtype(self, tmp):
+        rng = _fill(NumpyVectorStore(tmp))
+        store = NumpyVectorStore(tmp, dtype="int8")
+        query = rng.normal(size=16)
+        before = store.query(query, n_results=3)["ids"]
+
+        store.rebuild()
+
+        assert store.stats()["dtype"] == "int8"
+        assert store.query(query, n_results=3)["ids"][0][0] == before[0][0]
+
+
+class TestMatchesWhere:
+    """Test cases for matches_where function."""
+
+    def test_operators(self):
+        metadata = {"document_id": 3, "upload_ts": 100}
+
+        assert matches_where(metadata, {"document_id": 3})
+        assert matches_where(metadata, {"document_id": {"$nin": [1, 2]}})
+        assert matches_where(
+            metadata,
+            {"$and": [{"upload_ts": {"$gte": 100}}, {"upload_ts": {"$lt": 200}}]},
+        )
+        assert matches_where(
+            metadata, {"$or": [{"document_id": 1}, {"upload_ts": {"$gt": 50}}]}
+        )
+        assert not matches_where(metadata, {"uploaded_by": {"$ne": 1}})